@@ -34,6 +34,15 @@ except ImportError:
 #from keras.layers.convolutional import Convolution1D, MaxPooling1D, Convolution2D, MaxPooling2D, UpSampling1D, UpSampling2D, ZeroPadding1D
 from keras.layers.advanced_activations import ParametricSoftplus, SReLU
 from keras.callbacks import ModelCheckpoint, Callback
+
+from tickstore import convert_files, get_date, get_date_index, get_prefix, get_store_path
+from windows import StackedWindows, save_stacked, load_stacked
+from labels import encode_signal, label_frame, SELL, BUY, HOLD
+from datacache import DataCache, file_signature
+from signal_store import newest_signal_file, read_signal_frame
+from backtest import predicted_signal, backtest, print_trade_data, signal_deals
+from metrics import ClassificationMetrics, classification_metrics, predicted_labels, print_metrics
+from normalization import normalization_stats, standardize_array
 import matplotlib.pyplot as plt
 
 path = "./training_data_large/"  # to make sure signal files are written in same directory as data files
@@ -477,11 +486,8 @@ def standardize_inputs(source, colgroups=None, mean=None, std=None):
     Groups of features could be listed in order to be standardized together.
     source: Pandas.DataFrame or filename of csv file with features
     colgroups: list of lists of groups of features to be standardized together (e.g. bid/ask price, bid/ask size)
-    returns Xdf ...Pandas.DataFrame, mean ...Pandas.DataFrame, std ...Pandas.DataFrame
+    returns Xdf ...Pandas.DataFrame, mean ...Pandas.Series, std ...Pandas.Series
     """
-    import itertools
-    import types
-    
     #if isinstance(source, types.StringTypes):
     if isinstance(source, str):
         Xdf = pd.read_csv(source, sep=" ", index_col = 0, header = None)
@@ -489,66 +495,11 @@ def standardize_inputs(source, colgroups=None, mean=None, std=None):
         Xdf = source
     else:
         raise TypeError
-    
-    df = pd.DataFrame()
-    me = pd.DataFrame()
-    st = pd.DataFrame()
-
-    for colgroup in colgroups:
-        _df,_me,_st = standardize_columns(Xdf[colgroup])
-        # if mean & std are given, do not multiply with colgroup mean
-        if mean is not None and std is not None:  
-            _df = Xdf[colgroup]
-
-        df = pd.concat([df, _df], axis=1)
-        me = pd.concat([me, _me])
-        st = pd.concat([st, _st])
-
-        print("In Group me")
-        print(me)
-        
-    #     _temp_list = list(itertools.chain.from_iterable(colgroups))
-    separate_features = [col for col in Xdf.columns if col not in list(itertools.chain.from_iterable(colgroups))]
-    if mean is None and std is None:
-        _me = Xdf[separate_features].mean()
-        _df = Xdf[separate_features].sub(_me)
-        _st = Xdf[separate_features].std()
-        _df = _df[separate_features].div(_st)
-    else:
-        _df = Xdf[separate_features]
-       
-    
-    df = pd.concat([df, _df], axis=1)
-    me = pd.concat([me, _me])
-    st = pd.concat([st, _st])
-
-    me = pd.Series(me[0])
-    st = pd.Series(st[0])
 
-    if mean is not None and std is not None:
-     
-        df = df.sub(mean)
-        df = df.div(std)
+    values, labels, me, st = standardize_array(Xdf.values, Xdf.columns, colgroups=colgroups, mean=mean, std=std)
 
-    return df, me, st
+    return pd.DataFrame(values, index=Xdf.index, columns=labels, copy=False), pd.Series(me, index=labels), pd.Series(st, index=labels)
 
-    
-def standardize_columns(colgroup):
-    """
-    Standardize group of columns together
-    colgroup: Pandas.DataFrame
-    returns: Pandas.DataFrames: Colum Group standardized, Mean of the colgroup, stddeviation of the colgroup
-    """
-    _me = np.mean(colgroup.values.flatten())
-    centered = colgroup.sub(_me)
-    me = pd.DataFrame(np.full(len(colgroup.columns),_me), index=colgroup.columns)
-
-    _st = np.std(colgroup.values.flatten())
-    standardized = centered.div(_st)
-    st = pd.DataFrame(np.full(len(colgroup.columns),_st), index=colgroup.columns)
-    
-    return standardized, me, st
-    
         
 def get_tradcom_normalization(filename, mean=None, std=None):
     """  read in all X Data Frames and find mean and std of all columns...
@@ -597,31 +548,33 @@ def prepare_tradcom_classification(training=True,
                                    file_list=None,
                                    mean=None,
                                    std=None,
-                                   training_count=None):
+                                   training_count=None,
+                                   label_mode='onehot',
+                                   label_dtype=np.float32,
+                                   rebuild=False,
+                                   signal_prefix='signal'):
     """
     prepare the datasets for the trading competition. training determines which datasets will be read
+    label_mode: 'onehot' for the columns sell, buy, hold in label_dtype or 'classes' for a single int8 column (see labels.py)
+    rebuild: prepare the data again even if it is found in the cache (see datacache.py)
+    signal_prefix: the labels are read from <signal_prefix>_<day>.csv, 'signal' for the bid/ask signals,
+                   'signal_opt' for the optimal strategy (optimal_strategy_multiplefiles.py --label)
     returns: X and y: Pandas.DataFrames or np-Arrays storing the X - and y values for the fitting. 
     
     TODO: refactor - move file operations to separate functions, move stacking to function,
     remove commented blocks and undesired print statements
     """
     load_file = {'df': pd.read_pickle,
-                 'stack': np.load,
+                 'stack': load_stacked,
                  'flat': np.load}
     
     save_file = {'df': lambda filename, obj: obj.to_pickle(filename),
-                 'stack': lambda filename, obj: np.save(filename, obj),
+                 'stack': save_stacked,
                  'flat': lambda filename, obj: np.save(filename, obj)}
 
     print("Features_list",features_list)
-    
-    Xdf = pd.DataFrame()
-    ydf = pd.DataFrame()
 
-    outfile = "training_data_large/save_"+str(len(file_list))
-    if training:
-        outfile += "_train"
-    else:
+    if not training:
         if training_count is None:
             print("Training count needs to be given for testing")
             raise ValueError
@@ -629,31 +582,44 @@ def prepare_tradcom_classification(training=True,
             print("Mean & std to be given for testing")
             raise ValueError
 
-        outfile += "_"+str(training_count)+"_test"
-        
-    filetype = '.pickle' if ret_type == 'df' else '.npy'
+    colgroups = [[2, 4], [3, 5]]
+    # the compact events file is preferred to the signal csv (see signal_store.py)
+    signal_list = [newest_signal_file(filename.replace('prod_data', signal_prefix).replace('txt','csv'))
+                   for filename in file_list]
+
+    # the cache entry is keyed by everything the prepared data depends on
+    cache = DataCache(os.path.join(os.path.dirname(file_list[0]), "cache"))
+    key = cache.get_key(files=file_signature(file_list + signal_list), training=training, ret_type=ret_type,
+                        sequence_length=sequence_length, features_list=features_list, colgroups=colgroups,
+                        mean=mean, std=std, label_mode=label_mode, label_dtype=label_dtype)
+    if rebuild:
+        cache.remove(key)
 
-    outfile_X = outfile+"_X" + filetype
-    outfile_y = outfile+"_y" + filetype
-    outfile_m = outfile+"_m" + filetype
-    outfile_s = outfile+"_s" + filetype
+    filetype = {'df': '.pickle', 'stack': '.npz', 'flat': '.npy'}[ret_type]
 
-    if os.path.isfile(outfile_X) and os.path.isfile(outfile_y):
+    outfile_X = cache.get_path(key, "X" + filetype)
+    outfile_y = cache.get_path(key, "y" + filetype)
+    outfile_m = cache.get_path(key, "m" + filetype)
+    outfile_s = cache.get_path(key, "s" + filetype)
+
+    if cache.lookup(key):
         X = load_file[ret_type](outfile_X)
         y = load_file[ret_type](outfile_y)
         #X = np.load(outfile_X)
         #y = np.load(outfile_y)
         if training:
-          mean = pd.Series(np.load(outfile_m))
-          std  = pd.Series(np.load(outfile_s))
+          mean = pd.Series(load_file[ret_type](outfile_m))
+          std  = pd.Series(load_file[ret_type](outfile_s))
 
         print("Found files ", outfile_X , " and ", outfile_y)
         return (X,y,mean,std)
 
-    for filename in file_list:
+    # the input files are converted into the tick store once, later runs read the days memory mapped
+    tick_store = convert_files(file_list, get_store_path(os.path.dirname(file_list[0]), get_prefix(file_list[0])))
+    dates = []
+    ydf_list = []
 
-        signalfile = filename.replace('prod_data','signal')
-        signalfile = signalfile.replace('txt','csv')
+    for filename, signalfile in zip(file_list, signal_list):
 
         print("Working on Input files: ",filename, ", ",signalfile)
 
@@ -662,43 +628,36 @@ def prepare_tradcom_classification(training=True,
             sys.exit()
 
         # get the date...
-        r = re.compile('^\D*(\d*)\D*', re.UNICODE)
-        date = re.search(r, filename).group(1)
+        date = get_date(filename)
         print("Date is ",date)
-        date_ux = time.mktime(datetime.datetime.strptime(date,"%Y%m%d").timetuple())
-
-        # load dataframes and reindex
-        Xdf_loc = pd.read_csv(filename, sep=" ", header = None,)
-        # print(Xdf_loc.iloc[:3])
-        Xdf_loc['Milliseconds'] = Xdf_loc[0]
-        Xdf_loc['Date'] = pd.to_datetime(date_ux*1000*1000*1000)
-        # Xdf_loc[0] = pd.to_datetime(date_ux*1000*1000*1000 + Xdf_loc[0]*1000*1000)
-        # Xdf_loc = Xdf_loc.set_index([0])
-        Xdf_loc = Xdf_loc.set_index(['Date', 'Milliseconds'], append=False, drop=True)
-        # print(Xdf_loc.iloc[:3])
 
-        Xdf = pd.concat([Xdf, Xdf_loc])
-        print(Xdf.index[0])
-        print(Xdf.index[-1])
+        dates.append(date)
     
-        ydf_loc = pd.read_csv(signalfile, names = ['Milliseconds','signal',], )
+        ydf_loc = read_signal_frame(signalfile, tick_store.get_column(date, 0))
         # print(ydf_loc.iloc[:3])
         #ydf_loc['Milliseconds'] = ydf_loc[0]
-        ydf_loc['Date'] = pd.to_datetime(date_ux*1000*1000*1000)
+        ydf_loc['Date'] = get_date_index(date)
         #ydf_loc[0] = pd.to_datetime(date_ux*1000*1000*1000 + ydf_loc[0]*1000*1000)
         #ydf_loc = ydf_loc.set_index([0])
         ydf_loc = ydf_loc.set_index(['Date', 'Milliseconds'], append=False, drop=True)
         # print(Xdf_loc.iloc[:3])
     
-        ydf = pd.concat([ydf, ydf_loc])
+        ydf_list.append(ydf_loc)
 
-    #select by features_list
-    Xdf = Xdf[features_list]
+    # all days at once, indexed by Date and Milliseconds, only the columns in features_list are read
+    Xdf = tick_store.get_days_frame(dates, columns=features_list)
+    ydf = pd.concat(ydf_list)
+    day_lengths = [tick_store.get_day_length(date) for date in dates]
+    print(Xdf.index[0])
+    print(Xdf.index[-1])
 
 #     print("XDF After")
 #     print(Xdf)  
 
-    Xdf, mean, std = standardize_inputs(Xdf, colgroups=[[2, 4], [3, 5]], mean=mean, std=std)
+    if mean is None or std is None:
+        # mean and std of the training days are merged from the moments the tick store recorded per day
+        mean, std = normalization_stats(tick_store.get_moments(dates, columns=features_list), features_list, colgroups=colgroups)
+    Xdf, mean, std = standardize_inputs(Xdf, colgroups=colgroups, mean=mean, std=std)
     # Xdf, mean, std = standardize_inputs(Xdf, colgroups=[[0, 1], ], mean=mean, std=std)
 
     # if nothing from above, the use the calculated data
@@ -717,12 +676,8 @@ def prepare_tradcom_classification(training=True,
     X_xdim, X_ydim = Xdf_array.shape
     
     if ret_type == 'stack':               
-        #start_time = time.time()  
-        X = np.zeros((Xdf.shape[0]-sequence_length+1, sequence_length, len(features_list)))
-        for i in range(0, Xdf.shape[0]-sequence_length+1):
-            slice = Xdf.values[i:i+sequence_length]
-            X[i] = slice
-        #print("Time for Array Fill ", time.time()-start_time)  
+        # read only windows within each day, backed by Xdf_array
+        X = StackedWindows(Xdf_array, day_lengths, sequence_length)
         print(X.shape)
     elif ret_type == 'flat':
         X = Xdf_array.reshape((1, Xdf_array.shape[0], Xdf_array.shape[1]))
@@ -735,21 +690,15 @@ def prepare_tradcom_classification(training=True,
     #print(_X[-1])
     # print(Xdf.iloc[-5:])
 
-    ydf['sell'] = ydf.apply(lambda row: (1 if row['signal'] < -0.9 else 0 ), axis=1)
-    ydf['buy']  = ydf.apply(lambda row: (1 if row['signal'] > 0.9 else 0 ), axis=1)
-    ydf['hold'] = ydf.apply(lambda row: (1 if row['buy'] < 0.9 and row['sell'] <  0.9 else 0 ), axis=1)
-
-    del ydf['signal']
+    classes = encode_signal(ydf['signal'].values)
+    ydf = label_frame(classes, ydf.index, label_mode=label_mode, dtype=label_dtype)
     
-    print("Buy signals:", ydf[ydf['buy'] !=0 ].shape[0])
-    print("Sell signals:", ydf[ydf['sell'] !=0 ].shape[0])
-    print("% of activity signals", float((ydf[ydf['buy'] !=0 ].shape[0] + ydf[ydf['sell'] !=0 ].shape[0])/ydf.shape[0]))
+    print("Buy signals:", np.count_nonzero(classes == BUY))
+    print("Sell signals:", np.count_nonzero(classes == SELL))
+    print("% of activity signals", float(np.count_nonzero(classes != HOLD))/classes.shape[0])
     
     if ret_type == 'stack':   
-        y = np.zeros((ydf.shape[0]-sequence_length+1, sequence_length, output_dim))
-        for i in range(0, ydf.shape[0]-sequence_length+1):
-            slice = ydf.values[i:i+sequence_length]
-            y[i] = slice 
+        y = StackedWindows(ydf.values, day_lengths, sequence_length)
         print(y.shape)
     elif ret_type == 'flat':
         y = ydf.values
@@ -766,6 +715,7 @@ def prepare_tradcom_classification(training=True,
     # np.save(outfile_y, y)
     save_file[ret_type](outfile_m, mean)
     save_file[ret_type](outfile_s, std)
+    cache.commit(key)
     #np.save(outfile_m, m)
     #np.save(outfile_s, s)
    
@@ -883,8 +833,7 @@ def train_and_predict_classification(model, sequence_length=5000, features=32, o
     plt.savefig("Convergence.png")
     #plt.show()
 
-    total_class_count = 0
-    total_correct_class_count = 0
+    test_metrics = ClassificationMetrics(output_dim)
 
     for k in range(testing_count):
         filename = file_list[training_count + k]
@@ -896,28 +845,13 @@ def train_and_predict_classification(model, sequence_length=5000, features=32, o
         #print(predicted_output)
 
         yp = predicted_output['output']
-        xdim, ydim = yp.shape
-    
-        ## MSE for testing
-        total_error  = 0
-        correct_class= 0
-        for i in range (xdim):
-            delta = 0.
-            for j in range(ydim):
-                delta += (y[i][j] - yp[i][j]) * (y[i][j] - yp[i][j])
-                #print ("Row %d, MSError: %8.5f " % (i, delta/ydim))
-        
-            total_error += delta
-            if np.argmax(y[i]) == np.argmax(yp[i]):
-                correct_class += 1
 
-        print ("FIN Correct Class Assignment:  %6d /%7d" % (correct_class, xdim))
+        confusion = test_metrics.accumulate(y, yp)
+        print ("FIN Correct Class Assignment:  %6d /%7d" % (np.trace(confusion), confusion.sum()))
         print ("FIN Final Loss:  ", final_loss)
 
-        total_class_count += xdim
-        total_correct_class_count += correct_class
-
-    print ("FINFIN Correct Class Assignment:  %6d /%7d" % (total_correct_class_count, total_class_count))
+    total = test_metrics.finalize()
+    print ("FINFIN Correct Class Assignment:  %6d /%7d" % (total['correct'], total['ticks']))
 
     return {'model': model, 'predicted_output': predicted_output['output'], 'expected_output': y}
 
@@ -1018,55 +952,21 @@ def check_prediction(Xdf, y, yp, mean, std, day=None, offset = 0):
         results of this version (ufcnn6) where checked by Stefan on  20160424
         XData Frame, y...correct y, yp...predicted
     """
-    ## MSE for testing
-    total_error  = 0
-    correct_class= 0
-
-    y_pred_class = np.zeros((y.shape[2],))
-    y_corr_pred_class = np.zeros((y.shape[2],))
-    y_class      = np.zeros((y.shape[2],))
-    y_labels = np.zeros((y.shape[1], y.shape[2]))
+    # ticks without prediction are hold
     yp_transf = np.zeros((1, y.shape[1], y.shape[2]))
     yp_transf[0,:,2] = 1 # standard hold
 
-    a=['Sell','Buy','Hold']
-
-    len_y = y.shape[1]
-    len_yp = yp.shape[1]
-    len_min = min(len_y, len_yp)
     print ("Y Shape ", y.shape)
     print ("YP Shape ", yp.shape)
 
-    for i in range (yp.shape[1]):
-        yp_transf[0][i + offset][:] = yp[0][i][:]
-        print("TRANSF",yp_transf[0][i + offset], yp[0][i])
+    yp_transf[0, offset:offset + yp.shape[1]] = yp[0]
+    # only the predicted ticks are scored, the hold padding is for the backtest
+    predicted = np.zeros(y.shape[1], dtype=bool)
+    predicted[offset:offset + yp.shape[1]] = True
 
-
-    for i in range (y.shape[1]):
-        delta = 0
-        for j in range(y.shape[2]):
-            delta += (y[0][i][j] - yp_transf[0][i][j]) * (y[0][i][j] - yp_transf[0][i][j])
-    
-        total_error += delta
-        
-        #if np.any(y[0][i] != 0):     # some debug output, comment if not needed!
-        #    print("Actual: ", y[0][i])
-        #    print("Predicted: ", yp[0][i])
-            
-        if np.argmax(y[0][i]) == np.argmax(yp_transf[0][i]):
-            correct_class += 1
-            y_corr_pred_class[np.argmax(yp_transf[0][i])] += 1.
-
-        y_pred_class[np.argmax(yp_transf[0][i])] += 1.
-        y_class[np.argmax(y[0][i])] += 1.
-        y_labels[i][np.argmax(yp_transf[0][i])] = 1
-
-    print()
-    print("Total MSE Error: ",  total_error / y.shape[1])
-    print("Correct Class Assignment:  %6d /%7d" % (correct_class, y.shape[1]))
-    
-    for i in range(y.shape[2]):
-        print("%4s: Correctly Predicted / Predicted / Total:    %6d/%6d/%7d" %(a[i], y_corr_pred_class[i], y_pred_class[i], y_class[i]))
+    metrics = classification_metrics(y[0], yp_transf[0], mask=predicted, classes=y.shape[-1])
+    print_metrics(metrics)
+    y_labels = predicted_labels(yp_transf[0], y.shape[-1])
 
     Xdf = Xdf * std
     Xdf = Xdf + mean
@@ -1087,43 +987,18 @@ def check_prediction(Xdf, y, yp, mean, std, day=None, offset = 0):
 
     # store everything in signal
     # -1 for short, 1 for long...
-    Xdf2['signal'] = Xdf2.apply(lambda row: (1  if row['buy']  > row['hold'] and row['buy']  > row['sell'] else 0 ), axis=1)
-    Xdf2['signal'] = Xdf2.apply(lambda row: (-1 if row['sell'] > row['hold'] and row['sell'] > row['buy'] else row['signal'] ), axis=1)
+    Xdf2['signal'] = predicted_signal(yp_p)
 
     print("Xdf2")
     print(Xdf2)
 
-    invested_tics = 0
-    pnl = 0.
-    position = 0.
-    last_row = None
-    nr_trades = 0
-    trade_pnl = 0.
-    last_open_rate = None
-    last_position = 0
-    open_index = 0
-   
-
-    for (index, row) in Xdf2.iterrows():
-        (pnl_, position, is_trade, close_rate, open_rate, current_pnl) = calculate_pnl(position, last_row, row, fee_per_roundtrip=0.0)
-         
-        last_row = row
-        if position < -0.1 or position > 0.1:
-            invested_tics +=1
-
-        if is_trade:
-            if last_open_rate is not None:
-                print("TradeData;",nr_trades,";",last_position,";",day,";",open_index,";",last_open_rate,";",index,";",close_rate,";",trade_pnl,";",pnl)
-
-            nr_trades += 1
-            trade_pnl = current_pnl
-            open_index = index
-            last_position = position
-            last_open_rate = open_rate
-        else:
-            trade_pnl += pnl_
+    # bid in column 2, ask in column 4
+    result = backtest(Xdf2[2].values, Xdf2[4].values, Xdf2['signal'].values, fee_per_roundtrip=0.0, index=Xdf2.index.values)
+    print_trade_data(result['ledger'], day)
 
-        pnl += pnl_
+    pnl = result['total_pnl']
+    nr_trades = result['nr_trades']
+    invested_tics = result['invested_tics']
 
     sig_pnl, sig_trades = get_pnl(xy_df)
     print("Signals PnL: {}, # of trades: {}".format(sig_pnl, sig_trades))
@@ -1134,97 +1009,15 @@ def check_prediction(Xdf, y, yp, mean, std, day=None, offset = 0):
     
 ### END
 
-def calculate_pnl(position, row, next_row, fee_per_roundtrip=0.):
-    """
-        results of this version (ufcnn6) where checked by Stefan on  20160424
-    """
-    close_rate = 0.
-    open_rate = 0.
-    current_pnl = 0
-
-    if row is None or next_row is None:
-        return (0.,0., False, close_rate, open_rate, 0.0)
-
-    old_position = position
-
-    pnl = 0.
-
-    signal = row['signal']
-
-    #  if we are short and need to go long...
-    if position < -0.1 and signal > 0.1:
-        close_rate = row[4]
-        position = 0.
-
-    #  if we are long and need to go short...
-    if position > 0.1 and signal < -0.1:
-        close_rate = row[2]
-        position = 0.
-
-    last_rate = 0
-    if position < -0.1:
-        pnl = position * (next_row[4] - row[4]) # ASK
-
-    if position >  0.1:
-        pnl = position * (next_row[2] - row[2]) # BID
-
-
-    trade = False
-    if position == 0. and abs(signal) > 0.1:
-        position = signal
-        if position < -0.1:
-            current_pnl = position * (next_row[4] - row[2]) # ASK
-            open_rate = row[2]
-
-        if position >  0.1:
-            current_pnl = position * (next_row[2] - row[4]) # BID
-            open_rate = row[4]
-
-        current_pnl -= fee_per_roundtrip
-        trade = True
-
-    pnl = pnl + current_pnl
-
-    #print ("SIGNAL:",signal, ", old_position: ", old_position, " position:", position, ", pnl: ",pnl, "Bid: ",row[2],next_row[2],", ASK ",row[4], next_row[4] )
-    return (pnl, position, trade, close_rate, open_rate, current_pnl)
-    ## End calculate_pnl
-
 
 def get_pnl(df, max_position=1, comission=0):
-    deals = []
-    pnl = 0
-    position = 0
-    df_with_signals = df[(df['sell'] != 0) | (df['buy'] != 0)]
-
-    for idx, row in df_with_signals.iterrows():
-        if row['buy'] == 1 and position < max_position:
-            ###print(row)
-            current_trade = -row['buy'] * row["askpx_"]
-            position += 1
-            pnl = pnl + current_trade - comission
-            deals.append(current_trade)
-            ###print("Running PnL: {}, position: {}".format(pnl, position))
-        elif row['sell'] == 1 and position > -max_position:
-            ###print(row)
-            current_trade = row['sell'] * row["bidpx_"]
-            position -= 1
-            pnl = pnl + current_trade - comission
-            deals.append(current_trade)
-            ###print("Running PnL: {}, position: {}".format(pnl, position))
-
-    if position == 1:
-        day_closing_trade = df.iloc[-1]["bidpx_"]
-        pnl = pnl + day_closing_trade - comission
-        deals.append(day_closing_trade)
-        ###print("Close last hanging deal on the end of the day, PnL: {}, position: {}".format(pnl, position))
-    elif position == -1:
-        day_closing_trade = -df.iloc[-1]["askpx_"]
-        pnl = pnl + day_closing_trade - comission
-        deals.append(day_closing_trade)
-        ###print("Close last hanging deal on the end of the day, PnL: {}, position: {}".format(pnl, position))
-
-    print("Check PnL: {} vs {}".format(pnl, np.sum(deals)))
-    return pnl, len(deals)
+    """ PnL and number of deals of the buy / sell labels of df, a position left at the end of the day is closed
+        (see backtest.signal_deals)
+    """
+    deals = signal_deals(df["bidpx_"].values, df["askpx_"].values, df['buy'].values == 1, df['sell'].values == 1,
+                         max_position, comission)
+    print("Check PnL: {} vs {}".format(deals['pnl'], np.sum(deals['cash'])))
+    return deals['pnl'], deals['nr_deals']
 
 
 #def calculate_pnl(position, row, next_row, fee_per_roundtrip=0.):
@@ -1371,7 +1164,7 @@ def get_simulation(write_spans = True):
     
     Xdf, mean, std = standardize_inputs(Xdf, colgroups=[["askpx_", "bidpx_"], ])
     
-    ydf['hold'] = ydf.apply(lambda row: (1 if row['buy'] == 0 and row['sell'] == 0 else 0 ), axis=1)
+    ydf = label_frame(encode_signal(ydf['buy'].values - ydf['sell'].values), ydf.index)
     
     print("Buy signals:", ydf[ydf['buy'] !=0 ].shape[0])
     print("Sell signals:", ydf[ydf['sell'] !=0 ].shape[0])
@@ -1470,9 +1263,15 @@ def compare_array(hide_count, array1, array2, array3 = None):
 #########################################################
 
 
+# --rebuild prepares the training data again instead of using the cache
+rebuild = '--rebuild' in sys.argv
+if rebuild:
+    sys.argv.remove('--rebuild')
+
 if len(sys.argv) < 2 :
-    print ("Usage: UFCNN1.py action    with action from [cos_small, cos, tradcom, tradcom_simple, tracking] [model_name]")
+    print ("Usage: UFCNN1.py action    with action from [cos_small, cos, tradcom, tradcom_simple, tracking] [model_name] [--rebuild]")
     print("       ... with model_name = name of the saved file (without addition like _architecture...) to load the net from file")
+    print("       ... with --rebuild to prepare the data again instead of loading it from the cache")
 
     sys.exit()
 
@@ -1581,7 +1380,8 @@ if action == 'tradcom_simple':
                                                            sequence_length=sequence_length,
                                                            features_list=features_list,
                                                            output_dim=3,
-                                                           file_list=file_list)
+                                                           file_list=file_list,
+                                                           rebuild=rebuild)
 
         file_list = sorted(glob.glob('./training_data_large/prod_data_*v.txt'))[training_count:training_count+validation_count]
         print ("Validation file list ", file_list)
@@ -1593,7 +1393,8 @@ if action == 'tradcom_simple':
                                                                    file_list=file_list,
                                                                    mean=mean,
                                                                    std=std,
-                                                                   training_count=training_count)
+                                                                   training_count=training_count,
+                                                                   rebuild=rebuild)
 
     else:
         features_list = list(range(0,2))
@@ -1678,7 +1479,8 @@ if action == 'tradcom_simple':
                                                                        file_list=file_list,
                                                                        mean=mean,
                                                                        std=std,
-                                                                       training_count=training_count)
+                                                                       training_count=training_count,
+                                                                       rebuild=rebuild)
     else:
         print("Using simulated data for training...")
         (X_pred, y_pred, mean_, std_) = get_simulation()
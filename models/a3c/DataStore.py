@@ -1,14 +1,20 @@
 import numpy as np
 np.set_printoptions(threshold=np.inf)
 import pandas as pd
+import sys
 import os
 import glob
-import re
-import time
-import datetime
+import shutil
+import threading
 import itertools
 
-from constants import FILENAMES, STORE_PATH, FEATURES_LIST, COLGROUPS, UNMODIFIED_GROUP, BID_COL, ASK_COL
+from constants import FILENAMES, STORE_PATH, FEATURES_LIST, COLGROUPS, UNMODIFIED_GROUP, BID_COL, ASK_COL, SHARED_DATA_PATH
+
+# the tick store is shared with the scripts in models/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tickstore import convert_files, get_date, get_prefix, get_store_path
+from normalization import normalization_stats, standardize_array
+from datacache import DataCache, file_signature, COMPLETE_MARKER
 
 
 class DataStore(object):
@@ -17,7 +23,7 @@ class DataStore(object):
     def __init__(self, sequence_length=500, training_days=0, testing_days=0, mean=None, std=None, debug=False):
 
         """ 
-             if data is already stored in pickle format, read it from dist, otherwise create it 
+             the days are read from the tick store, input files not yet in the store are converted first
              training_days ... how many days are needed for training
              testing_days  ... how many days are needed for testing, is 0 if only training is used
                                if testing_days <> 0, then test data will be loaded
@@ -52,58 +58,34 @@ class DataStore(object):
                 print(" When specifiying testing days, mean and std must be given. Aborting.")
                 raise ValueError
 
-        ## Are there already files given
-        output_file_name = path + "/TradcomSave"+str(training_days)+"_"+str(testing_days)+".pickle" 
+        file_list = sorted(glob.glob(path+'/'+filenames))
 
-        Xdf = pd.DataFrame()
+        if len(file_list) == 0:
+            print ("Files "+path+"/"+filenames+" are needed. Please copy them into "+path+". Aborting.")
+            raise ValueError
 
-        if os.path.isfile(output_file_name):
-            Xdf = pd.read_pickle(output_file_name)
+        if testing_days != 0: 
+            start = training_days
+            end = training_days + testing_days
         else:
-	    # We need to create the file ourselves...
-            file_list = sorted(glob.glob(path+'/'+filenames))
-
-            if len(file_list) == 0:
-                print ("Files "+path+"/"+filenames+" are needed. Please copy them into "+path+". Aborting.")
-                raise ValueError
-
-            if testing_days != 0: 
-                start = training_days
-                end = training_days + testing_days
-            else:
-                start = 0
-                end = training_days
-
-            for i, filename in enumerate(file_list[start:end]):
-                # get the date...
-                r = re.compile('^\D*(\d*)\D*', re.UNICODE)
-                date = re.search(r, filename).group(1)
-                date_ux = time.mktime(datetime.datetime.strptime(date,"%Y%m%d").timetuple())
-
-                print("Input file #{:4}, date {}, filename {}".format(i, date, filename))
-
-                # load dataframes and reindex
-                Xdf_loc = pd.read_csv(filename, sep=" ", header = None,)
+            start = 0
+            end = training_days
 
-                if debug:
-                    print("Initial Dataframe")
-                    print(Xdf_loc.iloc[:10])
+        # the input files are converted into the tick store once, later runs read the days memory mapped
+        tick_store = convert_files(file_list[start:end], get_store_path(path, get_prefix(file_list[0])))
 
-                Xdf_loc['Milliseconds'] = Xdf_loc[0]
-                Xdf_loc['Date'] = pd.to_datetime(date_ux*1000*1000*1000)
-                Xdf_loc = Xdf_loc.set_index(['Date', 'Milliseconds'], append=False, drop=True)
-                if debug:
-                    print("Indexed Dataframe")
-                    print(Xdf_loc.iloc[:10])
+        dates = []
+        for i, filename in enumerate(file_list[start:end]):
+            date = get_date(filename)
+            print("Input file #{:4}, date {}, filename {}".format(i, date, filename))
+            dates.append(date)
 
-                Xdf = pd.concat([Xdf, Xdf_loc])
-                #print(Xdf.index[0])
-                #print(Xdf.index[-1])
+        # all days at once, indexed by Date and Milliseconds
+        Xdf = tick_store.get_days_frame(dates)
 
-
-            ## Store all the data in the file
-       
-            Xdf.to_pickle(output_file_name)
+        if debug:
+            print("Indexed Dataframe")
+            print(Xdf.iloc[:10])
 
 
         #select by features_list
@@ -111,6 +93,9 @@ class DataStore(object):
       
         # keep the bid and ask unmodified
         # unmodified_group = [2,4] # from above
+        if mean is None and std is None:
+            # mean and std of the training days are merged from the moments the tick store recorded per day
+            mean, std = normalization_stats(tick_store.get_moments(dates, columns=list(Xdf.columns)), Xdf.columns, colgroups=colgroups, unmodified_group=unmodified_group)
         self.Xdf, self.mean, self.std = self.standardize_inputs(Xdf, colgroups=colgroups, mean=mean, std=std, unmodified_group=unmodified_group)
         self.XdfBidAsk = self.Xdf[[bid_col,ask_col,bid_col_str,ask_col_str]]
         if debug:
@@ -122,7 +107,7 @@ class DataStore(object):
         # split the Xdf along the days... 
         #print (self.Xdf)
         for date_idx in self.Xdf.index.get_level_values(0).unique():
-            self.XdfBidAsk_array_list.append(self.XdfBidAsk.loc[date_idx].values.astype(np.float32))
+            self.XdfBidAsk_array_list.append(np.ascontiguousarray(self.XdfBidAsk.loc[date_idx].values, dtype=np.float32))
             self.Xdf_array_day.append(date_idx)
 
         ## TODO remove ?
@@ -137,24 +122,56 @@ class DataStore(object):
         ###print("Xdf")
         ###print(self.Xdf)
         for date_idx in self.Xdf.index.get_level_values(0).unique():
-            self.Xdf_array_list.append(self.Xdf.loc[date_idx].values.astype(np.float32))
+            self.Xdf_array_list.append(np.ascontiguousarray(self.Xdf.loc[date_idx].values, dtype=np.float32))
 
+        # the day arrays are shared between the threads (see get_data_store), nobody may modify them
+        for arr in self.Xdf_array_list + self.XdfBidAsk_array_list:
+            arr.flags.writeable = False
 
-    def standardize_columns(self, colgroup):
+    def save_shared(self, shared_path):
         """
-        Standardize group of columns together
-        colgroup: Pandas.DataFrame
-        returns: Pandas.DataFrames: Colum Group standardized, Mean of the colgroup, stddeviation of the colgroup
+        Write the standardized days into shared_path, where other processes map them read only (see load_shared).
+        Use a directory in memory like /dev/shm, then all processes share the same pages.
         """
-        _me = np.mean(colgroup.values.flatten())
-        centered = colgroup.sub(_me)
-        me = pd.DataFrame(np.full(len(colgroup.columns),_me), index=colgroup.columns)
-
-        _st = np.std(colgroup.values.flatten())
-        standardized = centered.div(_st)
-        st = pd.DataFrame(np.full(len(colgroup.columns),_st), index=colgroup.columns)
+        tmp_path = shared_path + ".tmp" + str(os.getpid())
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, "features.npy"), np.concatenate(self.Xdf_array_list))
+        np.save(os.path.join(tmp_path, "bidask.npy"), np.concatenate(self.XdfBidAsk_array_list))
+        pd.to_pickle({'lengths': [len(arr) for arr in self.Xdf_array_list],
+                      'days': self.Xdf_array_day,
+                      'mean': self.mean,
+                      'std': self.std,
+                      'features_length': self.features_length}, os.path.join(tmp_path, "meta.pickle"))
+        try:
+            os.rename(tmp_path, shared_path)
+        except OSError:
+            # another process was faster
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+        # readers only map directories with the marker (see get_data_store)
+        with open(os.path.join(shared_path, COMPLETE_MARKER), 'w'):
+            pass
+
+    @classmethod
+    def load_shared(cls, shared_path, sequence_length=500):
+        """
+        DataStore on the days written by save_shared, the arrays are memory mapped read only
+        """
+        store = cls.__new__(cls)
+        meta = pd.read_pickle(os.path.join(shared_path, "meta.pickle"))
+        features = np.load(os.path.join(shared_path, "features.npy"), mmap_mode='r')
+        bidask = np.load(os.path.join(shared_path, "bidask.npy"), mmap_mode='r')
+
+        ends = np.cumsum(meta['lengths'])
+        store.sequence_length = sequence_length
+        store.features_length = meta['features_length']
+        store.mean = meta['mean']
+        store.std = meta['std']
+        store.Xdf_array_day = meta['days']
+        store.Xdf_array_list = [features[end-length:end] for end, length in zip(ends, meta['lengths'])]
+        store.XdfBidAsk_array_list = [bidask[end-length:end] for end, length in zip(ends, meta['lengths'])]
+        return store
 
-        return standardized, me, st
 
     def standardize_inputs(self, Xdf, colgroups=None, mean=None, std=None, unmodified_group=None):
         """
@@ -162,62 +179,12 @@ class DataStore(object):
         Groups of features could be listed in order to be standardized together.
         Xdf: Pandas.DataFrame
         colgroups: list of lists of groups of features to be standardized together (e.g. bid/ask price, bid/ask size)
-        returns Xdf ...Pandas.DataFrame, mean ...Pandas.DataFrame, std ...Pandas.DataFrame
+        unmodified_group: these columns are kept unchanged as U<col> in addition
+        returns Xdf ...Pandas.DataFrame, mean ...Pandas.Series, std ...Pandas.Series
         """
+        values, labels, me, st = standardize_array(Xdf.values, Xdf.columns, colgroups=colgroups, unmodified_group=unmodified_group, mean=mean, std=std)
 
-        new_unmod_group = []
-        for unmod in unmodified_group:
-           # copy the unmodified column group
-           new_name = 'U'+str(unmod)
-           Xdf[new_name] = Xdf[unmod]
-           new_unmod_group.append(new_name)
-
-        df = pd.DataFrame()
-        me = pd.DataFrame()
-        st = pd.DataFrame()
-        #print(colgroups)
-        #print(Xdf)
-
-        for colgroup in colgroups:
-            _df,_me,_st = self.standardize_columns(Xdf[colgroup])
-            # if mean & std are given, do not multiply with colgroup mean
-            if mean is not None and std is not None:
-                _df = Xdf[colgroup]
-
-            df = pd.concat([df, _df], axis=1)
-            me = pd.concat([me, _me])
-            st = pd.concat([st, _st])
-    
-        #     _temp_list = list(itertools.chain.from_iterable(colgroups))
-
-        separate_features = [col for col in Xdf.columns if col not in list(itertools.chain.from_iterable(colgroups))]
-
-        if mean is None and std is None:
-            _me = Xdf[separate_features].mean()
-            _me[new_unmod_group] = 0.
-            _df = Xdf[separate_features].sub(_me)
-            _st = Xdf[separate_features].std()
-            _st[new_unmod_group] = 1.
-            _df = _df[separate_features].div(_st)
-            
-        else:
-            _df = Xdf[separate_features]
-
-        df = pd.concat([df, _df], axis=1)
-        me = pd.concat([me, _me])
-        st = pd.concat([st, _st])
-    
-        me = pd.Series(me[0])
-        st = pd.Series(st[0])
-
-        if mean is not None and std is not None:
-            mean[new_unmod_group] = 0.
-            std[new_unmod_group] = 1.
-
-            df = df.sub(mean)
-            df = df.div(std)
-
-        return df, me, st
+        return pd.DataFrame(values, index=Xdf.index, columns=labels, copy=False), pd.Series(me, index=labels), pd.Series(st, index=labels)
 
 
     def get_number_days(self):
@@ -236,16 +203,19 @@ class DataStore(object):
     def get_sequence(self, day_index=0, line_id=None):
         """
         get the last sequence_length elements from the Xdf by the index id
+        returns a read only float32 view into the day array, copy it before modifying
         """
         #return self.Xdf.ix[id-self.sequence_length:id].values
         if day_index > len(self.Xdf_array_list):
             raise ValueError
         arr = self.Xdf_array_list[day_index]
-        a = arr[line_id-self.sequence_length+1:line_id+1].astype(np.float32)
-        ##print("A ")
-        ##print(a.shape)
-        ##print(a)
-        return a
+        return arr[line_id-self.sequence_length+1:line_id+1]
+
+    def get_screen(self, day_index=0, line_id=None):
+        """
+        the sequence of get_sequence shaped (sequence_length, 1, features) like the network input, a read only view
+        """
+        return self.get_sequence(day_index, line_id)[:, np.newaxis, :]
 
     def get_bid_ask(self, day_index=0, line_id = None):
         """ 
@@ -255,6 +225,13 @@ class DataStore(object):
         arr = self.XdfBidAsk_array_list[day_index]
         return arr[line_id][0], arr[line_id][2], arr[line_id][1], arr[line_id][3]
 
+    def get_bid_ask_columns(self, day_index=0):
+        """
+        returns Bid, Ask of all ticks of the day, read only views into the day array
+        """
+        arr = self.XdfBidAsk_array_list[day_index]
+        return arr[:, 2], arr[:, 3]
+
     def get_day(self, day_index=0):
         """
         get the last sequence_length elements from the Xdf by the index id
@@ -263,3 +240,71 @@ class DataStore(object):
 
     def get_features_length(self):
         return self.features_length 
+
+
+# process wide registry of the loaded stores, see get_data_store
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def input_files(training_days=0, testing_days=0):
+    """
+    the day files a DataStore with these training_days, testing_days loads
+    """
+    file_list = sorted(glob.glob(STORE_PATH+'/'+FILENAMES))
+    if testing_days != 0:
+        return file_list[training_days:training_days + testing_days]
+    return file_list[:training_days]
+
+
+def shared_key(sequence_length=500, training_days=0, testing_days=0, mean=None, std=None):
+    """
+    key of the shared data of a DataStore: the arguments, the input files (name, mtime, size) and the
+    configuration the standardized days depend on, like DataCache.get_key
+    """
+    return DataCache(SHARED_DATA_PATH).get_key(sequence_length=sequence_length,
+                                               training_days=training_days,
+                                               testing_days=testing_days,
+                                               mean=mean,
+                                               std=std,
+                                               files=file_signature(input_files(training_days, testing_days)),
+                                               store_path=STORE_PATH,
+                                               filenames=FILENAMES,
+                                               features_list=FEATURES_LIST,
+                                               colgroups=COLGROUPS,
+                                               unmodified_group=UNMODIFIED_GROUP,
+                                               bid_col=BID_COL,
+                                               ask_col=ASK_COL)
+
+
+def get_data_store(sequence_length=500, training_days=0, testing_days=0, mean=None, std=None):
+    """
+    DataStore shared by all threads of the process: the first call loads and standardizes the days,
+    later calls with the same arguments get the same read only arrays.
+    If SHARED_DATA_PATH is set, the standardized days are also shared with other processes by memory mapping.
+    """
+    key = (sequence_length, training_days, testing_days,
+           None if mean is None else tuple(mean.items()),
+           None if std is None else tuple(std.items()))
+
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is not None:
+            return store
+
+        shared_path = None
+        if SHARED_DATA_PATH is not None:
+            shared_path = os.path.join(SHARED_DATA_PATH, shared_key(sequence_length, training_days, testing_days, mean, std))
+
+        if shared_path is not None and os.path.isfile(os.path.join(shared_path, COMPLETE_MARKER)):
+            print("Mapping shared data from ", shared_path)
+            store = DataStore.load_shared(shared_path, sequence_length=sequence_length)
+        else:
+            store = DataStore(sequence_length=sequence_length, training_days=training_days, testing_days=testing_days, mean=mean, std=std)
+            if shared_path is not None:
+                if not os.path.isdir(SHARED_DATA_PATH):
+                    os.makedirs(SHARED_DATA_PATH)
+                store.save_shared(shared_path)
+
+        _stores[key] = store
+        return store
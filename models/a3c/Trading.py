@@ -4,45 +4,17 @@ import numpy as np
 np.set_printoptions(threshold=np.inf)
 import random
 
-from constants import TRADING_FEE
 from constants import SHOW_TRADES
+from constants import LOCAL_T_MAX
+from trade_ledger import TradeLedger
 
 import matplotlib as mpl
 mpl.use('Agg')
 import matplotlib.pyplot as plt
 
-class Trade:
-    '''
-    Encapsulate a trade
-    Statistics can be calculated from a list of trades
-    '''
-
-    def __init__(self, position, entry_index, entry_bid_price, entry_ask_price):
-        assert position is not None and position != 0
-        self.position = position
-        self.entry_index = entry_index
-        self.exit_index = None
-        self.entry_price = entry_ask_price if position > 0 else entry_bid_price
-        self.exit_price = None
-        self.entry_spread = entry_ask_price - entry_bid_price
-        self.fee = TRADING_FEE
-
-    def close(self, exit_index, exit_bid_price, exit_ask_price):
-        self.exit_index = exit_index
-        self.exit_price = exit_bid_price if self.position > 0 else exit_ask_price
-
-    def is_long(self):
-        return self.position > 0
-
-    def is_short(self):
-        return self.position < 0
-
-    def pnl(self):
-        if self.entry_price is None or self.exit_price is None:
-            return None
-        else:
-            return self.position * (self.exit_price - self.entry_price) - abs(self.position)*self.fee
-
+# the training thread keeps the screens of up to LOCAL_T_MAX steps plus the current one and the one after a reset,
+# so that many screen buffers are used in turn before one is written again
+SCREEN_BUFFERS = LOCAL_T_MAX + 2
 
 class Trading:
 
@@ -57,6 +29,14 @@ class Trading:
 
         self.show_trades = SHOW_TRADES if show_trades is None else show_trades
 
+        # Current trade and daily trade history (see TradeLedger)
+        self.trade = None
+        self.trades = TradeLedger()
+
+        # preallocated screens (see get_screen)
+        self.screens = np.zeros((SCREEN_BUFFERS, sequence_length, 1, features_length), dtype=np.float32)
+        self.next_screen = 0
+
         #print("TRADING: Testing is" ,self.testing)
         #for i in range (self.data_store.get_number_days()):
         #    print("Day ",i,", len: ", self.data_store.get_day_length(i))
@@ -75,9 +55,8 @@ class Trading:
         self.current_index = self.sequence_length
         print("IDAY:" , self.iday, self.current_index)
 
-        # Current trade and daily trade history (see Trade class)
         self.trade = None
-        self.trades = []
+        self.trades.clear()
    
         _, self.current_rate_bid, _, self.current_rate_ask = self.data_store.get_bid_ask(self.iday, self.current_index)
 
@@ -86,12 +65,7 @@ class Trading:
         self.day_length = self.data_store.get_day_length(self.iday)
 
         # plot of the rates
-        bid = np.zeros(self.day_length)
-   
-        for i in range(self.day_length):
-            rate_bid_norm, rate_bid, rate_ask_norm, rate_ask = self.data_store.get_bid_ask(self.iday, i)
-            bid[i] = rate_bid
-            #print("I",i,", Bid: ",rate_bid, " norm", rate_bid_norm, rate_ask_norm, rate_ask )
+        bid, _ = self.data_store.get_bid_ask_columns(self.iday)
 
         fig = plt.figure()
         plt.plot(bid, lw=1)
@@ -101,18 +75,9 @@ class Trading:
         plt.savefig("Rate_"+str(testday)+".png")
         plt.close(fig)
 
-        plot_x = []
-        plot_y = []
-        total_pnl = 0.
-
         # and create a plot of the trades
-        for tr in self.trades:
-            plot_x.append(tr.entry_index)
-            total_pnl += tr.pnl()
-            plot_y.append(total_pnl)
-
-        #print(plot_x)
-        #print(plot_y)
+        plot_x = self.trades.closed()['entry_index']
+        plot_y = np.cumsum(self.trades.pnl())
 
         fig = plt.figure()
         plt.plot(plot_x, plot_y, '.')
@@ -128,6 +93,33 @@ class Trading:
 
     def get_reward(self, action):
         """ #reward, terminal, self._screen = get_reward(action)
+        step with the action and return the screen of the new tick
+        """
+        reward, terminal = self.step(action)
+        return reward, terminal, self.get_screen()
+
+    def get_screen(self):
+        """
+        the window of the current tick with the position written into its first element, in the next of the
+        SCREEN_BUFFERS preallocated screens: a screen stays valid for SCREEN_BUFFERS calls
+        """
+        screen = self.screens[self.next_screen]
+        self.next_screen = (self.next_screen + 1) % SCREEN_BUFFERS
+
+        window = self.data_store.get_screen(self.iday, self.current_index)
+        if window.shape == screen.shape:
+            screen[...] = window
+            # TODO: Why do we set input[0,0] to self.position?
+            screen[0,0,0] = self.position()
+        else:
+            # the window has not features_length columns: it is repeated / cut by np.resize after the position is set
+            inputs = window.reshape((self.sequence_length, -1)).copy()
+            inputs[0,0] = self.position()
+            screen[...] = np.resize(inputs, screen.shape)
+        return screen
+
+    def step(self, action):
+        """ reward, terminal = step(action)
         This is the version without sliding
         added a term in get_reward that adds winning trades twice to the reward - 
            once each tick it lasts (here winning and losing trades are treated equally), 
@@ -163,7 +155,7 @@ class Trading:
                         self.trade.close(self.current_index, self.current_rate_bid, self.current_rate_ask)
                         closed_trade = self.trade
 
-                    self.trade = Trade(-1, self.current_index, self.current_rate_bid, self.current_rate_ask)
+                    self.trade = self.trades.open(-1, self.current_index, self.current_rate_bid, self.current_rate_ask)
                     opened_trade = self.trade
 
             elif action == 1: # STAY/GO_LONG
@@ -175,7 +167,7 @@ class Trading:
                         self.trade.close(self.current_index, self.current_rate_bid, self.current_rate_ask)
                         closed_trade = self.trade
 
-                    self.trade = Trade(+1, self.current_index, self.current_rate_bid, self.current_rate_ask)
+                    self.trade = self.trades.open(+1, self.current_index, self.current_rate_bid, self.current_rate_ask)
                     opened_trade = self.trade
 
             elif action == 2: # STAY/GO_FLAT
@@ -187,10 +179,9 @@ class Trading:
                     closed_trade = self.trade
                     self.trade = None
 
-        # Close trade, append to history
+        # Closed trade, already in the history
         if closed_trade is not None:
             tr = closed_trade
-            self.trades.append(tr)
             if self.show_trades:
                 print("CLOSE: {:6} {:+2} entry {:9.5f} exit {:9.5f} = {:+8.5f}".format(tr.exit_index, tr.position, 
                     tr.entry_price, tr.exit_price, tr.pnl()))
@@ -233,18 +224,10 @@ class Trading:
             print('{} {:+2} {}/{} V {} R {}'.format(self.current_index, self.position(),
                 self.current_rate_bid, self.current_rate_ask, value, reward))
 
-        inputs = self.data_store.get_sequence(self.iday, self.current_index).copy()
-        # TODO: Why do we set input[0,0] to self.position?
-        inputs[0,0] = self.position()
-        screen = np.resize(inputs, (self.sequence_length,1,self.features_length))
-
         if terminal:
+            stats = self.trades.daily_stats()
             print ("Daily: iday/index/pnl/wins/losses/short/long/", self.iday, self.current_index,
-                sum(t.pnl() for t in self.trades),
-                sum(t.pnl() for t in self.trades if t.pnl() > 0),
-                sum(t.pnl() for t in self.trades if t.pnl() <= 0),
-                len([t for t in self.trades if t.is_short()]),
-                len([t for t in self.trades if t.is_long()]) )
+                stats['pnl'], stats['wins'], stats['losses'], stats['shorts'], stats['longs'])
 
-        return reward, terminal, screen
+        return reward, terminal
 
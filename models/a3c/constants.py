@@ -61,4 +61,7 @@ TRADING_FEE = 0.125
 
 SHOW_TRADES = False # Default, can be overwritten when calling GameState() or Trading()
 
+# Directory where the standardized days are shared between processes (e.g. '/dev/shm/a3c'), None shares them between threads only
+SHARED_DATA_PATH = None
+
 
@@ -9,7 +9,7 @@ from constants import STORE_PATH
 from constants import TRAINING_DAYS
 from constants import TESTING_DAYS
 
-from DataStore import DataStore 
+from DataStore import get_data_store
 from Trading import Trading 
 
 class GameState(object):
@@ -25,12 +25,12 @@ class GameState(object):
     training_days = TRAINING_DAYS
     testing_days = TESTING_DAYS
 
-    # Load the data
-    training_store = DataStore(training_days=training_days, sequence_length=self.sequence_length)
+    # Load the data, all game states of the process share the same stores
+    training_store = get_data_store(training_days=training_days, sequence_length=self.sequence_length)
 
     if testing:
         print("Set up for testing")
-        testing_store = DataStore(training_days=training_days, testing_days=testing_days, sequence_length=self.sequence_length, mean=training_store.mean, std=training_store.std)
+        testing_store = get_data_store(training_days=training_days, testing_days=testing_days, sequence_length=self.sequence_length, mean=training_store.mean, std=training_store.std)
         self.environment = Trading(data_store=testing_store, sequence_length=self.sequence_length, features_length=self.features_length, testing=testing, show_trades=show_trades)
     else:
         self.environment = Trading(data_store=training_store, sequence_length=self.sequence_length, features_length=self.features_length, testing=testing, show_trades=show_trades)
@@ -44,7 +44,7 @@ class GameState(object):
 
     reward, terminal, x_t = self.environment.get_reward(action) # Screen is 84 x 84
 
-    x_t = x_t.astype(np.float32)
+    x_t = np.asarray(x_t, dtype=np.float32)  # already float32, no copy
 
     x1 = x_t[1,0]
     x2 = x_t[2,0]
@@ -71,7 +71,7 @@ class GameState(object):
     if self._no_op_max > 0:
       no_op = np.random.randint(0, self._no_op_max + 1)
       for _ in range(no_op):
-         _, __, ___ = self.environment.get_reward(2) 
+         self.environment.step(2)
 
     _, _, x_t = self._process_frame(2, False) # Action GO_FLAT
     
@@ -0,0 +1,129 @@
+import numpy as np
+
+from constants import TRADING_FEE
+
+TRADE_DTYPE = np.dtype([('position', np.int32),
+                        ('entry_index', np.int64), ('exit_index', np.int64),
+                        ('entry_price', np.float64), ('exit_price', np.float64),
+                        ('entry_spread', np.float64), ('fee', np.float64)])
+
+
+class TradeLedger(object):
+    '''
+    Trades of a day in one preallocated structured array (TRADE_DTYPE), a trade is a row.
+    open appends a row, close fills in its exit, exit_index is -1 while a trade is open.
+    The capacity doubles when it is used up, so appending is amortized O(1).
+    Iterating gives Trade views of the closed trades, the statistics work on the columns.
+    '''
+
+    def __init__(self, capacity=1024):
+        self.rows = np.zeros(capacity, dtype=TRADE_DTYPE)
+        self.count = 0
+
+    def clear(self):
+        self.count = 0
+
+    def open(self, position, entry_index, entry_bid_price, entry_ask_price, fee=TRADING_FEE):
+        assert position is not None and position != 0
+        if self.count == len(self.rows):
+            self.rows = np.concatenate((self.rows, np.zeros(len(self.rows), dtype=TRADE_DTYPE)))
+        row = self.count
+        self.rows[row] = (position, entry_index, -1,
+                          entry_ask_price if position > 0 else entry_bid_price, np.nan,
+                          entry_ask_price - entry_bid_price, fee)
+        self.count += 1
+        return Trade(self, row)
+
+    def close(self, row, exit_index, exit_bid_price, exit_ask_price):
+        trade = self.rows[row]
+        trade['exit_index'] = exit_index
+        trade['exit_price'] = exit_bid_price if trade['position'] > 0 else exit_ask_price
+
+    def trades(self):
+        ''' the rows of the trades (open and closed) '''
+        return self.rows[:self.count]
+
+    def closed(self):
+        ''' the rows of the closed trades '''
+        trades = self.trades()
+        return trades[trades['exit_index'] >= 0]
+
+    def pnl(self):
+        ''' PnL of every closed trade '''
+        trades = self.closed()
+        return trades['position'] * (trades['exit_price'] - trades['entry_price']) - np.abs(trades['position']) * trades['fee']
+
+    def daily_stats(self):
+        ''' pnl, wins, losses (sum of the PnL of winning / losing trades), shorts, longs (number of trades) of the closed trades '''
+        pnl = self.pnl()
+        position = self.closed()['position']
+        return {'pnl': pnl.sum(),
+                'wins': pnl[pnl > 0].sum(),
+                'losses': pnl[pnl <= 0].sum(),
+                'shorts': int(np.count_nonzero(position < 0)),
+                'longs': int(np.count_nonzero(position > 0))}
+
+    def __len__(self):
+        return len(self.closed())
+
+    def __iter__(self):
+        for row in np.flatnonzero(self.trades()['exit_index'] >= 0):
+            yield Trade(self, row)
+
+
+class Trade(object):
+    '''
+    View of one trade (row) of a TradeLedger
+    '''
+    __slots__ = ('ledger', 'row')
+
+    def __init__(self, ledger, row):
+        self.ledger = ledger
+        self.row = row
+
+    def _get(self, field):
+        return self.ledger.rows[self.row][field]
+
+    @property
+    def position(self):
+        return int(self._get('position'))
+
+    @property
+    def entry_index(self):
+        return int(self._get('entry_index'))
+
+    @property
+    def exit_index(self):
+        index = int(self._get('exit_index'))
+        return None if index < 0 else index
+
+    @property
+    def entry_price(self):
+        return float(self._get('entry_price'))
+
+    @property
+    def exit_price(self):
+        return None if self.exit_index is None else float(self._get('exit_price'))
+
+    @property
+    def entry_spread(self):
+        return float(self._get('entry_spread'))
+
+    @property
+    def fee(self):
+        return float(self._get('fee'))
+
+    def close(self, exit_index, exit_bid_price, exit_ask_price):
+        self.ledger.close(self.row, exit_index, exit_bid_price, exit_ask_price)
+
+    def is_long(self):
+        return self.position > 0
+
+    def is_short(self):
+        return self.position < 0
+
+    def pnl(self):
+        if self.exit_price is None:
+            return None
+        else:
+            return self.position * (self.exit_price - self.entry_price) - abs(self.position)*self.fee
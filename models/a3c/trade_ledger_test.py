@@ -0,0 +1,69 @@
+import unittest
+import numpy as np
+
+from trade_ledger import TradeLedger, Trade
+
+
+class TestTradeLedger(unittest.TestCase):
+
+  def random_day(self, ledger, ticks=5000, seed=0):
+    ''' reverse / flatten the position at random ticks like Trading.get_reward, returns the PnL of every closed trade '''
+    rng = np.random.RandomState(seed)
+    bid = 100. + 0.25 * np.cumsum(rng.randint(-1, 2, size=ticks))
+    ask = bid + 0.25
+    expected = []
+    trade = None
+    for i in range(ticks):
+      action = rng.randint(0, 40)
+      if action > 2 and i < ticks - 1:
+        continue
+      if trade is not None and (i == ticks - 1 or action == 2 or (action == 0) == (trade.position > 0)):
+        trade.close(i, bid[i], ask[i])
+        exit_price = bid[i] if trade.position > 0 else ask[i]
+        expected.append(trade.position * (exit_price - trade.entry_price) - trade.fee)
+        trade = None
+      if trade is None and action < 2 and i < ticks - 1:
+        trade = ledger.open(-1 if action == 0 else 1, i, bid[i], ask[i], fee=0.125)
+    return np.array(expected)
+
+  def test_stats(self):
+    ledger = TradeLedger(capacity=4)
+    expected = self.random_day(ledger)
+
+    self.assertEqual(len(ledger), len(expected))
+    np.testing.assert_allclose(ledger.pnl(), expected)
+    np.testing.assert_allclose([t.pnl() for t in ledger], expected)
+
+    stats = ledger.daily_stats()
+    self.assertAlmostEqual(stats['pnl'], expected.sum())
+    self.assertAlmostEqual(stats['wins'], expected[expected > 0].sum())
+    self.assertAlmostEqual(stats['losses'], expected[expected <= 0].sum())
+    self.assertEqual(stats['shorts'] + stats['longs'], len(expected))
+    self.assertEqual(stats['shorts'], len([t for t in ledger if t.is_short()]))
+
+  def test_open_trade(self):
+    ledger = TradeLedger()
+    trade = ledger.open(1, 10, 99.75, 100.)
+    self.assertEqual(len(ledger), 0)
+    self.assertIsNone(trade.exit_index)
+    self.assertIsNone(trade.pnl())
+    self.assertEqual(trade.entry_price, 100.)
+    self.assertEqual(trade.entry_spread, 0.25)
+
+    trade.close(20, 101., 101.25)
+    self.assertEqual(len(ledger), 1)
+    self.assertEqual(trade.exit_index, 20)
+    self.assertAlmostEqual(trade.pnl(), 1. - trade.fee)
+
+    ledger.clear()
+    self.assertEqual(len(ledger), 0)
+    self.assertEqual(ledger.daily_stats()['pnl'], 0.)
+
+  def test_slots(self):
+    trade = TradeLedger().open(-1, 0, 1., 2.)
+    self.assertIsInstance(trade, Trade)
+    self.assertFalse(hasattr(trade, '__dict__'))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,244 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import numpy as np
+import pandas as pd
+
+
+LEDGER_COLUMNS = ['position', 'open_index', 'open_rate', 'close_index', 'close_rate', 'trade_pnl', 'pnl']
+SWEEP_COLUMNS = ['threshold', 'max_position', 'fee_per_roundtrip', 'pnl', 'trades', 'invested_tics']
+
+
+def predicted_signal(yp, threshold=0.):
+    """
+    signal of the predicted class probabilities: 1 where buy is above hold and sell, -1 where sell is above hold and buy, 0 else
+    yp: np-array (ticks x 3), columns sell, buy, hold
+    threshold: minimal probability of buy / sell for a signal
+    returns np-array of int8
+    """
+    yp = np.asarray(yp).reshape((-1, 3))
+    sell, buy, hold = yp[:, 0], yp[:, 1], yp[:, 2]
+    signal = np.zeros(len(yp), dtype=np.int8)
+    signal[(buy > hold) & (buy > sell) & (buy >= threshold)] = 1
+    signal[(sell > hold) & (sell > buy) & (sell >= threshold)] = -1
+    return signal
+
+
+def backtest(bid, ask, signal, fee_per_roundtrip=0., index=None):
+    """
+    Backtest of a signal per tick with the rules of calculate_pnl, in array operations:
+    the signal of tick k - 1 is acted on at tick k. A position is opened at the signal (long at the ask, short at the bid)
+    and held until the opposite signal, then it is closed (long at the bid, short at the ask) and the opposite one opened.
+    An open position earns the change of the bid (long) or ask (short) from tick to tick, a new one the difference between
+    the entry rate and the next bid (ask) less fee_per_roundtrip. On the tick of a reversal the old position earns nothing.
+    bid, ask, signal: np-arrays (signal -1, 0, 1)
+    index: labels of the ticks for the ledger, the tick positions by default
+    returns dict with
+        position ...position after every tick, pnl ...PnL of every tick, trade ...True where a position is opened,
+        total_pnl, nr_trades, invested_tics ...ticks with an open position,
+        ledger ...DataFrame of the trades (LEDGER_COLUMNS), the last one still open has NaN close_index, close_rate;
+                  trade_pnl of a trade is its PnL until it is closed, pnl the total PnL before its close tick
+    """
+    bid = np.asarray(bid, dtype=np.float64)
+    ask = np.asarray(ask, dtype=np.float64)
+    signal = np.asarray(signal)
+    n = len(bid)
+    if index is None:
+        index = np.arange(n)
+    index = np.asarray(index)
+
+    # the position follows the last non zero signal, one tick later
+    acted = np.concatenate(([0], signal[:-1])) if n > 0 else signal
+    nonzero = acted != 0
+    last = np.maximum.accumulate(np.where(nonzero, np.arange(n), -1))
+    position = np.where(last >= 0, acted[np.maximum(last, 0)], 0).astype(np.float64)
+    previous = np.concatenate(([0.], position[:-1])) if n > 0 else position
+    trade = nonzero & (position != previous)
+
+    pnl = np.zeros(n)
+    if n > 1:
+        # ticks 1 ... n - 1, row is the tick before
+        pos = position[1:]
+        held = ~trade[1:]
+        pnl[1:] = np.where(held & (pos < 0), pos * (ask[1:] - ask[:-1]),
+                           np.where(held & (pos > 0), pos * (bid[1:] - bid[:-1]), 0.))
+        opened = np.where(pos < 0, pos * (ask[1:] - bid[:-1]), pos * (bid[1:] - ask[:-1])) - fee_per_roundtrip
+        pnl[1:] = np.where(trade[1:], opened, pnl[1:])
+
+    # a trade is never opened at tick 0, the rates are those of the tick before
+    opens = np.flatnonzero(trade)
+    open_rate = np.where(position[opens] < 0, bid[opens - 1], ask[opens - 1])
+    # every trade but the last is closed where the next one opens, at the ask (short) or the bid (long)
+    closes = opens[1:]
+    close_rate = np.where(previous[closes] < 0, ask[closes - 1], bid[closes - 1])
+
+    cum_pnl = np.cumsum(pnl)
+    # the PnL of a trade runs from its open tick up to (without) the open tick of the next one
+    trade_pnl = np.add.reduceat(pnl, opens) if len(opens) > 0 else np.zeros(0)
+    still_open = [np.nan] if len(opens) > 0 else []
+
+    ledger = pd.DataFrame({'position': position[opens],
+                           'open_index': index[opens],
+                           'open_rate': open_rate,
+                           'close_index': np.append(index[closes], still_open),
+                           'close_rate': np.append(close_rate, still_open),
+                           'trade_pnl': trade_pnl,
+                           'pnl': np.append(cum_pnl[closes - 1], still_open)},
+                          columns=LEDGER_COLUMNS)
+
+    return {'position': position, 'pnl': pnl, 'trade': trade,
+            'total_pnl': cum_pnl[-1] if n > 0 else 0., 'nr_trades': len(opens),
+            'invested_tics': int(np.count_nonzero(position)), 'ledger': ledger}
+
+
+def print_trade_data(ledger, day=None):
+    """
+    one TradeData line per closed trade like check_prediction used to print them
+    """
+    for nr, trade in enumerate(ledger.itertuples(index=False), 1):
+        if np.isnan(trade.close_rate):
+            continue
+        print("TradeData;", nr, ";", trade.position, ";", day, ";", trade.open_index, ";", trade.open_rate, ";",
+              int(trade.close_index), ";", trade.close_rate, ";", trade.trade_pnl, ";", trade.pnl)
+
+
+def saturating_cumsum(steps, lower, upper, start=0):
+    """
+    positions of adding up steps (along the last axis) starting at start where every sum is clipped to lower ... upper:
+    position[k] = min(max(position[k - 1] + steps[k], lower), upper)
+    lower, upper, start broadcast against steps, e.g. a column of limits for a 2-D array of step sequences.
+    Every step is the map x -> min(max(x + a, l), h), two of them combine to another one of that form, so all prefixes
+    are found by log2(len(steps)) passes of array operations (prefix scan).
+    """
+    a = np.asarray(steps)
+    a = a.astype(np.result_type(a.dtype, np.asarray(lower).dtype, np.asarray(upper).dtype, np.asarray(start).dtype))
+    l = np.broadcast_to(lower, a.shape).astype(a.dtype)
+    h = np.broadcast_to(upper, a.shape).astype(a.dtype)
+    shift = 1
+    while shift < a.shape[-1]:
+        # the prefix ending shift ticks before first, then the one ending here
+        a_, l_, h_ = a[..., shift:], l[..., shift:], h[..., shift:]
+        new_l = np.clip(l[..., :-shift] + a_, l_, h_)
+        new_h = np.clip(h[..., :-shift] + a_, l_, h_)
+        a[..., shift:] = a[..., :-shift] + a_
+        l[..., shift:] = new_l
+        h[..., shift:] = new_h
+        shift *= 2
+    return np.minimum(np.maximum(start + a, l), h)
+
+
+def signal_deals(bid, ask, buy, sell, max_position=1, comission=0., chained=False):
+    """
+    deals of buy / sell signals and their PnL, the position is flat at the start of the day
+    bid, ask: np-arrays of the rates
+    buy, sell: np-arrays of the units to buy / sell per tick (e.g. the buy / sell labels, Buy Mod / Sell Mod),
+               buy wins where both are set
+    chained=False: the signals are added to the position as long as it stays within -max_position ... max_position
+                   (clipped, like a buy at max_position is skipped), a position left at the end of the day is closed
+                   at the last bid / ask (signals.pnl for point signals, which always end flat)
+    chained=True: every signal turns the position to max_position (buy) or -max_position (sell), the last signal
+                  closes it (signals.pnl with chained=True for max_position 1)
+    Buys are at the ask, sells at the bid, comission is paid per deal (tick with a change of the position).
+    returns dict with
+        position ...position after every tick, tick, units, cash ...the deals: tick, units bought (< 0: sold) and cash flow
+        (without comission), nr_deals, units_traded ...sum of the units of all deals, pnl ...cash flows less comission
+    """
+    bid = np.asarray(bid, dtype=np.float64)
+    ask = np.asarray(ask, dtype=np.float64)
+    buy = np.asarray(buy)
+    sell = np.where(buy != 0, 0, np.asarray(sell))
+    n = len(bid)
+
+    if not chained:
+        position = saturating_cumsum(buy - sell, -max_position, max_position)
+    else:
+        # the position is the direction of the last signal, flat after the last one
+        signals = np.flatnonzero((buy != 0) | (sell != 0))
+        target = np.where(buy != 0, max_position, -max_position)
+        last = np.maximum.accumulate(np.where((buy != 0) | (sell != 0), np.arange(n), -1))
+        position = np.where(last >= 0, target[np.maximum(last, 0)], 0)
+        if len(signals) > 0:
+            position[signals[-1]:] = 0
+
+    units = np.diff(np.concatenate(([0], position)))
+    tick = np.flatnonzero(units)
+    units = units[tick]
+    cash = -units * np.where(units > 0, ask[tick], bid[tick])
+
+    if n > 0 and position[-1] != 0:
+        # close what is left at the end of the day
+        close = -position[-1]
+        tick = np.append(tick, n - 1)
+        units = np.append(units, close)
+        cash = np.append(cash, -close * (ask[-1] if close > 0 else bid[-1]))
+
+    return {'position': position, 'tick': tick, 'units': units, 'cash': cash,
+            'nr_deals': len(tick), 'units_traded': np.abs(units).sum(), 'pnl': np.sum(cash) - comission * len(tick)}
+
+
+def sweep(bid, ask, yp, thresholds=(0.,), max_positions=(1,), fees_per_roundtrip=(0.,), rule='get_pnl'):
+    """
+    PnL of the predictions of a day for a grid of settings in one pass. The signals are predicted_signal with the threshold,
+    rule selects which PnL is reproduced:
+    'get_pnl' ...the deals of get_pnl (signal_deals): every buy / sell signal buys / sells one unit at the ask / bid of
+                 its tick within -max_position ... max_position, what is left is closed at the end of the day
+    'backtest' ...the PnL of check_prediction (backtest, total_pnl): every signal turns the position to max_position
+                  (buy) or -max_position (sell), dealt at the rates of the signal tick, the signal of the last tick is
+                  not acted on, the position is closed at the last bid / ask. For max_position 1 pnl, trades and
+                  invested_tics are total_pnl, nr_trades and invested_tics of backtest with fee_per_roundtrip.
+    fee_per_roundtrip is paid per unit opened (and so closed again).
+    The signals of all thresholds and max_positions are rows of one 2-D array (threshold x max_position rows),
+    the fees broadcast over the trades of every row.
+    bid, ask: np-arrays, yp: predicted class probabilities (ticks x 3, columns sell, buy, hold)
+    returns DataFrame with one row per setting, SWEEP_COLUMNS
+    """
+    if rule not in ('get_pnl', 'backtest'):
+        print("Unknown sweep rule {}, use 'get_pnl' or 'backtest'. Aborting.".format(rule))
+        raise ValueError
+
+    bid = np.asarray(bid, dtype=np.float64)
+    ask = np.asarray(ask, dtype=np.float64)
+    yp = np.asarray(yp, dtype=np.float64).reshape((-1, 3))
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    max_positions = np.asarray(max_positions, dtype=np.int64)
+    fees = np.asarray(fees_per_roundtrip, dtype=np.float64)
+
+    # signal of every threshold: the one without threshold where its probability is high enough
+    signal = predicted_signal(yp)
+    probability = yp[np.arange(len(yp)), np.where(signal > 0, 1, 0)]
+    signals = signal * (probability >= thresholds[:, np.newaxis])
+
+    # rows threshold x max_position
+    steps = np.repeat(signals, len(max_positions), axis=0).astype(np.int64)
+    limits = np.tile(max_positions, len(thresholds))[:, np.newaxis]
+    if rule == 'backtest' and steps.shape[1] > 0:
+        # a step of 2 * max_position always reaches the limit: the position follows the last signal,
+        # the last one is acted on after the end of the day
+        steps *= 2 * limits
+        steps[:, -1] = 0
+    position = saturating_cumsum(steps, -limits, limits)
+
+    previous = np.concatenate((np.zeros((len(position), 1), dtype=position.dtype), position[:, :-1]), axis=1)
+    units = position - previous
+    cash = -np.sum(units * np.where(units > 0, ask, bid), axis=1)
+    if len(bid) > 0:
+        last = position[:, -1]
+        cash += last * np.where(last > 0, bid[-1], ask[-1])
+    # units opened: growth of the position, all of it where it changes sides
+    opened = np.where(position * previous < 0, np.abs(position), np.maximum(np.abs(position) - np.abs(previous), 0))
+    trades = opened.sum(axis=1)
+    if rule == 'backtest':
+        # backtest holds the position from the tick after the signal
+        invested_tics = np.count_nonzero(position[:, :-1], axis=1)
+    else:
+        invested_tics = np.count_nonzero(position, axis=1)
+
+    pnl = cash[:, np.newaxis] - trades[:, np.newaxis] * fees
+    rows = len(position)
+    return pd.DataFrame({'threshold': np.repeat(np.repeat(thresholds, len(max_positions)), len(fees)),
+                         'max_position': np.repeat(limits[:, 0], len(fees)),
+                         'fee_per_roundtrip': np.tile(fees, rows),
+                         'pnl': pnl.reshape(-1),
+                         'trades': np.repeat(trades, len(fees)),
+                         'invested_tics': np.repeat(invested_tics, len(fees))},
+                        columns=SWEEP_COLUMNS)
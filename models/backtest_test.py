@@ -0,0 +1,305 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from backtest import predicted_signal, backtest, saturating_cumsum, signal_deals, sweep
+from signals import find_all_signals, chained_deals, filter_chained, pnl
+from signals_test import random_quotes
+
+
+def calculate_pnl(position, row, next_row, fee_per_roundtrip=0.):
+    """
+    The former calculate_pnl of UFCNN_functional.py (row: tick before, next_row: current tick, columns 2 bid, 4 ask)
+    """
+    close_rate = 0.
+    open_rate = 0.
+    current_pnl = 0
+
+    if row is None or next_row is None:
+        return (0.,0., False, close_rate, open_rate, 0.0)
+
+    pnl = 0.
+    signal = row['signal']
+
+    if position < -0.1 and signal > 0.1:
+        close_rate = row[4]
+        position = 0.
+
+    if position > 0.1 and signal < -0.1:
+        close_rate = row[2]
+        position = 0.
+
+    if position < -0.1:
+        pnl = position * (next_row[4] - row[4])
+
+    if position >  0.1:
+        pnl = position * (next_row[2] - row[2])
+
+    trade = False
+    if position == 0. and abs(signal) > 0.1:
+        position = signal
+        if position < -0.1:
+            current_pnl = position * (next_row[4] - row[2])
+            open_rate = row[2]
+
+        if position >  0.1:
+            current_pnl = position * (next_row[2] - row[4])
+            open_rate = row[4]
+
+        current_pnl -= fee_per_roundtrip
+        trade = True
+
+    pnl = pnl + current_pnl
+    return (pnl, position, trade, close_rate, open_rate, current_pnl)
+
+
+def check_prediction_loop(Xdf2, fee_per_roundtrip=0.):
+    """
+    The former row loop of check_prediction, returns pnl, nr_trades, invested_tics and the TradeData rows
+    """
+    invested_tics = 0
+    pnl = 0.
+    position = 0.
+    last_row = None
+    nr_trades = 0
+    trade_pnl = 0.
+    last_open_rate = None
+    last_position = 0
+    open_index = 0
+    trades = []
+
+    for (index, row) in Xdf2.iterrows():
+        (pnl_, position, is_trade, close_rate, open_rate, current_pnl) = calculate_pnl(position, last_row, row, fee_per_roundtrip)
+
+        last_row = row
+        if position < -0.1 or position > 0.1:
+            invested_tics +=1
+
+        if is_trade:
+            if last_open_rate is not None:
+                trades.append([last_position, open_index, last_open_rate, index, close_rate, trade_pnl, pnl])
+
+            nr_trades += 1
+            trade_pnl = current_pnl
+            open_index = index
+            last_position = position
+            last_open_rate = open_rate
+        else:
+            trade_pnl += pnl_
+
+        pnl += pnl_
+    return pnl, nr_trades, invested_tics, trades
+
+
+def get_pnl_loop(df, max_position=1, comission=0):
+    """
+    The former get_pnl (without the prints): deals of the buy / sell labels, a hanging position of 1 closed at the end
+    """
+    deals = []
+    pnl = 0
+    position = 0
+    df_with_signals = df[(df['sell'] != 0) | (df['buy'] != 0)]
+
+    for idx, row in df_with_signals.iterrows():
+        if row['buy'] == 1 and position < max_position:
+            current_trade = -row['buy'] * row["askpx_"]
+            position += 1
+            pnl = pnl + current_trade - comission
+            deals.append(current_trade)
+        elif row['sell'] == 1 and position > -max_position:
+            current_trade = row['sell'] * row["bidpx_"]
+            position -= 1
+            pnl = pnl + current_trade - comission
+            deals.append(current_trade)
+
+    if position == 1:
+        day_closing_trade = df.iloc[-1]["bidpx_"]
+        pnl = pnl + day_closing_trade - comission
+        deals.append(day_closing_trade)
+    elif position == -1:
+        day_closing_trade = -df.iloc[-1]["askpx_"]
+        pnl = pnl + day_closing_trade - comission
+        deals.append(day_closing_trade)
+    return pnl, len(deals)
+
+
+def random_predictions(ticks, seed=0):
+    """
+    frame like check_prediction builds it: bid (2) and ask (4) of a random walk, predicted sell, buy, hold, signal
+    """
+    rng = np.random.RandomState(seed)
+    bid = 1000. + 0.25 * np.cumsum(rng.randint(-1, 2, size=ticks))
+    ask = bid + 0.25 * rng.randint(1, 3, size=ticks)
+    yp = rng.dirichlet([0.3, 0.3, 3.], size=ticks)
+    Xdf2 = pd.DataFrame({2: bid, 4: ask, 'sell': yp[:, 0], 'buy': yp[:, 1], 'hold': yp[:, 2]})
+    Xdf2['signal'] = predicted_signal(yp)
+    return Xdf2
+
+
+class PredictedSignalTest(unittest.TestCase):
+    def test_signal(self):
+        yp = np.array([[0.1, 0.8, 0.1], [0.6, 0.2, 0.2], [0.2, 0.2, 0.6], [0.4, 0.4, 0.2], [0.3, 0.3, 0.3]])
+        np.testing.assert_array_equal(predicted_signal(yp), [1, -1, 0, 0, 0])
+        np.testing.assert_array_equal(predicted_signal(yp.reshape((1, 5, 3))), [1, -1, 0, 0, 0])
+
+
+class BacktestTest(unittest.TestCase):
+    def assertParity(self, Xdf2, fee_per_roundtrip=0.):
+        result = backtest(Xdf2[2].values, Xdf2[4].values, Xdf2['signal'].values, fee_per_roundtrip)
+        pnl, nr_trades, invested_tics, trades = check_prediction_loop(Xdf2, fee_per_roundtrip)
+
+        self.assertAlmostEqual(result['total_pnl'], pnl, places=6)
+        self.assertEqual(result['nr_trades'], nr_trades)
+        self.assertEqual(result['invested_tics'], invested_tics)
+
+        ledger = result['ledger']
+        self.assertEqual(len(ledger), nr_trades)
+        closed = ledger.iloc[:-1]
+        if len(trades) > 0:
+            np.testing.assert_allclose(closed.values, np.array(trades, dtype=float), rtol=0, atol=1e-6)
+
+    def test_parity_random(self):
+        for seed in range(3):
+            self.assertParity(random_predictions(2000, seed=seed))
+
+    def test_parity_fee(self):
+        self.assertParity(random_predictions(1000, seed=5), fee_per_roundtrip=0.5)
+
+    def test_no_trades(self):
+        Xdf2 = random_predictions(50, seed=1)
+        Xdf2['signal'] = 0
+        result = backtest(Xdf2[2].values, Xdf2[4].values, Xdf2['signal'].values)
+        self.assertEqual(result['total_pnl'], 0.)
+        self.assertEqual(result['nr_trades'], 0)
+        self.assertEqual(len(result['ledger']), 0)
+
+
+class SaturatingCumsumTest(unittest.TestCase):
+    def test_parity(self):
+        rng = np.random.RandomState(0)
+        for lower, upper in [(-1, 1), (-3, 3), (0, 5), (-2, 0)]:
+            steps = rng.randint(-2, 3, size=1000)
+            expected = []
+            position = 0
+            for step in steps:
+                position = min(max(position + step, lower), upper)
+                expected.append(position)
+            np.testing.assert_array_equal(saturating_cumsum(steps, lower, upper), expected)
+
+    def test_short(self):
+        self.assertEqual(len(saturating_cumsum(np.zeros(0, dtype=int), -1, 1)), 0)
+        np.testing.assert_array_equal(saturating_cumsum([5], -1, 1), [1])
+
+
+class SignalDealsTest(unittest.TestCase):
+    def labels(self, ticks, seed=0):
+        df = random_quotes(ticks, seed)
+        rng = np.random.RandomState(seed)
+        label = rng.choice(3, size=ticks, p=[0.05, 0.05, 0.9])
+        df['sell'] = (label == 0).astype(float)
+        df['buy'] = (label == 1).astype(float)
+        return df
+
+    def test_parity_get_pnl(self):
+        for seed in range(3):
+            df = self.labels(2000, seed)
+            for comission in [0., 0.1]:
+                deals = signal_deals(df["bidpx_"].values, df["askpx_"].values, df['buy'].values == 1,
+                                     df['sell'].values == 1, 1, comission)
+                expected_pnl, expected_deals = get_pnl_loop(df, 1, comission)
+                self.assertAlmostEqual(deals['pnl'], expected_pnl, places=6)
+                self.assertEqual(deals['nr_deals'], expected_deals)
+
+    def test_max_position(self):
+        df = self.labels(2000, 4)
+        deals = signal_deals(df["bidpx_"].values, df["askpx_"].values, df['buy'].values == 1, df['sell'].values == 1, 3)
+        self.assertTrue((np.abs(deals['position']) <= 3).all())
+        # flat at the end of the day, every unit bought is sold
+        self.assertEqual(deals['units'].sum(), 0)
+        self.assertAlmostEqual(deals['pnl'], deals['cash'].sum(), places=9)
+
+    def test_signals_pnl_point(self):
+        df = find_all_signals(random_quotes(5000, seed=1))
+        deals = signal_deals(df["bidpx_"].values, df["askpx_"].values, df['Buy Mod'].values, df['Sell Mod'].values,
+                             comission=0.02)
+        expected_pnl, expected_deals = pnl(df, chained=False, comission=0.02)
+        self.assertAlmostEqual(deals['pnl'], expected_pnl, places=6)
+        self.assertEqual(deals['nr_deals'], expected_deals)
+
+    def test_signals_pnl_chained(self):
+        df = random_quotes(5000, seed=2)
+        bid = df["bidpx_"].values
+        ask = df["askpx_"].values
+        masks = [np.zeros(len(df), dtype=bool) for _ in range(4)]
+        for mask, positions in zip(masks, chained_deals(bid, ask)):
+            mask[positions] = True
+        buy, sell_close, sell, buy_close = masks
+        df['Buy'], df['Sell'] = filter_chained(bid, ask, buy, buy_close, sell, sell_close)
+        deals = signal_deals(bid, ask, df['Buy'].values, df['Sell'].values, chained=True)
+        expected_pnl, expected_deals = pnl(df, chained=True)
+        self.assertGreater(expected_deals, 0)
+        self.assertAlmostEqual(deals['pnl'], expected_pnl, places=6)
+        # every signal but the first and the last reverses the position, a deal of 2 units
+        self.assertEqual(deals['units_traded'], expected_deals)
+
+
+class SweepTest(unittest.TestCase):
+    def test_grid(self):
+        Xdf2 = random_predictions(3000, seed=7)
+        yp = Xdf2[['sell', 'buy', 'hold']].values
+        thresholds = [0., 0.5, 0.7]
+        max_positions = [1, 2, 5]
+        fees = [0., 0.1, 0.25]
+        table = sweep(Xdf2[2].values, Xdf2[4].values, yp, thresholds, max_positions, fees)
+        self.assertEqual(len(table), 27)
+
+        for row in table.itertuples(index=False):
+            signal = predicted_signal(yp, row.threshold)
+            deals = signal_deals(Xdf2[2].values, Xdf2[4].values, signal == 1, signal == -1, row.max_position)
+            self.assertEqual(row.invested_tics, np.count_nonzero(deals['position']))
+            if row.max_position == 1:
+                # every unit is opened and closed in deals of one unit
+                self.assertEqual(2 * row.trades, deals['units_traded'])
+            self.assertAlmostEqual(row.pnl, deals['pnl'] - row.fee_per_roundtrip * row.trades, places=6)
+
+    def test_backtest_rule(self):
+        Xdf2 = random_predictions(3000, seed=8)
+        bid, ask = Xdf2[2].values, Xdf2[4].values
+        yp = Xdf2[['sell', 'buy', 'hold']].values
+        thresholds = [0., 0.6]
+        fees = [0., 0.3]
+        table = sweep(bid, ask, yp, thresholds, [1, 3], fees, rule='backtest')
+
+        for row in table.itertuples(index=False):
+            result = backtest(bid, ask, predicted_signal(yp, row.threshold), row.fee_per_roundtrip)
+            self.assertAlmostEqual(row.pnl, row.max_position * result['total_pnl'], places=6)
+            self.assertEqual(row.trades, row.max_position * result['nr_trades'])
+            self.assertEqual(row.invested_tics, result['invested_tics'])
+
+    def test_get_pnl_rule(self):
+        Xdf2 = random_predictions(2000, seed=9)
+        yp = Xdf2[['sell', 'buy', 'hold']].values
+        row = sweep(Xdf2[2].values, Xdf2[4].values, yp, [0.5], [1], [0.]).iloc[0]
+        df = pd.DataFrame({'bidpx_': Xdf2[2].values, 'askpx_': Xdf2[4].values})
+        signal = predicted_signal(yp, 0.5)
+        df['buy'] = (signal == 1).astype(float)
+        df['sell'] = (signal == -1).astype(float)
+        expected_pnl, _ = get_pnl_loop(df, 1, 0.)
+        self.assertAlmostEqual(row['pnl'], expected_pnl, places=6)
+
+    def test_unknown_rule(self):
+        with self.assertRaises(ValueError):
+            sweep(np.ones(3), np.ones(3), np.ones((3, 3)), rule='other')
+
+    def test_threshold(self):
+        yp = np.array([[0.1, 0.6, 0.3], [0.5, 0.2, 0.3], [0.1, 0.8, 0.1], [0.7, 0.2, 0.1]])
+        np.testing.assert_array_equal(predicted_signal(yp, 0.55), [1, 0, 1, -1])
+        table = sweep(np.array([10., 11., 12., 13.]), np.array([11., 12., 13., 14.]), yp, [0., 0.55, 0.9])
+        np.testing.assert_array_equal(table['trades'], [2, 1, 0])
+        # threshold 0: buy at 11, sell at 11, buy at 13, sell at 13; 0.55: buy at 11 (the second buy is over the limit), sell at 13
+        np.testing.assert_allclose(table['pnl'], [0., 2., 0.])
+
+
+if __name__ == '__main__':
+    unittest.main()
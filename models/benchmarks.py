@@ -0,0 +1,122 @@
+"""
+Timings of the signal generation, span expansion, chained deals, optimal strategy, trading simulation, backtest
+and parameter sweep of predictions on synthetic bid/ask ticks.
+Usage: benchmarks.py [ticks ...]   e.g. benchmarks.py 100000 1000000 10000000
+The former loop implementation is only timed up to LOOP_MAX_TICKS.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import sys
+import time
+
+import numpy as np
+
+from signals import find_all_signals, best_candidates, profitable_pairs, make_spans, chained_signal_events
+from signals_test import find_all_signals_loop, make_spans_loop, find_signals_loop, random_quotes
+from viterbi import find_optimal_strategy, simulate_trading
+from viterbi_test import find_optimal_strategy_loop, simulate_trading_loop, random_prices
+from backtest import backtest, sweep
+from backtest_test import check_prediction_loop, random_predictions
+
+LOOP_MAX_TICKS = 100000
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+
+
+def bench_find_all_signals(ticks):
+    df = random_quotes(ticks)
+    bid = df["bidpx_"].values
+    ask = df["askpx_"].values
+
+    t_arrays, (positions, types) = timed(best_candidates, bid, ask)
+    t_pairs, _ = timed(profitable_pairs, bid, ask, positions, types)
+    t_frame, _ = timed(find_all_signals, df)
+    print("find_all_signals {:>9} ticks: arrays {:8.3f}s  DataFrame {:8.3f}s".format(ticks, t_arrays + t_pairs, t_frame), end="")
+
+    if ticks <= LOOP_MAX_TICKS:
+        t_loop, _ = timed(find_all_signals_loop, bid.tolist(), ask.tolist())
+        print("  loop {:8.3f}s".format(t_loop), end="")
+    print()
+
+
+def bench_make_spans(ticks):
+    df = find_all_signals(random_quotes(ticks))
+    t_spans, _ = timed(make_spans, df, "Buy")
+    print("make_spans       {:>9} ticks: {:8.3f}s".format(ticks, t_spans), end="")
+
+    if ticks <= LOOP_MAX_TICKS:
+        t_loop, _ = timed(make_spans_loop, df["askpx_"].tolist(), df["Buy"].tolist())
+        print("  loop {:8.3f}s".format(t_loop), end="")
+    print()
+
+
+def bench_chained_signals(ticks):
+    df = random_quotes(ticks)
+    t_events, _ = timed(chained_signal_events, df)
+    print("chained deals    {:>9} ticks: {:8.3f}s".format(ticks, t_events), end="")
+
+    if ticks <= LOOP_MAX_TICKS:
+        t_loop, _ = timed(find_signals_loop, df["bidpx_"].tolist(), df["askpx_"].tolist(), "Buy")
+        print("  loop (Buy side only) {:8.3f}s".format(t_loop), end="")
+    print()
+
+
+def bench_optimal_strategy(ticks):
+    prices = random_prices(ticks)
+    for max_position in [3, 10]:
+        t_opt, _ = timed(find_optimal_strategy, prices, max_position)
+        print("optimal strategy {:>9} ticks, max_position {:>2}: {:8.3f}s".format(ticks, max_position, t_opt), end="")
+
+        if ticks <= LOOP_MAX_TICKS:
+            t_loop, _ = timed(find_optimal_strategy_loop, prices, max_position)
+            print("  loop {:8.3f}s".format(t_loop), end="")
+        print()
+
+
+def bench_simulate_trading(ticks, strategies=20):
+    prices = random_prices(ticks)
+    batch = np.random.RandomState(0).randint(-1, 2, size=(strategies, ticks))
+    t_one, _ = timed(simulate_trading, prices, batch[0])
+    t_batch, _ = timed(simulate_trading, prices, batch, np.linspace(0., 0.2, strategies))
+    print("simulate trading {:>9} ticks: {:8.3f}s  batch of {} {:8.3f}s".format(ticks, t_one, strategies, t_batch), end="")
+
+    if ticks <= LOOP_MAX_TICKS:
+        t_loop, _ = timed(simulate_trading_loop, prices, batch[0])
+        print("  loop {:8.3f}s".format(t_loop), end="")
+    print()
+
+
+def bench_backtest(ticks):
+    Xdf2 = random_predictions(ticks)
+    t_backtest, _ = timed(backtest, Xdf2[2].values, Xdf2[4].values, Xdf2['signal'].values)
+    print("backtest         {:>9} ticks: {:8.3f}s".format(ticks, t_backtest), end="")
+
+    if ticks <= LOOP_MAX_TICKS:
+        t_loop, _ = timed(check_prediction_loop, Xdf2)
+        print("  loop {:8.3f}s".format(t_loop), end="")
+    print()
+
+
+def bench_sweep(ticks):
+    Xdf2 = random_predictions(ticks)
+    thresholds = np.linspace(0., 0.9, 10)
+    t_sweep, table = timed(sweep, Xdf2[2].values, Xdf2[4].values, Xdf2[['sell', 'buy', 'hold']].values,
+                           thresholds, [1, 2, 3, 5], [0., 0.05, 0.1, 0.25])
+    print("sweep            {:>9} ticks, {} settings: {:8.3f}s".format(ticks, len(table), t_sweep))
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10**5, 10**6, 10**7]
+    for ticks in sizes:
+        bench_find_all_signals(ticks)
+        bench_make_spans(ticks)
+        bench_chained_signals(ticks)
+        bench_optimal_strategy(ticks)
+        bench_simulate_trading(ticks)
+        bench_backtest(ticks)
+        bench_sweep(ticks)
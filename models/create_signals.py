@@ -4,93 +4,119 @@ from __future__ import print_function
 import sys
 
 import numpy as np
-import matplotlib.pyplot as plt
 
 import pandas as pd
 pd.set_option('display.width',    1000)
 pd.set_option('display.max_rows', 1000)
 
-def __main__():
-    """ 
-    Trading Simulator from curriculumvite trading competition
-    see also the arvix Paper from Roni Mittelman http://arxiv.org/pdf/1508.00317v1
-    Modified by Ernst.Tmp@gmx.at
-    
-    produces data to train a neural net
+from signal_store import events_file_name, save_events, signal_file_name
+
+
+def market_price(bid, bidsz, ask, asksz):
     """
-    # Trades smaller than this will be omitted
-    min_trade_amount = 1
+    size weighted market price, where there are no sizes bid + ask / 2. as it has always been computed
+    bid, bidsz, ask, asksz: np-arrays
+    """
+    size = bidsz + asksz
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weighted = (bid * asksz + ask * bidsz) / size
+    return np.where(size > 0, weighted, bid + ask / 2.)
 
-    if len(sys.argv) < 2 :
-        print ("Usage: day_trading_file, NOT target_price-file ")
-        sys.exit()
 
+def target_signals(df, min_trade_amount=1):
+    """
+    Target signal of every tick: the sign of the next market price change, ticks without change keep the last signal.
+    Every change of the signal starts a new trade (tradeid), trades whose absolute returns sum up to less than
+    min_trade_amount get signal 0 (the last trade of the day is always kept).
+    df: DataFrame with the columns bidpx_, bidsz_, askpx_, asksz_
+    returns the DataFrame with the columns mktpx_, ret_, absret_, shftret_, tradeid, signal added and the number of trades
+    """
+    df['mktpx_'] = market_price(df['bidpx_'].values, df['bidsz_'].values, df['askpx_'].values, df['asksz_'].values)
+
+    # and calculate the price difference
+    df['ret_'] = df.mktpx_ - df.mktpx_.shift(1)
+    df['absret_'] = abs(df.ret_)
+    df['shftret_'] = df.ret_.shift(-1)
+    df = df.fillna(0.)
+
+    raw_signal = np.sign(df['shftret_'].values)
+
+    # forward fill the zeros with the last signal, 0 before the first one
+    nonzero = raw_signal != 0
+    last = np.maximum.accumulate(np.where(nonzero, np.arange(len(raw_signal)), -1))
+    signal = np.where(last >= 0, raw_signal[np.maximum(last, 0)], 0.)
+
+    # a trade starts where the signal changes to a new non zero value
+    previous = np.concatenate(([0.], signal[:-1]))
+    tradeid = np.cumsum(nonzero & (raw_signal != previous))
+    trade_count = tradeid[-1] if len(tradeid) > 0 else 0
+
+    absret = df['absret_'].values.copy()
+    trade_sum = np.bincount(tradeid, weights=absret, minlength=trade_count + 1)
+    notrade = trade_sum < min_trade_amount
+    notrade[trade_count] = False
+    dropped = notrade[tradeid]
+    signal[dropped] = 0.
+    absret[dropped] = 0.
 
-    day_file = sys.argv[1]
+    df['tradeid'] = tradeid
+    df['signal'] = signal
+    df['absret_'] = absret
+    return df, int(trade_count - np.count_nonzero(notrade))
 
 
-    if "_2013" in day_file: 
-        month = day_file.split("_")[2].split(".")[0]
-        write_file = "signal_" + month + ".csv"
-    else:
-        write_file = "signal.csv"
+def read_day_file(day_file):
+    return pd.read_csv(day_file, sep=" ", usecols=[0,1,2,3,4,5], index_col = 0, header = None, names = ["time","mp","bidpx_","bidsz_","askpx_","asksz_",])
 
+
+def generate_target_signals_for_file(day_file, write_file, min_trade_amount=1):
+    """
+    write the target signal of a day to write_file
+    returns the theoretical PnL (sum of the absolute returns of the kept trades) and the number of trades
+    """
     print("Processing file ",day_file)
     print("Writing to file ",write_file)
 
-    df = pd.read_csv(day_file, sep=" ", usecols=[0,1,2,3,4,5], index_col = 0, header = None, names = ["time","mp","bidpx_","bidsz_","askpx_","asksz_",])
-    #df = pd.read_csv(day_file, sep=" ",  header = None, names = ["time","mp","bidpx_","bidsz_","askpx_","asksz_",])
+    df = read_day_file(day_file)
+    df, trade_count = target_signals(df, min_trade_amount)
 
+    # Count the signals in a single signal file and review the bias (before the zeros are filled)
+    raw_signal = np.sign(df['shftret_'].values)
+    print("Positive Signals ( 1 )   : ", np.count_nonzero(raw_signal == 1))
+    print("Zero Signals     ( 0 )   : ", np.count_nonzero(raw_signal == 0))
+    print("Negative Signals (-1 )   : ", np.count_nonzero(raw_signal == -1))
 
-    # calculate the market price
-    df['mktpx_'] = df.apply(lambda row: ( (row['bidpx_']*row['asksz_'] + row['askpx_'] * row['bidsz_']) / (row['bidsz_'] + row['asksz_'])
-                                               if row['asksz_'] + row['bidsz_'] > 0
-                                               else row['bidpx_']+row['askpx_'] /2.),
-                           axis=1)
+    # and write the signal, also as events file (see signal_store.py)
+    df['signal'].to_csv(write_file, header=False)
+    save_events(events_file_name(write_file), {'signal': df['signal'].values})
 
-    # and calculate the price difference
-    df['ret_'] = df.mktpx_ - df.mktpx_.shift(1)
-    df['absret_'] = abs(df.ret_)
-    df['shftret_'] = df.ret_.shift(-1)
-    df.fillna(0., inplace=True)
-    df['tradeid'] = 0
-
-    last_signal = 0 
-    trade_count = 0
-    trade_sum = 0
-
-    df['signal'] = np.sign(df.shftret_)
-
-    notrade_list = []
-    
-    for index,row in df.iterrows():
-       #print(row)
-       if row.signal != last_signal and row.signal != 0:
-           if trade_sum < min_trade_amount:
-               notrade_list.append(trade_count)         
-           trade_sum = 0
-           trade_count += 1
-           last_signal = row.signal
-       if row.signal == 0:
-           df.loc[index,'signal'] = last_signal 
-       trade_sum += row['absret_']
-       df.loc[index,'tradeid'] = trade_count
-
-    df.loc[df['tradeid'].isin(notrade_list),'signal']=0.
-    df.loc[df['tradeid'].isin(notrade_list),'absret_']=0.
-
-    # and write the signal 
-    signal_df = df['signal']
-    signal_df.to_csv(write_file)
-
-    #print ("Trades")
-    #print(trades2_df)
-    #print(trades3_df)
-    #print ("Read DF from ", day_file)
-    #print(df)
-    print("Max. theoret. PNL    : ", df.sum().absret_)
-    print("Max. number of trades: ", trade_count - len(notrade_list))
+    _pnl = df['absret_'].sum()
+    print("Max. theoret. PNL    : ", _pnl)
+    print("Max. number of trades: ", trade_count)
     print("Min Trading Amount   : ", min_trade_amount)
+    return _pnl, trade_count
+
+
+def __main__():
+    """
+    Trading Simulator from curriculumvite trading competition
+    see also the arvix Paper from Roni Mittelman http://arxiv.org/pdf/1508.00317v1
+    Modified by Ernst.Tmp@gmx.at
+
+    produces data to train a neural net
+    Usage: create_signals.py day_trading_file [day_trading_file ...], NOT target_price-file
+    writes signal_<day>.csv and signal_<day>.npz of every file into the current directory
+    """
+    # Trades smaller than this will be omitted
+    min_trade_amount = 1
+
+    if len(sys.argv) < 2 :
+        print ("Usage: day_trading_file [day_trading_file ...], NOT target_price-file ")
+        sys.exit()
+
+    for day_file in sys.argv[1:]:
+        generate_target_signals_for_file(day_file, signal_file_name(day_file, ""), min_trade_amount)
 
 
-__main__();
+if __name__ == '__main__':
+    __main__()
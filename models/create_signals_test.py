@@ -0,0 +1,92 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from create_signals import target_signals
+
+
+def target_signals_loop(df, min_trade_amount=1):
+    """
+    The former apply / iterrows implementation of create_signals.py
+    returns the DataFrame with the columns mktpx_, ret_, absret_, shftret_, tradeid, signal and the number of trades
+    """
+    df = df.copy()
+    df['mktpx_'] = df.apply(lambda row: ( (row['bidpx_']*row['asksz_'] + row['askpx_'] * row['bidsz_']) / (row['bidsz_'] + row['asksz_'])
+                                               if row['asksz_'] + row['bidsz_'] > 0
+                                               else row['bidpx_']+row['askpx_'] /2.),
+                           axis=1)
+
+    df['ret_'] = df.mktpx_ - df.mktpx_.shift(1)
+    df['absret_'] = abs(df.ret_)
+    df['shftret_'] = df.ret_.shift(-1)
+    df.fillna(0., inplace=True)
+    df['tradeid'] = 0
+
+    last_signal = 0
+    trade_count = 0
+    trade_sum = 0
+
+    df['signal'] = np.sign(df.shftret_)
+
+    notrade_list = []
+
+    for index,row in df.iterrows():
+       if row.signal != last_signal and row.signal != 0:
+           if trade_sum < min_trade_amount:
+               notrade_list.append(trade_count)
+           trade_sum = 0
+           trade_count += 1
+           last_signal = row.signal
+       if row.signal == 0:
+           df.loc[index,'signal'] = last_signal
+       trade_sum += row['absret_']
+       df.loc[index,'tradeid'] = trade_count
+
+    df.loc[df['tradeid'].isin(notrade_list),'signal']=0.
+    df.loc[df['tradeid'].isin(notrade_list),'absret_']=0.
+    return df, trade_count - len(notrade_list)
+
+
+def random_day(ticks, seed=0):
+    """
+    day like read_day_file returns it, indexed by time, some ticks without sizes
+    """
+    rng = np.random.RandomState(seed)
+    bid = 1000. + 0.5 * np.cumsum(rng.randint(-1, 2, size=ticks))
+    bidsz = rng.randint(0, 20, size=ticks).astype(float)
+    asksz = np.where(bidsz == 0, 0., rng.randint(1, 20, size=ticks))
+    return pd.DataFrame({'mp': 0., 'bidpx_': bid, 'bidsz_': bidsz, 'askpx_': bid + 0.5 * rng.randint(1, 3, size=ticks),
+                         'asksz_': asksz}, index=pd.Index(np.arange(ticks) * 100, name='time'),
+                        columns=["mp", "bidpx_", "bidsz_", "askpx_", "asksz_"])
+
+
+class TargetSignalsTest(unittest.TestCase):
+    def assertParity(self, day, min_trade_amount=1):
+        df, trade_count = target_signals(day.copy(), min_trade_amount)
+        expected, expected_count = target_signals_loop(day, min_trade_amount)
+        self.assertEqual(trade_count, expected_count)
+        for col in ['mktpx_', 'ret_', 'absret_', 'shftret_', 'signal']:
+            np.testing.assert_allclose(df[col].values, expected[col].values, rtol=1e-12, err_msg=col)
+        np.testing.assert_array_equal(df['tradeid'].values, expected['tradeid'].values)
+        self.assertAlmostEqual(df['absret_'].sum(), expected['absret_'].sum(), places=6)
+
+    def test_parity_random(self):
+        for seed in range(4):
+            self.assertParity(random_day(800, seed))
+
+    def test_min_trade_amount(self):
+        for min_trade_amount in [0, 3, 20]:
+            self.assertParity(random_day(500, 7), min_trade_amount)
+
+    def test_constant(self):
+        day = random_day(20, 1)
+        day['bidpx_'] = 1000.
+        day['askpx_'] = 1000.5
+        day['bidsz_'] = 1.
+        day['asksz_'] = 1.
+        self.assertParity(day)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import json
+import time
+import shutil
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_MAX_BYTES = 20 * 1024**3  # evict least recently used entries above 20 GB
+COMPLETE_MARKER = "complete"
+INCOMPLETE_GRACE = 24 * 3600  # an entry without marker is being written for at most a day, older ones are left overs
+
+
+def file_signature(file_list):
+    """
+    name, modification time and size of every file, None for files not existing
+    """
+    signature = []
+    for filename in file_list:
+        if os.path.isfile(filename):
+            st = os.stat(filename)
+            signature.append([os.path.basename(filename), st.st_mtime, st.st_size])
+        else:
+            signature.append([os.path.basename(filename), None, None])
+    return signature
+
+
+def _to_json(obj):
+    """
+    make pandas and numpy objects (mean, std, dtypes) hashable via json
+    """
+    if isinstance(obj, pd.Series):
+        return [[str(k), float(v)] for k, v in obj.items()]
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (type, np.dtype)):
+        return np.dtype(obj).name
+    return str(obj)
+
+
+class DataCache(object):
+    """
+    Content addressed cache of prepared datasets.
+
+    Every entry is a directory named by the hash of all inputs the data depends on (input files with
+    modification times and sizes, features, normalization, label mode, ...), so changing any of them
+    leads to a new entry instead of silently reusing stale data. The least recently used entries are
+    removed when the cache grows above max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, incomplete_grace=INCOMPLETE_GRACE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.incomplete_grace = incomplete_grace
+
+    def get_key(self, **inputs):
+        return hashlib.sha1(json.dumps(inputs, sort_keys=True, default=_to_json).encode('utf-8')).hexdigest()
+
+    def get_path(self, key, name):
+        """
+        file name of name inside the entry, the entry directory is created if needed
+        """
+        entry = os.path.join(self.cache_dir, key)
+        if not os.path.isdir(entry):
+            os.makedirs(entry)
+        return os.path.join(entry, name)
+
+    def lookup(self, key):
+        """
+        True if the entry has been completely written, marks the entry as recently used
+        """
+        marker = os.path.join(self.cache_dir, key, COMPLETE_MARKER)
+        if not os.path.isfile(marker):
+            return False
+        os.utime(marker, None)
+        return True
+
+    def commit(self, key):
+        """
+        mark the entry as complete once all its files are written and evict old entries
+        """
+        with open(os.path.join(self.cache_dir, key, COMPLETE_MARKER), 'w'):
+            pass
+        self.evict(keep=key)
+
+    def remove(self, key):
+        shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+
+    def _entry_size(self, entry):
+        """
+        size of the files of the entry, None if it has been removed meanwhile (by another process)
+        """
+        size = 0
+        try:
+            for f in os.listdir(entry):
+                size += os.path.getsize(os.path.join(entry, f))
+        except OSError:
+            return None
+        return size
+
+    def _last_used(self, entry):
+        """
+        time the entry was last used, None for an entry still being written (no marker, younger than
+        incomplete_grace) or removed meanwhile; left over incomplete entries count as never used
+        """
+        try:
+            return os.path.getmtime(os.path.join(entry, COMPLETE_MARKER))
+        except OSError:
+            pass
+        try:
+            if time.time() - os.path.getmtime(entry) < self.incomplete_grace:
+                return None
+        except OSError:
+            return None
+        return 0.
+
+    def evict(self, keep=None):
+        """
+        remove the least recently used entries until the cache fits into max_bytes,
+        entries which are still being written are never removed
+        """
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            entry = os.path.join(self.cache_dir, key)
+            if not os.path.isdir(entry):
+                continue
+            size = self._entry_size(entry)
+            if size is None:
+                continue
+            last_used = self._last_used(entry)
+            entries.append((last_used, key, size))
+
+        total = sum(size for _, _, size in entries)
+        for last_used, key, size in sorted(entry for entry in entries if entry[0] is not None):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            print("Evicting cache entry {} ({} bytes)".format(key, size))
+            self.remove(key)
+            total -= size
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from datacache import DataCache, COMPLETE_MARKER
+
+
+class EvictTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = DataCache(self.path, max_bytes=1500)
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def write_entry(self, key, age, complete=True):
+        with open(self.cache.get_path(key, "X.npy"), 'wb') as f:
+            f.write(b'x' * 1000)
+        entry = os.path.join(self.path, key)
+        stamp = time.time() - age
+        if complete:
+            self.cache.commit(key)
+            os.utime(os.path.join(entry, COMPLETE_MARKER), (stamp, stamp))
+        os.utime(entry, (stamp, stamp))
+
+    def test_least_recently_used(self):
+        self.write_entry("old", 200)
+        self.write_entry("new", 100)
+        self.cache.evict()
+        self.assertEqual(os.listdir(self.path), ["new"])
+
+    def test_incomplete_kept(self):
+        self.write_entry("old", 200)
+        self.write_entry("writing", 100, complete=False)
+        self.cache.evict()
+        self.assertEqual(os.listdir(self.path), ["writing"])
+
+    def test_incomplete_left_over(self):
+        self.write_entry("left_over", 2 * self.cache.incomplete_grace, complete=False)
+        self.write_entry("old", 200)
+        self.cache.evict()
+        self.assertEqual(os.listdir(self.path), ["old"])
+
+    def test_vanished_entry(self):
+        self.write_entry("old", 200)
+        self.write_entry("new", 100)
+        gone = os.path.join(self.path, "gone")
+        os.makedirs(gone)
+        listdir = os.listdir
+
+        def vanishing_listdir(path):
+            # the entry is removed by another process after the cache directory has been listed
+            if path == gone:
+                shutil.rmtree(gone)
+            return listdir(path)
+
+        os.listdir = vanishing_listdir
+        try:
+            self.cache.evict()
+        finally:
+            os.listdir = listdir
+        self.assertEqual(os.listdir(self.path), ["new"])
+
+if __name__ == '__main__':
+    unittest.main()
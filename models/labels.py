@@ -0,0 +1,58 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import numpy as np
+import pandas as pd
+
+
+# class labels, same order as the one hot columns
+SELL = 0
+BUY = 1
+HOLD = 2
+LABEL_COLUMNS = ['sell', 'buy', 'hold']
+
+
+def encode_signal(signal, threshold=0.9):
+    """
+    Turn the signal (-1 sell, 1 buy, 0 hold) into int8 class labels.
+    signal: array like
+    returns np-array of SELL, BUY, HOLD
+    """
+    signal = np.asarray(signal)
+    classes = np.full(signal.shape, HOLD, dtype=np.int8)
+    classes[signal < -threshold] = SELL
+    classes[signal > threshold] = BUY
+    return classes
+
+
+def one_hot(classes, num_classes=len(LABEL_COLUMNS), dtype=np.float32):
+    """
+    one hot encoding of the class labels, returns np-array (ticks x num_classes)
+    """
+    return np.eye(num_classes, dtype=dtype)[classes]
+
+
+def encode_labels(signal, label_mode='onehot', dtype=np.float32, threshold=0.9):
+    """
+    label_mode 'classes' ... int8 class vector
+               'onehot'  ... one hot array (ticks x 3) in dtype, columns sell, buy, hold
+    """
+    classes = encode_signal(signal, threshold=threshold)
+    if label_mode == 'classes':
+        return classes
+    elif label_mode == 'onehot':
+        return one_hot(classes, dtype=dtype)
+    else:
+        raise ValueError
+
+
+def label_frame(classes, index, label_mode='onehot', dtype=np.float32):
+    """
+    DataFrame of the labels with the given index, either one column 'class' or the one hot columns sell, buy, hold
+    """
+    if label_mode == 'classes':
+        return pd.DataFrame({'class': classes}, index=index)
+    elif label_mode == 'onehot':
+        return pd.DataFrame(one_hot(classes, dtype=dtype), index=index, columns=LABEL_COLUMNS)
+    else:
+        raise ValueError
@@ -0,0 +1,54 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from labels import encode_signal, encode_labels, label_frame, SELL, BUY, HOLD, LABEL_COLUMNS
+
+
+def encode_labels_apply(ydf):
+    """
+    The former row wise apply of prepare_tradcom_classification, ydf: DataFrame with the column signal
+    """
+    ydf = ydf.copy()
+    ydf['sell'] = ydf.apply(lambda row: (1 if row['signal'] < -0.9 else 0 ), axis=1)
+    ydf['buy']  = ydf.apply(lambda row: (1 if row['signal'] > 0.9 else 0 ), axis=1)
+    ydf['hold'] = ydf.apply(lambda row: (1 if row['buy'] < 0.9 and row['sell'] <  0.9 else 0 ), axis=1)
+    del ydf['signal']
+    return ydf
+
+
+class EncodeLabelsTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        signal = rng.choice([-1., 0., 1., -0.5, 0.95, np.nan], size=1000)
+        self.ydf = pd.DataFrame({'signal': signal})
+
+    def test_onehot_parity(self):
+        expected = encode_labels_apply(self.ydf)
+        labels = encode_labels(self.ydf['signal'].values)
+        self.assertEqual(labels.dtype, np.float32)
+        np.testing.assert_array_equal(labels, expected[LABEL_COLUMNS].values)
+
+    def test_classes(self):
+        classes = encode_labels(self.ydf['signal'].values, label_mode='classes')
+        self.assertEqual(classes.dtype, np.int8)
+        np.testing.assert_array_equal(classes, encode_labels_apply(self.ydf)[LABEL_COLUMNS].values.argmax(axis=1))
+
+    def test_nan_is_hold(self):
+        np.testing.assert_array_equal(encode_signal([np.nan, -1., 1., 0.]), [HOLD, SELL, BUY, HOLD])
+
+    def test_label_frame(self):
+        classes = encode_signal(self.ydf['signal'].values)
+        frame = label_frame(classes, self.ydf.index, dtype=np.int8)
+        self.assertEqual(frame.columns.tolist(), LABEL_COLUMNS)
+        np.testing.assert_array_equal(frame.values, encode_labels_apply(self.ydf)[LABEL_COLUMNS].values)
+        np.testing.assert_array_equal(label_frame(classes, self.ydf.index, label_mode='classes')['class'], classes)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            encode_labels([0.], label_mode='other')
+
+
+if __name__ == '__main__':
+    unittest.main()
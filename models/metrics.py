@@ -0,0 +1,95 @@
+"""
+Classification metrics of the predicted class probabilities: MSE, accuracy, confusion matrix, precision and recall.
+y and yp are arrays (batch, time, classes) or (time, classes) of the expected (one hot) and predicted outputs, the class of
+a tick is the argmax of its row. A mask (batch, time) or (time,) selects the ticks to count, e.g. to leave out padding or
+the warm up ticks of a sequence.
+ClassificationMetrics accumulates the counts day by day, finalize computes the metrics of all days seen so far.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import numpy as np
+
+CLASS_NAMES = ['Sell', 'Buy', 'Hold']
+
+
+class ClassificationMetrics(object):
+    def __init__(self, classes=3):
+        self.classes = classes
+        self.ticks = 0
+        self.squared_error = 0.
+        self.confusion = np.zeros((classes, classes), dtype=np.int64)
+
+    def accumulate(self, y, yp, mask=None):
+        """
+        add the ticks of y, yp (where mask is True) to the counts
+        returns the confusion matrix of these ticks alone
+        """
+        y = np.asarray(y, dtype=np.float64).reshape((-1, self.classes))
+        yp = np.asarray(yp, dtype=np.float64).reshape((-1, self.classes))
+        if y.shape != yp.shape:
+            print("Expected output {} and predicted output {} differ in shape. Aborting.".format(y.shape, yp.shape))
+            raise ValueError
+        if mask is not None:
+            mask = np.asarray(mask, dtype=bool).reshape(-1)
+            y = y[mask]
+            yp = yp[mask]
+
+        self.ticks += len(y)
+        self.squared_error += np.sum((y - yp) ** 2)
+        # row: expected class, column: predicted class
+        confusion = np.bincount(np.argmax(y, axis=1) * self.classes + np.argmax(yp, axis=1),
+                                minlength=self.classes * self.classes).reshape((self.classes, self.classes))
+        self.confusion += confusion
+        return confusion
+
+    def finalize(self):
+        """
+        returns dict with ticks, mse (squared error per tick), correct, accuracy, confusion, and per class
+        predicted, total (expected), precision, recall (nan for classes never predicted or expected)
+        """
+        correct = np.diag(self.confusion)
+        predicted = self.confusion.sum(axis=0)
+        total = self.confusion.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = correct / predicted.astype(np.float64)
+            recall = correct / total.astype(np.float64)
+        return {'ticks': self.ticks,
+                'mse': self.squared_error / self.ticks if self.ticks > 0 else np.nan,
+                'correct': int(correct.sum()),
+                'accuracy': correct.sum() / float(self.ticks) if self.ticks > 0 else np.nan,
+                'confusion': self.confusion.copy(),
+                'correct_per_class': correct,
+                'predicted': predicted,
+                'total': total,
+                'precision': precision,
+                'recall': recall}
+
+
+def classification_metrics(y, yp, mask=None, classes=3):
+    """
+    metrics (see ClassificationMetrics.finalize) of one set of predictions
+    """
+    metrics = ClassificationMetrics(classes)
+    metrics.accumulate(y, yp, mask)
+    return metrics.finalize()
+
+
+def predicted_labels(yp, classes=3):
+    """
+    one hot encoding (ticks x classes) of the predicted classes
+    """
+    yp = np.asarray(yp).reshape((-1, classes))
+    return np.eye(classes)[np.argmax(yp, axis=1)]
+
+
+def print_metrics(metrics, names=CLASS_NAMES):
+    """
+    print the metrics like check_prediction always did
+    """
+    print()
+    print("Total MSE Error: ", metrics['mse'])
+    print("Correct Class Assignment:  %6d /%7d" % (metrics['correct'], metrics['ticks']))
+    for i, name in enumerate(names):
+        print("%4s: Correctly Predicted / Predicted / Total:    %6d/%6d/%7d" %
+              (name, metrics['correct_per_class'][i], metrics['predicted'][i], metrics['total'][i]))
@@ -0,0 +1,80 @@
+import unittest
+
+import numpy as np
+
+from metrics import ClassificationMetrics, classification_metrics, predicted_labels
+
+
+def check_prediction_counts(y, yp):
+    """
+    The former per tick loop of check_prediction
+    """
+    total_error = 0
+    correct_class = 0
+    y_pred_class = np.zeros((y.shape[-1],))
+    y_corr_pred_class = np.zeros((y.shape[-1],))
+    y_class = np.zeros((y.shape[-1],))
+
+    for i in range(y.shape[0]):
+        delta = 0.
+        for j in range(y.shape[1]):
+            delta += (y[i][j] - yp[i][j]) * (y[i][j] - yp[i][j])
+        total_error += delta
+
+        if np.argmax(y[i]) == np.argmax(yp[i]):
+            correct_class += 1
+            y_corr_pred_class[np.argmax(yp[i])] += 1.
+
+        y_pred_class[np.argmax(yp[i])] += 1.
+        y_class[np.argmax(y[i])] += 1.
+    return total_error / y.shape[0], correct_class, y_corr_pred_class, y_pred_class, y_class
+
+
+def random_outputs(ticks, classes=3, seed=0):
+    rng = np.random.RandomState(seed)
+    y = np.eye(classes)[rng.randint(0, classes, size=ticks)]
+    yp = rng.dirichlet(np.ones(classes), size=ticks)
+    return y, yp
+
+
+class ClassificationMetricsTest(unittest.TestCase):
+    def test_parity(self):
+        y, yp = random_outputs(3000)
+        metrics = classification_metrics(y.reshape((1, 3000, 3)), yp.reshape((1, 3000, 3)))
+        mse, correct, corr_pred_class, pred_class, y_class = check_prediction_counts(y, yp)
+        self.assertAlmostEqual(metrics['mse'], mse, places=9)
+        self.assertEqual(metrics['correct'], correct)
+        np.testing.assert_array_equal(metrics['correct_per_class'], corr_pred_class)
+        np.testing.assert_array_equal(metrics['predicted'], pred_class)
+        np.testing.assert_array_equal(metrics['total'], y_class)
+        np.testing.assert_allclose(metrics['precision'], corr_pred_class / pred_class)
+        np.testing.assert_allclose(metrics['recall'], corr_pred_class / y_class)
+
+    def test_mask(self):
+        y, yp = random_outputs(1000, seed=1)
+        mask = np.arange(1000) >= 100
+        metrics = classification_metrics(y, yp, mask=mask)
+        expected = classification_metrics(y[100:], yp[100:])
+        self.assertEqual(metrics['ticks'], 900)
+        np.testing.assert_array_equal(metrics['confusion'], expected['confusion'])
+        self.assertAlmostEqual(metrics['mse'], expected['mse'], places=9)
+
+    def test_streaming(self):
+        y, yp = random_outputs(5000, seed=2)
+        batch = y.reshape((5, 1000, 3)), yp.reshape((5, 1000, 3))
+        metrics = ClassificationMetrics()
+        for day in range(5):
+            confusion = metrics.accumulate(batch[0][day], batch[1][day])
+            self.assertEqual(confusion.sum(), 1000)
+        streamed = metrics.finalize()
+        whole = classification_metrics(*batch)
+        np.testing.assert_array_equal(streamed['confusion'], whole['confusion'])
+        self.assertAlmostEqual(streamed['mse'], whole['mse'], places=9)
+        self.assertEqual(streamed['accuracy'], whole['accuracy'])
+
+    def test_predicted_labels(self):
+        np.testing.assert_array_equal(predicted_labels([[0.2, 0.5, 0.3], [0.6, 0.1, 0.3]]), [[0, 1, 0], [1, 0, 0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
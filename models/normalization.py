@@ -0,0 +1,205 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+
+def _combine(count, mean, m2):
+    """
+    merge moments along the first axis (days or columns), Chan et al. parallel variance
+    count, mean, m2: np-arrays of the same shape
+    """
+    total = count.sum(axis=0)
+    safe = np.maximum(total, 1)
+    combined_mean = (count * mean).sum(axis=0) / safe
+    combined_m2 = m2.sum(axis=0) + (count * (mean - combined_mean)**2).sum(axis=0)
+    return total, combined_mean, combined_m2
+
+
+class Moments(object):
+    """
+    Mergeable moments of the columns of an array: count, mean and sum of squared deviations from the mean (m2).
+
+    The moments of several days, or of several columns standardized together, are merged exactly without
+    going back to the data, so mean and std of any set of training days come from the per day catalog the
+    tick store records at ingest. Keeping mean and m2 instead of sum and sum of squares avoids the
+    cancellation of E[x^2] - E[x]^2 for prices.
+    """
+
+    def __init__(self, count, mean, m2):
+        self.count = np.asarray(count, dtype=np.int64)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.m2 = np.asarray(m2, dtype=np.float64)
+
+    @classmethod
+    def from_array(cls, array):
+        """
+        moments of every column of the 2-D array (ticks x columns), NaNs are skipped like pandas does.
+        Works column by column, so only one column is held as temporary.
+        """
+        columns = array.shape[1]
+        count = np.zeros(columns, dtype=np.int64)
+        mean = np.zeros(columns)
+        m2 = np.zeros(columns)
+        for i in range(columns):
+            col = np.asarray(array[:, i], dtype=np.float64)
+            valid = ~np.isnan(col)
+            if not valid.all():
+                col = col[valid]
+            count[i] = len(col)
+            if count[i] > 0:
+                mean[i] = col.mean()
+                m2[i] = np.dot(col - mean[i], col - mean[i])
+        return cls(count, mean, m2)
+
+    @classmethod
+    def combine(cls, moments_list):
+        """
+        moments of the days in moments_list taken together
+        """
+        if len(moments_list) == 0:
+            print("No moments to combine. Aborting.")
+            raise ValueError
+        count = np.array([m.count for m in moments_list])
+        mean = np.array([m.mean for m in moments_list])
+        m2 = np.array([m.m2 for m in moments_list])
+        return cls(*_combine(count, mean, m2))
+
+    def select(self, positions):
+        """
+        moments of the columns at positions
+        """
+        return Moments(self.count[positions], self.mean[positions], self.m2[positions])
+
+    def group(self, positions):
+        """
+        moments of the columns at positions taken together as one column (like the flattened colgroup)
+        """
+        return Moments(*_combine(self.count[positions], self.mean[positions], self.m2[positions]))
+
+    def get_mean(self):
+        return self.mean
+
+    def get_std(self, ddof=0):
+        """
+        ddof=0 like np.std, ddof=1 like DataFrame.std
+        """
+        return np.sqrt(self.m2 / np.maximum(self.count - ddof, 1))
+
+    def to_dict(self):
+        return {'count': self.count.tolist(), 'mean': self.mean.tolist(), 'm2': self.m2.tolist()}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['count'], d['mean'], d['m2'])
+
+
+def _layout(columns, colgroups=None, unmodified_group=None):
+    """
+    the standardized columns in the order standardize_inputs returns them: the colgroups, the other columns,
+    the copies U<col> of the unmodified_group columns
+    returns labels ...column names, source ...position of every label in columns, separate_features
+    """
+    if colgroups is None:
+        colgroups = []
+    if unmodified_group is None:
+        unmodified_group = []
+    columns = list(columns)
+    position = dict((col, i) for i, col in enumerate(columns))
+
+    grouped = list(itertools.chain.from_iterable(colgroups))
+    separate_features = [col for col in columns if col not in grouped]
+    labels = grouped + separate_features + ['U'+str(unmod) for unmod in unmodified_group]
+    source = [position[col] for col in grouped + separate_features + list(unmodified_group)]
+    return labels, source, separate_features
+
+
+def _stats_arrays(moments, columns, colgroups=None, unmodified_group=None):
+    """
+    labels, mean and std (np-arrays) of the standardized columns, see _layout for the order
+    """
+    if colgroups is None:
+        colgroups = []
+    if unmodified_group is None:
+        unmodified_group = []
+    labels, source, separate_features = _layout(columns, colgroups, unmodified_group)
+    position = dict((col, i) for i, col in enumerate(columns))
+
+    me = []
+    st = []
+    for colgroup in colgroups:
+        group = moments.group([position[col] for col in colgroup])
+        me.extend([float(group.get_mean())] * len(colgroup))
+        st.extend([float(group.get_std(ddof=0))] * len(colgroup))
+
+    separate = moments.select([position[col] for col in separate_features])
+    me.extend(separate.get_mean().tolist())
+    st.extend(separate.get_std(ddof=1).tolist())
+
+    me.extend([0.] * len(unmodified_group))
+    st.extend([1.] * len(unmodified_group))
+
+    return labels, np.array(me), np.array(st)
+
+
+def normalization_stats(moments, columns, colgroups=None, unmodified_group=None):
+    """
+    mean and std the way standardize_inputs computes them, from the moments of columns instead of the data:
+    the columns of a colgroup share the mean and std (ddof=0) of the group, all other columns get their own (ddof=1).
+    The copies U<col> of the unmodified_group columns get mean 0 and std 1.
+    moments: Moments of columns
+    returns mean ...pd.Series, std ...pd.Series indexed by column
+    """
+    labels, me, st = _stats_arrays(moments, columns, colgroups=colgroups, unmodified_group=unmodified_group)
+    return pd.Series(me, index=labels), pd.Series(st, index=labels)
+
+
+def _frozen_stats(labels, stats, default):
+    """
+    given mean or std as pd.Series (by column) or np-array (in the order of labels), the U<col> copies get default
+    """
+    if isinstance(stats, pd.Series):
+        return np.array([stats[label] if label in stats.index else default for label in labels], dtype=np.float64)
+    stats = np.asarray(stats, dtype=np.float64)
+    if stats.shape != (len(labels),):
+        print("Got {} stats for the {} standardized columns. Aborting.".format(stats.shape, len(labels)))
+        raise ValueError
+    return stats
+
+
+def standardize_array(array, columns, colgroups=None, unmodified_group=None, mean=None, std=None, out=None):
+    """
+    Standardize the 2-D array (ticks x columns), groups of columns are standardized together
+    and the unmodified_group columns are appended unchanged as U<col>.
+    array: np-array, columns: the column names of array
+    colgroups: list of lists of columns to be standardized together (e.g. bid/ask price, bid/ask size)
+    mean, std: frozen stats (pd.Series by column or np-arrays in the order of the returned labels),
+               computed from array if None
+    out: preallocated np-array (ticks x labels) to write into, may be array itself if no column is moved
+    returns out, labels ...list of the column names of out, mean ...np-array, std ...np-array
+    """
+    labels, source, _ = _layout(columns, colgroups, unmodified_group)
+    if mean is None or std is None:
+        _, mean, std = _stats_arrays(Moments.from_array(array), columns, colgroups=colgroups, unmodified_group=unmodified_group)
+    else:
+        mean = _frozen_stats(labels, mean, 0.)
+        std = _frozen_stats(labels, std, 1.)
+
+    if out is None:
+        dtype = array.dtype if np.issubdtype(array.dtype, np.floating) else np.float64
+        out = np.empty((array.shape[0], len(labels)), dtype=dtype)
+    elif out.shape != (array.shape[0], len(labels)):
+        print("Output shape {} does not fit {} ticks x {} columns. Aborting.".format(out.shape, array.shape[0], len(labels)))
+        raise ValueError
+    elif np.shares_memory(out, array) and source != list(range(len(labels))):
+        print("Columns are reordered, cannot standardize in place. Aborting.")
+        raise ValueError
+
+    for j, i in enumerate(source):
+        np.subtract(array[:, i], mean[j], out=out[:, j])
+        out[:, j] /= std[j]
+
+    return out, labels, mean, std
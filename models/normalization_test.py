@@ -0,0 +1,147 @@
+import itertools
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from normalization import Moments, normalization_stats, standardize_array
+
+
+def standardize_columns_loop(colgroup):
+    """
+    The former standardize_columns: the columns of the group share mean and std (np.std, ddof=0) of all their values
+    """
+    _me = np.mean(colgroup.values.flatten())
+    _st = np.std(colgroup.values.flatten())
+    me = pd.Series(np.full(len(colgroup.columns), _me), index=colgroup.columns)
+    st = pd.Series(np.full(len(colgroup.columns), _st), index=colgroup.columns)
+    return colgroup.sub(_me).div(_st), me, st
+
+
+def standardize_inputs_loop(Xdf, colgroups, mean=None, std=None, unmodified_group=()):
+    """
+    The former standardize_inputs of DataStore.py (UFCNN*.py without unmodified_group): the colgroups,
+    then the other columns (DataFrame.mean / std, ddof=1), then the copies U<col> of the unmodified_group columns
+    with mean 0 and std 1. Given mean and std are used for all columns instead.
+    returns Xdf ...DataFrame, mean ...Series, std ...Series
+    """
+    Xdf = Xdf.copy()
+    new_unmod_group = []
+    for unmod in unmodified_group:
+        new_name = 'U'+str(unmod)
+        Xdf[new_name] = Xdf[unmod]
+        new_unmod_group.append(new_name)
+
+    df = []
+    me = []
+    st = []
+    for colgroup in colgroups:
+        _df, _me, _st = standardize_columns_loop(Xdf[colgroup])
+        df.append(_df)
+        me.append(_me)
+        st.append(_st)
+
+    separate_features = [col for col in Xdf.columns if col not in list(itertools.chain.from_iterable(colgroups))]
+    _me = Xdf[separate_features].mean()
+    _st = Xdf[separate_features].std()
+    for new_name in new_unmod_group:
+        _me[new_name] = 0.
+        _st[new_name] = 1.
+    df.append(Xdf[separate_features].sub(_me).div(_st))
+    me.append(_me)
+    st.append(_st)
+
+    df = pd.concat(df, axis=1)
+    me = pd.concat(me)
+    st = pd.concat(st)
+
+    if mean is not None and std is not None:
+        mean = mean.copy()
+        std = std.copy()
+        for new_name in new_unmod_group:
+            mean[new_name] = 0.
+            std[new_name] = 1.
+        raw = pd.concat([Xdf[list(itertools.chain.from_iterable(colgroups))], Xdf[separate_features]], axis=1)
+        return raw.sub(mean).div(std), mean, std
+
+    return df, me, st
+
+
+def random_frame(ticks, seed=0):
+    """
+    frame like the input files: milliseconds, bid, ask prices around 1000, bid, ask sizes, one more column
+    """
+    rng = np.random.RandomState(seed)
+    bid = 1000. + 0.25 * np.cumsum(rng.randint(-1, 2, size=ticks))
+    return pd.DataFrame({0: np.arange(ticks) * 250., 1: rng.randint(0, 3, size=ticks).astype(float),
+                         2: bid, 3: rng.randint(1, 50, size=ticks).astype(float),
+                         4: bid + 0.25 * rng.randint(1, 3, size=ticks), 5: rng.randint(1, 50, size=ticks).astype(float)})
+
+
+class MomentsTest(unittest.TestCase):
+    def test_combine(self):
+        days = [random_frame(ticks, seed) for seed, ticks in enumerate([500, 1, 3000])]
+        moments = Moments.combine([Moments.from_array(day.values) for day in days])
+        all_days = pd.concat(days)
+        self.assertEqual(moments.count.tolist(), [len(all_days)] * 6)
+        np.testing.assert_allclose(moments.get_mean(), all_days.mean().values, rtol=1e-12)
+        np.testing.assert_allclose(moments.get_std(ddof=1), all_days.std().values, rtol=1e-9)
+        np.testing.assert_allclose(moments.get_std(), np.std(all_days.values, axis=0), rtol=1e-9)
+
+    def test_group(self):
+        df = random_frame(1000)
+        group = Moments.from_array(df.values).group([2, 4])
+        np.testing.assert_allclose(group.get_mean(), np.mean(df[[2, 4]].values.flatten()), rtol=1e-12)
+        np.testing.assert_allclose(group.get_std(), np.std(df[[2, 4]].values.flatten()), rtol=1e-9)
+
+    def test_nan(self):
+        df = random_frame(100)
+        df.iloc[::7, 3] = np.nan
+        moments = Moments.from_array(df.values)
+        np.testing.assert_allclose(moments.get_mean(), df.mean().values, rtol=1e-12)
+        np.testing.assert_allclose(moments.get_std(ddof=1), df.std().values, rtol=1e-9)
+
+
+class StandardizeTest(unittest.TestCase):
+    colgroups = [[2, 4], [3, 5]]
+
+    def assertStandardized(self, Xdf, mean=None, std=None, unmodified_group=()):
+        expected, expected_mean, expected_std = standardize_inputs_loop(Xdf, self.colgroups, mean, std, unmodified_group)
+        values, labels, me, st = standardize_array(Xdf.values, Xdf.columns, colgroups=self.colgroups,
+                                                   unmodified_group=list(unmodified_group), mean=mean, std=std)
+        self.assertEqual(labels, expected.columns.tolist())
+        np.testing.assert_allclose(values, expected.values, rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(me, expected_mean[labels].values, rtol=1e-12)
+        np.testing.assert_allclose(st, expected_std[labels].values, rtol=1e-12)
+        return values, labels
+
+    def test_computed(self):
+        self.assertStandardized(random_frame(2000))
+
+    def test_unmodified(self):
+        Xdf = random_frame(2000, seed=1)
+        values, labels = self.assertStandardized(Xdf, unmodified_group=[2, 4])
+        self.assertEqual(labels[-2:], ['U2', 'U4'])
+        np.testing.assert_array_equal(values[:, -2:], Xdf[[2, 4]].values)
+
+    def test_frozen(self):
+        _, mean, std = standardize_inputs_loop(random_frame(2000, seed=2), self.colgroups)
+        self.assertStandardized(random_frame(500, seed=3), mean=mean, std=std)
+
+    def test_frozen_unmodified(self):
+        # the U<col> copies are not in the stats of the training data, they keep mean 0 and std 1
+        _, mean, std = standardize_inputs_loop(random_frame(2000, seed=2), self.colgroups)
+        self.assertStandardized(random_frame(500, seed=3), mean=mean, std=std, unmodified_group=[2])
+
+    def test_normalization_stats(self):
+        days = [random_frame(ticks, seed) for seed, ticks in enumerate([700, 1300])]
+        moments = Moments.combine([Moments.from_array(day.values) for day in days])
+        mean, std = normalization_stats(moments, days[0].columns, colgroups=self.colgroups, unmodified_group=[1])
+        _, expected_mean, expected_std = standardize_inputs_loop(pd.concat(days), self.colgroups, unmodified_group=[1])
+        self.assertEqual(mean.index.tolist(), expected_mean.index.tolist())
+        np.testing.assert_allclose(mean.values, expected_mean.values, rtol=1e-12)
+        np.testing.assert_allclose(std.values, expected_std.values, rtol=1e-9)
+
+
+if __name__ == '__main__':
+    unittest.main()
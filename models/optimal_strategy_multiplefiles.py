@@ -3,140 +3,29 @@ import pandas as pd
 import sys
 import glob
 
-path = "./training_data_large/"  # to make sure signal files are written in same directory as data files
+from viterbi import read_prices, find_optimal_strategy, simulate_trading, label_day_file
+from signal_batch import generate_days
+from signal_store import events_file_name
 
-def compute_market_prices(prices):
-    """Compute market prices according to the trading competition recipe.
+path = "./training_data_large/"  # to make sure signal files are written in same directory as data files
+# the optimal strategy labels are kept apart from the signal_*.csv of the bid/ask generators,
+# prepare_tradcom_classification reads them with signal_prefix=SIGNAL_PREFIX
+SIGNAL_PREFIX = "signal_opt"
+SUMMARY_NAME = "signals_opt_summary.csv"
 
-    Parameters
-    ----------
-    prices : DataFrame
-        Data frame with market prices. Should include columns 'bid_price',
-        'bid_volume', 'aks_price', 'ask_volume'.
 
-    Returns
-    -------
-    prices : DataFrame
-        Same data frame, but with a column 'market_price' appended.
+def signal_file_name(filename):
     """
-    denom = prices.bid_volume + prices.ask_volume
-    numer = (prices.bid_price * prices.ask_volume +
-             prices.ask_price * prices.bid_volume)
-    mask = denom == 0
-    denom[mask] = 2
-    numer[mask] = prices.bid_price[mask] + prices.ask_price[mask]
-    prices = prices.copy()
-    prices['market_price'] = numer / denom
-    return prices
-
-
-def find_optimal_strategy(prices, max_position=3, cost_per_trade=0.02):
-    """Find optimal trading strategy.
-
-    A dynamic programming algorithm is used. Time complexity is "number
-    of samples x number of maximum positions".
-
-    Parameters
-    ----------
-    prices : DataFrame
-        Data frame with market prices. Should include columns 'bid_price',
-        'aks_price', 'market_price'.
-    max_position : int
-        Maximum allowed number of positions in buying or selling.
-    cost_per_trade : float, default 0.02
-        Fee paid for every trade.
-
-    Returns
-    -------
-    actions : ndarray
-        Sequence of optimal actions: -1 for sell, 0 for hold, 1 for buy.
-        Length is the same as the number of columns in `prices`.
-    pnl : float
-        Profit per trading action.
+    the signal file of the optimal strategy for the input file: prod_data_20130103v.txt -> signal_opt_20130103v.csv
     """
-    buy_price = np.maximum(prices.bid_price, prices.ask_price).values
-    sell_price = np.minimum(prices.bid_price, prices.ask_price).values
-
-    account = np.full((prices.shape[0] + 1, 2 * max_position + 3), -np.inf)
-    account[0, max_position + 1] = 0
-
-    actions = np.empty((prices.shape[0], 2 * max_position + 3), dtype=int)
-
-    for i in range(prices.shape[0]):
-        for j in range(1, account.shape[1] - 1):
-            buy = account[i, j - 1] - cost_per_trade - buy_price[i]
-            sell = account[i, j + 1] - cost_per_trade + sell_price[i]
-            hold = account[i, j]
-            if buy > sell and buy > hold:
-                account[i + 1, j] = buy
-                actions[i, j] = 1
-            elif sell > buy and sell > hold:
-                account[i + 1, j] = sell
-                actions[i, j] = -1
-            else:
-                account[i + 1, j] = hold
-                actions[i, j] = 0
-
-    pnl = account[-1, 1:-1] + (np.arange(-max_position, max_position + 1) *
-                               prices.market_price.iloc[-1])
-    j = np.argmax(pnl) + 1
-    optimal_sequence = []
-    for i in reversed(range(actions.shape[0])):
-        optimal_sequence.append(actions[i, j])
-        j -= actions[i, j]
-    optimal_sequence = np.array(list(reversed(optimal_sequence)))
+    return filename.replace('prod_data', SIGNAL_PREFIX).replace('txt','csv')
 
-    return optimal_sequence, np.max(pnl) / optimal_sequence.size
 
-
-def simulate_trading(prices, actions, cost_per_trade=0.02):
-    """Simulate trading according to given actions.
-
-    This is a literate translation of a pseudo code provided in [1]_.
-
-    Parameters
-    ----------
-    prices : DataFrame
-        Data frame with market prices. Should include columns 'bid_price',
-        'aks_price', 'market_price'.
-    actions : array_like
-        Sequence of actions: -1 for sell, 0 for hold, 1 for buy. Length is the
-        same as the number of columns in `prices`.
-    cost_per_trade : float, default 0.02
-        Fee paid for every trade.
-
-    Returns
-    -------
-    pnl : float
-        Profit per trading action.
-
-    References
-    ----------
-    .. [1] Roni Mittelman "Time-series modeling with undecimated fully
-       convolutional neural networks", http://arxiv.org/abs/1508.00317
+def _label_day(filename, max_position=3, cost_per_trade=0.02):
     """
-    pnl = 0
-    position = 0
-    market_price = prices.market_price.values
-    buy_price = np.maximum(prices.bid_price, prices.ask_price).values
-    sell_price = np.minimum(prices.bid_price, prices.ask_price).values
-
-    for i in range(len(actions)):
-        if i > 0:
-            pnl += position * (market_price[i] - market_price[i - 1])
-
-        if actions[i] == 1:
-            pnl -= cost_per_trade
-            pnl -= buy_price[i]
-            pnl += market_price[i]
-            position += 1
-        elif actions[i] == -1:
-            pnl -= cost_per_trade
-            pnl += sell_price[i]
-            pnl -= market_price[i]
-            position -= 1
-
-    return pnl / len(actions)
+    generator for signal_batch.generate_days
+    """
+    return label_day_file(filename, signal_file_name(filename), max_position=max_position, cost_per_trade=cost_per_trade)
 
 
 if __name__ == '__main__':
@@ -152,16 +41,26 @@ if __name__ == '__main__':
             "Files ./training_data_large/product_data_*txt and signal_*.csv are needed. Please copy them in the ./training_data_large/ . Aborting.")
         sys.exit()
 
+    if "--label" in sys.argv[1:]:
+        # batch mode: write the optimal actions as signal_opt_*.csv training signals, in parallel, cached by
+        # (file, max_position, cost_per_trade), the summary goes to signals_opt_summary.csv
+        # Usage: optimal_strategy_multiplefiles.py --label [max_position] [cost_per_trade] [--force]
+        args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+        max_position = int(args[0]) if len(args) > 0 else 3
+        cost_per_trade = float(args[1]) if len(args) > 1 else 0.02
+
+        params = {'generator': 'optimal_strategy', 'max_position': max_position, 'cost_per_trade': cost_per_trade}
+        outputs_of = lambda filename: [signal_file_name(filename), events_file_name(signal_file_name(filename))]
+        generate_days(_label_day, file_list, outputs_of, params,
+                      kwargs={'max_position': max_position, 'cost_per_trade': cost_per_trade},
+                      path=path, force="--force" in sys.argv[1:], summary_name=SUMMARY_NAME)
+        sys.exit()
+
     for j in range(len(file_list)):
         filename = file_list[j]
         print('Training: ', filename)
 
-        #df = pd.read_csv("prod_data_v.txt", header=None, delim_whitespace=True)
-        df = pd.read_csv(filename, header=None, delim_whitespace=True)
-        prices = pd.DataFrame(df.iloc[:, 2:6].values,
-                              columns=['bid_price', 'bid_volume', 'ask_price',
-                                       'ask_volume'])
-        prices = compute_market_prices(prices)
+        _, prices = read_prices(filename)
 
         actions, pnl_opt = find_optimal_strategy(prices)
         pnl_sim = simulate_trading(prices, actions)
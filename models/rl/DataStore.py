@@ -2,20 +2,23 @@
 
 import numpy as np
 import pandas as pd
+import sys
 import os
 import glob
-import re
-import time
-import datetime
 import itertools
 
+# the tick store is shared with the scripts in models/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tickstore import convert_files, get_date, get_prefix, get_store_path
+from normalization import normalization_stats, standardize_array
+
 
 class DataStore(object):
     """ Load and Store Data from the Trading Competition """
 
     def __init__(self, sequence_length=500, features_list=[1,2,3,4], path='./training_data_large/', training_days=0, testing_days = 0, mean = None, std = None):
         """ 
-             if data is already stored in pickle format, read it from dist, otherwise create it 
+             the days are read from the tick store, input files not yet in the store are converted first
              path ... where to find the training data to load 
              training_days ... how many days are needed for training
              testing_days  ... how many days are needed for testing, is 0 if only training is used
@@ -38,55 +41,33 @@ class DataStore(object):
                 print(" When specifiying testing days, mean and std must be given. Aborting.")
                 raise ValueError
 
-        ## Are there already files given
-        output_file_name = path + "/TradcomSave"+str(training_days)+"_"+str(testing_days)+".pickle" 
+        file_list = sorted(glob.glob(path+'/prod_data_*v.txt'))
 
-        Xdf = pd.DataFrame()
+        if len(file_list) == 0:
+            print ("Files "+path+"prod_data_*txt are needed. Please copy them into "+path+". Aborting.")
+            raise ValueError
 
-        if os.path.isfile(output_file_name):
-            Xdf = pd.read_pickle(output_file_name)
+        if testing_days != 0: 
+            start = training_days
+            end = training_days + testing_days
         else:
-	    # We need to create the file ourselves...
-            file_list = sorted(glob.glob(path+'/prod_data_*v.txt'))
-
-            if len(file_list) == 0:
-                print ("Files "+path+"prod_data_*txt are needed. Please copy them into "+path+". Aborting.")
-                raise ValueError
-
-            if testing_days != 0: 
-                start = training_days
-                end = training_days + testing_days
-            else:
-                start = 0
-                end = training_days
-
-            for filename in file_list[start:end]:
-                print("Working on Input file: ",filename)
+            start = 0
+            end = training_days
 
-                # get the date...
-                r = re.compile('^\D*(\d*)\D*', re.UNICODE)
-                date = re.search(r, filename).group(1)
-                print("Date is ",date)
-                date_ux = time.mktime(datetime.datetime.strptime(date,"%Y%m%d").timetuple())
+        # the input files are converted into the tick store once, later runs read the days memory mapped
+        tick_store = convert_files(file_list[start:end], get_store_path(path, get_prefix(file_list[0])))
 
-                # load dataframes and reindex
-                Xdf_loc = pd.read_csv(filename, sep=" ", header = None,)
+        dates = []
+        for filename in file_list[start:end]:
+            print("Working on Input file: ",filename)
 
-                # print(Xdf_loc.iloc[:3])
+            # get the date...
+            date = get_date(filename)
+            print("Date is ",date)
+            dates.append(date)
 
-                Xdf_loc['Milliseconds'] = Xdf_loc[0]
-                Xdf_loc['Date'] = pd.to_datetime(date_ux*1000*1000*1000)
-                Xdf_loc = Xdf_loc.set_index(['Date', 'Milliseconds'], append=False, drop=True)
-                # print(Xdf_loc.iloc[:3])
-
-                Xdf = pd.concat([Xdf, Xdf_loc])
-                #print(Xdf.index[0])
-                #print(Xdf.index[-1])
-
-
-            ## Store all the data in the file
-       
-            Xdf.to_pickle(output_file_name)
+        # all days at once, indexed by Date and Milliseconds
+        Xdf = tick_store.get_days_frame(dates)
 
 
         #select by features_list
@@ -95,6 +76,9 @@ class DataStore(object):
       
         # keep the bid and ask unmodified
         unmodified_group = [2,4]
+        if mean is None and std is None:
+            # mean and std of the training days are merged from the moments the tick store recorded per day
+            mean, std = normalization_stats(tick_store.get_moments(dates, columns=list(Xdf.columns)), Xdf.columns, colgroups=colgroups, unmodified_group=unmodified_group)
         self.Xdf, self.mean, self.std = self.standardize_inputs(Xdf, colgroups=colgroups, mean=mean, std=std, unmodified_group=unmodified_group)
         self.XdfBidAsk = self.Xdf[[2,4,'U2','U4']]
 
@@ -102,7 +86,7 @@ class DataStore(object):
         # split the Xdf along the days... 
         #print (self.Xdf)
         for date_idx in self.Xdf.index.get_level_values(0).unique():
-            self.Xdf_array_list.append(self.Xdf.loc[date_idx].values)
+            self.Xdf_array_list.append(np.ascontiguousarray(self.Xdf.loc[date_idx].values, dtype=np.float32))
             self.XdfBidAsk_array_list.append(self.XdfBidAsk.loc[date_idx].values)
             self.Xdf_array_day.append(date_idx)
 
@@ -111,82 +95,18 @@ class DataStore(object):
         self.Xdf['U4'] = 0.
 
 
-    def standardize_columns(self, colgroup):
-        """
-        Standardize group of columns together
-        colgroup: Pandas.DataFrame
-        returns: Pandas.DataFrames: Colum Group standardized, Mean of the colgroup, stddeviation of the colgroup
-        """
-        _me = np.mean(colgroup.values.flatten())
-        centered = colgroup.sub(_me)
-        me = pd.DataFrame(np.full(len(colgroup.columns),_me), index=colgroup.columns)
-
-        _st = np.std(colgroup.values.flatten())
-        standardized = centered.div(_st)
-        st = pd.DataFrame(np.full(len(colgroup.columns),_st), index=colgroup.columns)
-
-        return standardized, me, st
-
     def standardize_inputs(self, Xdf, colgroups=None, mean=None, std=None, unmodified_group=None):
         """
         Standardize input features.
         Groups of features could be listed in order to be standardized together.
         Xdf: Pandas.DataFrame
         colgroups: list of lists of groups of features to be standardized together (e.g. bid/ask price, bid/ask size)
-        returns Xdf ...Pandas.DataFrame, mean ...Pandas.DataFrame, std ...Pandas.DataFrame
+        unmodified_group: these columns are kept unchanged as U<col> in addition
+        returns Xdf ...Pandas.DataFrame, mean ...Pandas.Series, std ...Pandas.Series
         """
+        values, labels, me, st = standardize_array(Xdf.values, Xdf.columns, colgroups=colgroups, unmodified_group=unmodified_group, mean=mean, std=std)
 
-        new_unmod_group = []
-        for unmod in unmodified_group:
-           # copy the unmodified column group
-           new_name = 'U'+str(unmod)
-           Xdf[new_name] = Xdf[unmod]
-           new_unmod_group.append(new_name)
-
-        df = pd.DataFrame()
-        me = pd.DataFrame()
-        st = pd.DataFrame()
-
-        for colgroup in colgroups:
-            _df,_me,_st = self.standardize_columns(Xdf[colgroup])
-            # if mean & std are given, do not multiply with colgroup mean
-            if mean is not None and std is not None:
-                _df = Xdf[colgroup]
-
-            df = pd.concat([df, _df], axis=1)
-            me = pd.concat([me, _me])
-            st = pd.concat([st, _st])
-    
-        #     _temp_list = list(itertools.chain.from_iterable(colgroups))
-
-        separate_features = [col for col in Xdf.columns if col not in list(itertools.chain.from_iterable(colgroups))]
-
-        if mean is None and std is None:
-            _me = Xdf[separate_features].mean()
-            _me[new_unmod_group] = 0.
-            _df = Xdf[separate_features].sub(_me)
-            _st = Xdf[separate_features].std()
-            _st[new_unmod_group] = 1.
-            _df = _df[separate_features].div(_st)
-            
-        else:
-            _df = Xdf[separate_features]
-
-        df = pd.concat([df, _df], axis=1)
-        me = pd.concat([me, _me])
-        st = pd.concat([st, _st])
-    
-        me = pd.Series(me[0])
-        st = pd.Series(st[0])
-
-        if mean is not None and std is not None:
-            mean[new_unmod_group] = 0.
-            std[new_unmod_group] = 1.
-
-            df = df.sub(mean)
-            df = df.div(std)
-
-        return df, me, st
+        return pd.DataFrame(values, index=Xdf.index, columns=labels, copy=False), pd.Series(me, index=labels), pd.Series(st, index=labels)
 
 
     def get_number_days(self):
@@ -205,6 +125,7 @@ class DataStore(object):
     def get_sequence(self, day_index=0, line_id=None):
         """
         get the last sequence_length elements from the Xdf by the index id
+        returns a float32 view into the day array, nothing is copied
         """
         #return self.Xdf.ix[id-self.sequence_length:id].values
         if day_index > len(self.Xdf_array_list):
@@ -0,0 +1,122 @@
+"""
+Batch generation of the signal files of all day files.
+The days are fanned out to a pool of processes. A day is skipped when its outputs are newer than the
+input file and were generated with the same parameters, which are kept in a small stamp file per day
+(signal_<day>.json) together with the theoretical PnL and number of trades of the day.
+At the end a summary table of all days is written to signals_summary.csv.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import json
+import multiprocessing
+
+import pandas as pd
+
+SUMMARY_NAME = "signals_summary.csv"
+SUMMARY_COLUMNS = ["date", "file", "pnl", "trades", "generated"]
+
+
+def stamp_file_name(signal_file):
+    """
+    the stamp of signal_20130103v.csv is signal_20130103v.json
+    """
+    return os.path.splitext(signal_file)[0] + ".json"
+
+
+def read_stamp(stamp_file):
+    if not os.path.isfile(stamp_file):
+        return None
+    with open(stamp_file) as f:
+        return json.load(f)
+
+
+def is_up_to_date(day_file, outputs, stamp_file, params):
+    """
+    True if all outputs and the stamp exist, are newer than day_file and the stamp records the same params
+    """
+    stamp = read_stamp(stamp_file)
+    if stamp is None or stamp.get('params') != params:
+        return False
+    input_time = os.path.getmtime(day_file)
+    for output in outputs + [stamp_file]:
+        if not os.path.isfile(output) or os.path.getmtime(output) < input_time:
+            return False
+    return True
+
+
+def _generate_day(args):
+    """
+    worker of generate_days: generator(day_file, **kwargs) writes the outputs of the day and returns PnL, number of trades
+    """
+    generator, day_file, stamp_file, params, kwargs = args
+    _pnl, trade_count = generator(day_file, **kwargs)
+    stamp = {'params': params, 'pnl': float(_pnl), 'trades': int(trade_count)}
+    with open(stamp_file, 'w') as f:
+        json.dump(stamp, f)
+    return day_file, stamp
+
+
+def generate_days(generator, day_files, outputs_of, params, kwargs=None, path="./training_data_large/", processes=None, force=False,
+                  summary_name=SUMMARY_NAME):
+    """
+    Run generator for every day file whose outputs are missing or out of date, in parallel by a pool of processes
+    (default: one per core).
+    generator: module level function generator(day_file, **kwargs) -> (pnl, trade_count), writes the outputs of the day
+    outputs_of: function day_file -> list of the output files, the first one names the stamp,
+                every day needs its own outputs
+    params: dict of everything the outputs depend on besides the input file, e.g. {'generator': 'bid_ask', 'comission': 0.0}
+    force: regenerate all days
+    summary_name: file name of the summary in path, generators writing other signal files keep their own summary
+    returns the summary DataFrame (one row per day), also written to path/summary_name
+    """
+    if kwargs is None:
+        kwargs = {}
+
+    stamps = {}
+    tasks = []
+    owners = {}
+    for day_file in day_files:
+        outputs = outputs_of(day_file)
+        stamp_file = stamp_file_name(outputs[0])
+        # the days run in parallel, two of them must not write the same file
+        for output in outputs + [stamp_file]:
+            if owners.setdefault(os.path.abspath(output), day_file) != day_file:
+                print("Day files {} and {} both write {}. Aborting.".format(owners[os.path.abspath(output)], day_file, output))
+                raise ValueError
+        if not force and is_up_to_date(day_file, outputs, stamp_file, params):
+            stamps[day_file] = (read_stamp(stamp_file), False)
+        else:
+            tasks.append((generator, day_file, stamp_file, params, kwargs))
+
+    print("{} of {} days up to date, generating {}".format(len(day_files) - len(tasks), len(day_files), len(tasks)))
+
+    if len(tasks) <= 1 or processes == 1:
+        days = map(_generate_day, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes)
+        days = pool.imap_unordered(_generate_day, tasks)
+
+    try:
+        for day_file, stamp in days:
+            stamps[day_file] = (stamp, True)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    rows = []
+    for day_file in day_files:
+        stamp, generated = stamps[day_file]
+        filename = os.path.basename(day_file)
+        rows.append([os.path.splitext(filename)[0].split("_")[-1], filename, stamp['pnl'], stamp['trades'], generated])
+    summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+
+    summary_file = os.path.join(path, summary_name)
+    summary.to_csv(summary_file, index=False)
+    print(summary)
+    print("Total PnL: {}  Total trades: {}".format(summary['pnl'].sum(), summary['trades'].sum()))
+    print("Summary saved to ", summary_file)
+    return summary
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from signal_batch import generate_days, stamp_file_name, SUMMARY_NAME
+from signals import signal_file_names
+
+generated = []
+
+
+def write_signal(day_file, scale=1.):
+    """
+    generator writing signal_<day>.csv, PnL and trades from the input file
+    """
+    generated.append(os.path.basename(day_file))
+    with open(day_file) as f:
+        value = float(f.read())
+    with open(signal_file(day_file), 'w') as f:
+        f.write(str(value * scale))
+    return value * scale, 1
+
+
+def signal_file(day_file):
+    return day_file.replace('prod_data', 'signal').replace('txt', 'csv')
+
+
+class GenerateDaysTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.day_files = []
+        for value, date in enumerate(["20130103", "20130104", "20130107"]):
+            day_file = os.path.join(self.path, "prod_data_{}v.txt".format(date))
+            with open(day_file, 'w') as f:
+                f.write(str(value))
+            self.day_files.append(day_file)
+        del generated[:]
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def generate(self, params={'generator': 'test', 'scale': 1.}, **kwargs):
+        del generated[:]
+        return generate_days(write_signal, self.day_files, lambda day_file: [signal_file(day_file)], params,
+                             kwargs={'scale': params['scale']}, path=self.path, processes=1, **kwargs)
+
+    def test_skip(self):
+        summary = self.generate()
+        self.assertEqual(len(generated), 3)
+        self.assertEqual(summary['generated'].tolist(), [True] * 3)
+        self.assertEqual(summary['pnl'].tolist(), [0., 1., 2.])
+        self.assertEqual(summary['date'].tolist(), ["20130103v", "20130104v", "20130107v"])
+        self.assertTrue(os.path.isfile(stamp_file_name(signal_file(self.day_files[0]))))
+
+        # same params, nothing to do, the summary comes from the stamps
+        summary = self.generate()
+        self.assertEqual(generated, [])
+        self.assertEqual(summary['generated'].tolist(), [False] * 3)
+        self.assertEqual(summary['pnl'].tolist(), [0., 1., 2.])
+        self.assertTrue(os.path.isfile(os.path.join(self.path, SUMMARY_NAME)))
+
+    def test_params_changed(self):
+        self.generate()
+        summary = self.generate(params={'generator': 'test', 'scale': 2.})
+        self.assertEqual(len(generated), 3)
+        self.assertEqual(summary['pnl'].tolist(), [0., 2., 4.])
+
+    def test_input_changed(self):
+        self.generate()
+        # the input file of the second day is newer than its outputs
+        later = time.time() + 10
+        os.utime(self.day_files[1], (later, later))
+        summary = self.generate()
+        self.assertEqual(generated, [os.path.basename(self.day_files[1])])
+        self.assertEqual(summary['generated'].tolist(), [False, True, False])
+
+    def test_output_missing(self):
+        self.generate()
+        os.remove(signal_file(self.day_files[2]))
+        self.generate()
+        self.assertEqual(generated, [os.path.basename(self.day_files[2])])
+
+    def test_force(self):
+        self.generate()
+        self.generate(force=True)
+        self.assertEqual(len(generated), 3)
+
+    def test_same_outputs(self):
+        with self.assertRaises(ValueError):
+            generate_days(write_signal, self.day_files, lambda day_file: [os.path.join(self.path, "signal.csv")],
+                          {'generator': 'test'}, path=self.path, processes=1)
+        self.assertEqual(generated, [])
+
+    def test_signal_file_names(self):
+        self.assertEqual(signal_file_names("./data/prod_data_20130103v.txt", "./data/"),
+                         ("./data/signal_20130103v.csv", "./data/signal_20130103v.npz"))
+        # every day gets its own files, not only those of 2013
+        self.assertEqual(signal_file_names("./data/prod_data_20140103v.txt", "./data/")[0], "./data/signal_20140103v.csv")
+        self.assertEqual(signal_file_names("FDAX_20160301.csv.gz", "./data/")[0], "./data/signal_20160301.csv")
+
+    def test_summary_name(self):
+        self.generate(summary_name="signals_opt_summary.csv")
+        self.assertTrue(os.path.isfile(os.path.join(self.path, "signals_opt_summary.csv")))
+        self.assertFalse(os.path.isfile(os.path.join(self.path, SUMMARY_NAME)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+"""
+Compact storage of the signals of a day as sorted event arrays.
+
+Nearly all values of the signal columns (signal, Buy, Sell, Buys, Sells, signal mod) are zero, so only the non zero
+values are kept: one record (tick, value, kind) per value, sorted by tick, kind is the position of the column in KINDS.
+A day is one uncompressed .npz file (signal_20130103v.npz next to signal_20130103v.csv) holding the events, the
+number of ticks and the stored columns. The loader expands the events to dense columns on demand and only for the
+requested range of ticks.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+
+import numpy as np
+import pandas as pd
+
+
+SIGNAL_EVENT_DTYPE = np.dtype([('tick', np.int64), ('value', np.float32), ('kind', np.int8)])
+KINDS = ['signal', 'Buy', 'Sell', 'Buys', 'Sells', 'signal mod']
+
+
+def signal_file_name(day_file, path="./training_data_large/"):
+    """
+    the signal csv of a day file is named by its day, the last part of the name without extensions:
+    signal_20130103v.csv for prod_data_20130103v.txt, signal_20160301.csv for FDAX_20160301.csv.gz
+    """
+    day = os.path.basename(day_file).split(".")[0].split("_")[-1]
+    return os.path.join(path, "signal_" + day + ".csv")
+
+
+def events_file_name(signal_file):
+    """
+    the events file of signal_20130103v.csv is signal_20130103v.npz
+    """
+    return os.path.splitext(signal_file)[0] + ".npz"
+
+
+def to_events(columns):
+    """
+    columns: dict or DataFrame of the dense columns of a day (names in KINDS), e.g. the signals DataFrame
+    returns np-array of SIGNAL_EVENT_DTYPE sorted by tick and kind, number of ticks, names of the stored columns
+    """
+    names = [name for name in KINDS if name in columns]
+    unknown = [name for name in columns if name not in KINDS]
+    if len(unknown) > 0:
+        print("Unknown signal columns {}, known are {}. Aborting.".format(unknown, KINDS))
+        raise ValueError
+
+    length = len(columns[names[0]]) if len(names) > 0 else 0
+    ticks = []
+    values = []
+    kinds = []
+    for name in names:
+        column = np.asarray(columns[name], dtype=np.float32)
+        nonzero = np.flatnonzero(column)
+        ticks.append(nonzero)
+        values.append(column[nonzero])
+        kinds.append(np.full(len(nonzero), KINDS.index(name), dtype=np.int8))
+
+    events = np.empty(sum(len(t) for t in ticks), dtype=SIGNAL_EVENT_DTYPE)
+    if len(events) > 0:
+        events['tick'] = np.concatenate(ticks)
+        events['value'] = np.concatenate(values)
+        events['kind'] = np.concatenate(kinds)
+        events = events[np.lexsort((events['kind'], events['tick']))]
+    return events, length, names
+
+
+def save_events(filename, columns):
+    """
+    write the dense columns of a day as events file
+    """
+    events, length, names = to_events(columns)
+    with open(filename, 'wb') as f:
+        np.savez(f, events=events, length=np.int64(length), kinds=np.array([KINDS.index(name) for name in names], dtype=np.int8))
+
+
+def load_events(filename, start=0, stop=None):
+    """
+    events of the ticks start ... stop - 1 (tick counted from the start of the day), the number of ticks of the day
+    and the names of the stored columns
+    """
+    with np.load(filename) as npz:
+        events = npz['events']
+        length = int(npz['length'])
+        names = [KINDS[kind] for kind in npz['kinds']]
+    if stop is None or stop > length:
+        stop = length
+    lo, hi = np.searchsorted(events['tick'], [start, stop])
+    return events[lo:hi], length, names
+
+
+def expand(events, kind, start, stop, dtype=np.float32):
+    """
+    dense column kind (name in KINDS) of the ticks start ... stop - 1 from the events
+    """
+    dense = np.zeros(stop - start, dtype=dtype)
+    selected = events[(events['kind'] == KINDS.index(kind)) & (events['tick'] >= start) & (events['tick'] < stop)]
+    dense[selected['tick'] - start] = selected['value']
+    return dense
+
+
+def load_signal(filename, kind='signal', start=0, stop=None, dtype=np.float32):
+    """
+    dense column kind of the ticks start ... stop - 1 of the day stored in filename
+    """
+    events, length, _ = load_events(filename, start, stop)
+    return expand(events, kind, start, length if stop is None else min(stop, length), dtype=dtype)
+
+
+def load_frame(filename, start=0, stop=None, kinds=None, dtype=np.float32):
+    """
+    DataFrame of the dense columns kinds (default: all stored) of the ticks start ... stop - 1, indexed by tick
+    """
+    events, length, names = load_events(filename, start, stop)
+    stop = length if stop is None else min(stop, length)
+    if kinds is None:
+        kinds = names
+    return pd.DataFrame(dict((kind, expand(events, kind, start, stop, dtype=dtype)) for kind in kinds),
+                        index=np.arange(start, stop), columns=kinds)
+
+
+def newest_signal_file(signal_file):
+    """
+    the events file of signal_file if it exists and is at least as new as signal_file (csv), else signal_file,
+    so a signal csv written later by another generator is not shadowed by an old events file
+    """
+    events_file = events_file_name(signal_file)
+    if os.path.isfile(events_file) and (not os.path.isfile(signal_file) or
+                                        os.path.getmtime(events_file) >= os.path.getmtime(signal_file)):
+        return events_file
+    return signal_file
+
+
+def read_signal_frame(signal_file, milliseconds):
+    """
+    Milliseconds and signal of the ticks of a day, from the signal csv or from the events file (see newest_signal_file)
+    milliseconds: the Milliseconds of the ticks of the day (e.g. the first column in the tick store), only used for events files
+    returns DataFrame with the columns Milliseconds and signal
+    """
+    if not signal_file.endswith(".npz"):
+        return pd.read_csv(signal_file, names = ['Milliseconds','signal',], )
+
+    signal = load_signal(signal_file, dtype=np.float64)
+    if len(signal) != len(milliseconds):
+        print("Signal file {} has {} ticks, the day has {}. Aborting.".format(signal_file, len(signal), len(milliseconds)))
+        raise ValueError
+    return pd.DataFrame({'Milliseconds': np.asarray(milliseconds).astype(np.int64), 'signal': signal}, columns=['Milliseconds', 'signal'])
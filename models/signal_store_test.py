@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from signal_store import save_events, load_events, load_signal, load_frame, newest_signal_file, read_signal_frame, events_file_name
+
+
+class SignalStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        rng = np.random.RandomState(0)
+        ticks = 5000
+        buy = (rng.rand(ticks) < 0.01).astype(float)
+        sell = (rng.rand(ticks) < 0.01).astype(float) * (1 - buy)
+        self.df = pd.DataFrame({'signal': buy - sell, 'Buy': buy, 'Sell': sell, 'signal mod': buy - sell})
+        self.events_file = os.path.join(self.path, "signal_20130103v.npz")
+        save_events(self.events_file, self.df)
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_round_trip(self):
+        frame = load_frame(self.events_file)
+        self.assertEqual(frame.columns.tolist(), ['signal', 'Buy', 'Sell', 'signal mod'])
+        np.testing.assert_array_equal(frame.values, self.df[frame.columns].values)
+
+    def test_range(self):
+        events, length, _ = load_events(self.events_file, 1000, 2000)
+        self.assertEqual(length, 5000)
+        self.assertTrue(((events['tick'] >= 1000) & (events['tick'] < 2000)).all())
+        self.assertTrue((np.diff(events['tick']) >= 0).all())
+        np.testing.assert_array_equal(load_signal(self.events_file, 'Sell', 1000, 2000), self.df['Sell'].values[1000:2000])
+        np.testing.assert_array_equal(load_frame(self.events_file, 4990).index, np.arange(4990, 5000))
+
+    def test_newest_signal_file(self):
+        signal_file = os.path.join(self.path, "signal_20130103v.csv")
+        self.assertEqual(newest_signal_file(signal_file), self.events_file)
+        milliseconds = np.arange(5000) * 10
+        pd.DataFrame({'Milliseconds': milliseconds, 'signal': self.df['signal']}).to_csv(signal_file, header=False, index=False)
+        later = time.time() + 10
+        os.utime(signal_file, (later, later))
+        self.assertEqual(newest_signal_file(signal_file), signal_file)
+        self.assertTrue(read_signal_frame(self.events_file, milliseconds).equals(read_signal_frame(signal_file, milliseconds)))
+        self.assertEqual(events_file_name(signal_file), self.events_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,6 +12,82 @@ import pandas as pd
 pd.set_option('display.width',    1000)
 pd.set_option('display.max_rows', 1000)
 
+from signal_store import events_file_name, save_events, signal_file_name
+
+
+def inflection_points(bid, ask):
+    """
+    Candidates of find_all_signals: 1 (Buy) where the ask rises at the next tick, -1 (Sell) where the bid falls
+    at the next tick, Buy wins if both, 0 else. The last tick is never a candidate.
+    bid, ask: np-arrays
+    returns np-array of int8
+    """
+    bid = np.asarray(bid, dtype=np.float64)
+    ask = np.asarray(ask, dtype=np.float64)
+    types = np.zeros(len(ask), dtype=np.int8)
+    if len(ask) < 2:
+        return types
+    types[:-1][np.diff(bid) < 0] = -1
+    types[:-1][np.diff(ask) > 0] = 1
+    return types
+
+
+def best_candidates(bid, ask):
+    """
+    The candidates are grouped into runs of the same type. Of every run the best one is kept, the first lowest ask
+    of a Buy run, the first highest bid of a Sell run. The last run is dropped, it has no opposite candidate after it.
+    So the result alternates between Buy and Sell.
+    returns positions ...np-array of the ticks, types ...np-array of 1 (Buy), -1 (Sell)
+    """
+    bid = np.asarray(bid, dtype=np.float64)
+    ask = np.asarray(ask, dtype=np.float64)
+    types = inflection_points(bid, ask)
+    cand = np.flatnonzero(types)
+    cand_types = types[cand]
+    if len(cand) == 0:
+        return cand, cand_types
+
+    run_id = np.concatenate(([0], np.cumsum(cand_types[1:] != cand_types[:-1])))
+    keep = run_id < run_id[-1]  # the last run is not closed by an opposite candidate
+    cand, cand_types, run_id = cand[keep], cand_types[keep], run_id[keep]
+    if len(cand) == 0:
+        return cand, cand_types
+    run_starts = np.flatnonzero(np.concatenate(([True], run_id[1:] != run_id[:-1])))
+
+    # minimize the ask of Buys and the negative bid of Sells, the first one wins on ties
+    value = np.where(cand_types == 1, ask[cand], -bid[cand])
+    run_best = np.fmin.reduceat(value, run_starts)
+    hits = np.flatnonzero(value == run_best[run_id])
+    first = np.ones(len(hits), dtype=bool)
+    first[1:] = run_id[hits[1:]] != run_id[hits[:-1]]
+    hits = hits[first]
+    best = run_starts.copy()
+    best[run_id[hits]] = hits
+    # a NaN price at the start of a run is never replaced, as no comparison with it is true
+    best = np.where(np.isnan(value[run_starts]), run_starts, best)
+    return cand[best], cand_types[best]
+
+
+def profitable_pairs(bid, ask, positions, types, comission=0.0):
+    """
+    Every two consecutive best candidates form a deal if it is profitable after comission: Buy at the ask and
+    Sell at the next bid, or Sell at the bid and Buy at the next ask.
+    returns buy_mod, sell_mod ...np-arrays (ticks) counting the deals each tick opens or closes (0, 1 or 2)
+    """
+    bid = np.asarray(bid, dtype=np.float64)
+    ask = np.asarray(ask, dtype=np.float64)
+    buy_mod = np.zeros(len(ask))
+    sell_mod = np.zeros(len(ask))
+    open_pos, close_pos = positions[:-1], positions[1:]
+    long_deal = (types[:-1] == 1) & (bid[close_pos] > ask[open_pos] + comission)
+    short_deal = (types[:-1] == -1) & (ask[close_pos] < bid[open_pos] - comission)
+    # positions are unique, so every fancy index below touches a tick once
+    buy_mod[open_pos] += long_deal
+    sell_mod[close_pos] += long_deal
+    sell_mod[open_pos] += short_deal
+    buy_mod[close_pos] += short_deal
+    return buy_mod, sell_mod
+
 
 def find_all_signals(_df, comission=0.0, max_position_size=1, debug=False):
     """
@@ -19,98 +95,34 @@ def find_all_signals(_df, comission=0.0, max_position_size=1, debug=False):
     E.g. it will return Buy and Sell signal if ask price at Buy is lower than bid price at Sell minus the comission.
     Then it will move one step forward and consider already seen Sell signal and the next Buy for the possible
     profitable short deal.
+    Works on the bid and ask arrays in one pass (see best_candidates, profitable_pairs), ticks are addressed
+    by position, so the index does not need to be unique.
     """
-    df = deepcopy(_df)
-    df['Buy'] = np.zeros(df.shape[0])
-    df['Sell'] = np.zeros(df.shape[0])
-    df['Buy Mod'] = np.zeros(df.shape[0])
-    df['Sell Mod'] = np.zeros(df.shape[0])
-    
-    inflection_points = pd.DataFrame({'Buy': df["askpx_"].diff().shift(-1) > 0, 'Sell': df["bidpx_"].diff().shift(-1) < 0})
-    iterator = inflection_points.iterrows()
-    
-    max_count = 0
-    position_size = 0
-    
-    try:
-        while True:
-        #for i in range(0, 100):
-                idx_open, next_idx, row_open, sig_type_open = next_signal(iterator, df)
-                iterator = inflection_points.loc[next_idx:].iterrows()
-                #iterator.next()  # works in python 2.x but not in python 3.x
-                iterator.__next__()  # or next(iterator)  in python 3.x+
-                df[sig_type_open][idx_open] = 1
-    except TypeError:
-        print("Iteration stopped")
-    
-    print("Buy candidates: {} Sell candidates: {}".format(df[df['Buy'] != 0].count()['Buy'], df[df['Sell'] != 0].count()['Sell']))
-        
-    candidates = df[(df['Buy'] != 0) | (df['Sell'] != 0)].iterrows()
-    #idx_open, row_open = candidates.next()  # works in python 2.x but not in python 3.x
-    idx_open, row_open = candidates.__next__()  # or use  next(candidates)  in python 3.x+
-    for idx, row in candidates:
-        if row_open['Buy'] == 1 and (df["bidpx_"][idx] > (df["askpx_"][idx_open] + comission)):
-            df['Buy Mod'][idx_open] += 1
-            df['Sell Mod'][idx] += 1
-            
-        elif row_open['Sell'] == 1 and (df["askpx_"][idx] < (df["bidpx_"][idx_open] - comission)):
-                df['Sell Mod'][idx_open] += 1
-                df['Buy Mod'][idx] += 1
-        idx_open = idx
-        row_open = row
-        
-    df = df.rename(columns={"Buy": "Buy Candidates", "Sell": "Sell Candidtates"})
-    
-    df['Buy'] = np.zeros(df.shape[0])
-    df['Sell'] = np.zeros(df.shape[0])
-    df['Buy'][df['Buy Mod'] != 0] = 1
-    df['Sell'][df['Sell Mod'] != 0] = 1
-               
-    print("Buy: {} Sell: {}".format(df[df['Buy Mod'] != 0].count()['Buy Mod'], df[df['Sell Mod'] != 0].count()['Sell Mod']))    
-    print("Buy: {} Sell: {}".format(df[df['Buy'] != 0].count()['Buy'], df[df['Sell'] != 0].count()['Sell']))  
+    df = _df.copy()
+    bid = df["bidpx_"].values
+    ask = df["askpx_"].values
+    positions, types = best_candidates(bid, ask)
+    buy_mod, sell_mod = profitable_pairs(bid, ask, positions, types, comission)
+
+    buy_candidates = np.zeros(df.shape[0])
+    buy_candidates[positions[types == 1]] = 1
+    sell_candidates = np.zeros(df.shape[0])
+    sell_candidates[positions[types == -1]] = 1
+
+    print("Buy candidates: {} Sell candidates: {}".format(np.count_nonzero(buy_candidates), np.count_nonzero(sell_candidates)))
+
+    df["Buy Candidates"] = buy_candidates
+    df["Sell Candidtates"] = sell_candidates
+    df['Buy Mod'] = buy_mod
+    df['Sell Mod'] = sell_mod
+    df['Buy'] = (buy_mod != 0).astype(np.float64)
+    df['Sell'] = (sell_mod != 0).astype(np.float64)
+
+    print("Buy: {} Sell: {}".format(np.count_nonzero(buy_mod), np.count_nonzero(sell_mod)))
 
     return df
                           
 
-def next_signal(iterator, df=None, sig_type=None, outer_idx=None, outer_row=None):
-    """
-    Recursive function to find best signal (Buy or Sell) of the sequnce of possible candidates (inflection points).
-    It compares current candidate and next candidates, if one of the next candidates of the same type is better,
-    e.g. if current candidate is Buy with ask price 20 and next candidate (1) is Buy with ask price 10,
-    then next candidate (2) is Buy with ask price 15, the function should return next candidate (1) with ask price 10
-    when it will face first consequtive Sell candidate.
-    """
-    prev_idx = outer_idx
-    best_idx = outer_idx
-    best_row = outer_row
-    for idx, row in iterator:
-        # print(idx, row)
-        if row['Buy'] or row['Sell']:
-            inner_sig_type = 'Buy' if row['Buy'] else 'Sell'
-            # print("Inner signal: ", idx, inner_sig_type)
-            if sig_type:
-                # print("Outer signal: ", outer_idx, sig_type)
-                if inner_sig_type == sig_type:
-                    # print("Compare {} bid: {} ask: {} with {} bid: {} ask: {}".
-                    #      format(best_idx, df["bidpx_"][best_idx], df["askpx_"][best_idx], idx, df["bidpx_"][idx], df["askpx_"][idx]))
-                    if sig_type == 'Buy' and df["askpx_"][idx] < df["askpx_"][best_idx]:
-                        # print("Better {} candidate at {} with price {}".format(sig_type, idx, df["askpx_"][idx]))
-                        best_idx, best_row = idx, row
-                        #return idx, idx, row, sig_type
-                    if sig_type == 'Sell' and df["bidpx_"][idx] > df["bidpx_"][best_idx]:
-                        # print("Better {} candidate at {} with price {}".format(sig_type, idx, df["bidpx_"][idx]))
-                        best_idx, best_row = idx, row
-                        #return idx, idx, row, sig_type
-                    prev_idx = idx
-                else:
-                    # print("Best {} candidate at {}, break...".format(sig_type, outer_idx))
-                    return best_idx, prev_idx, best_row, sig_type
-            else:
-                # print("Recursion")
-                return next_signal(iterator, df, inner_sig_type, idx, row)
-
-        
-        
 def set_positions(_df):
     df = deepcopy(_df)
     df['Pos'] = np.zeros(df.shape[0])
@@ -135,181 +147,264 @@ def set_positions(_df):
     return df
             
 
+EVENT_DTYPE = np.dtype([('index', np.int64), ('side', np.int8), ('price', np.float64)])
+
+
+def next_lower(values):
+    """
+    position of the next strictly lower value for every element, len(values) if there is none.
+    Pointer jumping: every pointer skips only elements not lower than its own value, so all pointers
+    that have not found a lower value yet jump along in one array operation per round.
+    NaNs are never lower and never have a lower value.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    pointer = np.append(np.arange(1, n + 1), n)
+    target = np.append(values, -np.inf)  # the end is lower than everything
+    nan = np.isnan(values)
+    todo = np.flatnonzero(~nan)
+    while len(todo) > 0:
+        todo = todo[~(target[pointer[todo]] < values[todo])]
+        # a NaN only covers itself, its pointer is the next element
+        pointer[todo] = pointer[pointer[todo]]
+    result = pointer[:n].copy()
+    result[nan] = n
+    return result
+
+
+def _chain_deals(open_price, open_mask, close_price, close_mask, comission=0.0):
+    """
+    Deals of one side in find_signals: a candidate at tick i (open_mask) is closed at the first later close candidate j
+    with close_price[j] > open_price[i] + comission, unless a better open candidate (lower open_price) comes first.
+    A deal can only be opened after the close of the previous one.
+    For Buys the prices are ask (open) and bid (close), for Sells the negative bid and ask.
+    returns opens, closes ...np-arrays of tick positions
+    """
+    n = len(open_price)
+    opens = np.flatnonzero(open_mask)
+    if len(opens) == 0 or n < 2:
+        return opens[:0], opens[:0]
+    better = next_lower(np.where(open_mask, open_price, np.inf))[opens]
+
+    # walk the chain of higher close prices from i+1 until the threshold is passed or the better candidate reached
+    closes = np.where(close_mask, close_price, -np.inf)
+    higher = np.append(next_lower(-closes), n)
+    closes = np.append(closes, -np.inf)
+    threshold = open_price[opens] + comission
+    current = opens + 1
+    active = np.arange(len(opens))
+    while len(active) > 0:
+        found = closes[current[active]] > threshold[active]
+        active = active[~found & (current[active] < better[active])]
+        current[active] = higher[current[active]]
+    deal = (current < better) & (current < n)
+    opens, closes = opens[deal], current[deal]
+
+    # a deal is opened only after the previous one is closed
+    taken = []
+    k = 0
+    while k < len(opens):
+        taken.append(k)
+        k = np.searchsorted(opens, closes[k], side='right')
+    return opens[taken], closes[taken]
+
+
+def chained_deals(bid, ask, comission=0.0):
+    """
+    find_signals for both sides on the bid and ask arrays
+    returns buy, sell_close, sell, buy_close ...np-arrays of tick positions
+    """
+    bid = np.asarray(bid, dtype=np.float64)
+    ask = np.asarray(ask, dtype=np.float64)
+    buy_mask = np.zeros(len(ask), dtype=bool)
+    sell_mask = np.zeros(len(ask), dtype=bool)
+    buy_mask[:-1] = np.diff(ask) > 0
+    sell_mask[:-1] = np.diff(bid) < 0
+    buy, sell_close = _chain_deals(ask, buy_mask, bid, sell_mask, comission)
+    sell, buy_close = _chain_deals(-bid, sell_mask, -ask, buy_mask, comission)
+    return buy, sell_close, sell, buy_close
+
+
+def filter_chained(bid, ask, buy, buy_close, sell, sell_close):
+    """
+    filter_signals on arrays: a tick is a Buy if it opens a Buy and closes a Sell deal (Sell alike).
+    Between two consecutive Buys the best Sell candidate (highest bid, first one) becomes a Sell, between two
+    Sells the best Buy candidate (lowest ask).
+    buy, buy_close, sell, sell_close: np-arrays of bool (ticks)
+    returns buy_mod, sell_mod ...np-arrays of bool
+    """
+    buy_mod = buy & buy_close
+    sell_mod = sell & sell_close
+    signal = buy_mod.astype(np.int8) - sell_mod.astype(np.int8)
+    positions = np.flatnonzero(signal)
+    same = np.flatnonzero(signal[positions[1:]] == signal[positions[:-1]])
+
+    # only the ticks between repeated signals are looked at, insertions do not change the signals found above
+    for k in same:
+        start, end = positions[k], positions[k + 1] + 1
+        if signal[start] == 1:
+            candidates = np.where(sell[start:end], bid[start:end], np.nan)
+            if not np.isnan(candidates).all():
+                sell_mod[start + np.nanargmax(candidates)] = True
+        else:
+            candidates = np.where(buy[start:end], ask[start:end], np.nan)
+            if not np.isnan(candidates).all():
+                buy_mod[start + np.nanargmin(candidates)] = True
+    return buy_mod, sell_mod
+
+
+def signal_events(index, bid, ask, buy, sell):
+    """
+    compact event list of the signals instead of tick aligned columns: one record (index, side, price) per signal,
+    side 1 buys at the ask, side -1 sells at the bid, sorted by tick
+    index: index values of the ticks (e.g. Milliseconds), buy, sell: np-arrays of bool
+    returns np-array of EVENT_DTYPE
+    """
+    index = np.asarray(index)
+    buys = np.flatnonzero(buy)
+    sells = np.flatnonzero(sell)
+    positions = np.concatenate((buys, sells))
+    events = np.empty(len(positions), dtype=EVENT_DTYPE)
+    events['index'] = index[positions]
+    events['side'] = np.concatenate((np.ones(len(buys), dtype=np.int8), -np.ones(len(sells), dtype=np.int8)))
+    events['price'] = np.concatenate((np.asarray(ask)[buys], np.asarray(bid)[sells]))
+    return events[np.argsort(positions, kind='mergesort')]
+
+
+def chained_signal_events(df, comission=0.0):
+    """
+    chained deal signals (find_signals both sides, filter_signals) of the tick frame as event list, the frame is not modified
+    """
+    bid = df["bidpx_"].values.astype(np.float64)
+    ask = df["askpx_"].values.astype(np.float64)
+    buy, sell_close, sell, buy_close = [np.zeros(len(ask), dtype=bool) for _ in range(4)]
+    for mask, positions in zip((buy, sell_close, sell, buy_close), chained_deals(bid, ask, comission)):
+        mask[positions] = True
+    buy_mod, sell_mod = filter_chained(bid, ask, buy, buy_close, sell, sell_close)
+    return signal_events(df.index.values, bid, ask, buy_mod, sell_mod)
+
+
 def find_signals(df, sig_type, comission=0.0, debug=False):
+    """
+    Chained deals of sig_type: a Buy candidate (the ask rises next) is opened if a later Sell candidate bids more than
+    the ask plus comission before a Buy candidate with a lower ask shows up, then it is closed there.
+    The next deal can only be opened after the close. Adds the columns Buy and Sell Close (Sell and Buy Close).
+    """
     colnames = {"Buy": ("Buy", "Sell Close"),
                 "Sell": ("Sell", "Buy Close")}
-    inflection_points_buy = df["askpx_"].diff().shift(-1) > 0
-    inflection_points_sell = df["bidpx_"].diff().shift(-1) < 0
-    
-    iterator = inflection_points_buy.iteritems() if sig_type == "Buy" else inflection_points_sell.iteritems()
-    inflection_points = inflection_points_buy if sig_type == "Buy" else inflection_points_sell
-    inner_inflection_points = inflection_points_sell if sig_type == "Buy" else inflection_points_buy
-    
-    max_count = 0
-    
     (major_colname, minor_colname) = colnames[sig_type]
-    
-    df[major_colname] = np.zeros(df.shape[0])
-    df[minor_colname] = np.zeros(df.shape[0])
-    
-    for idx, val in iterator:
-        if max_count > 10000 and debug:
-            print("Max count reached, break...")
-            break
-        inner_iterator = inner_inflection_points.loc[idx:].iteritems()
-        if df[df[minor_colname]==1].empty:
-            can_open = True
-        else:
-            can_open = idx > df[df[minor_colname]==1].index[-1]
-        max_count += 1
-        if val and can_open:
-            print("{} candidate at {} with price {}".format(sig_type, idx, df["askpx_"][idx]))
-            for inner_idx, inner_val in inner_iterator:
-                if inner_idx > idx:
-                    if sig_type == "Buy":
-                        if df["askpx_"][inner_idx] < df["askpx_"][idx] and inflection_points[inner_idx]:
-                            print("Better {} candidate at {} with price {}, break...".format(sig_type, inner_idx, df["askpx_"][inner_idx]))
-                            break
-                        if df["bidpx_"][inner_idx] > (df["askpx_"][idx] + comission) and inner_val:
-                            df[major_colname][idx] = 1
-                            df[minor_colname][inner_idx] = 1
-                            print("Buy at {} with price {}".format(idx, df["askpx_"][idx]))
-                            print("Sell at {} with price {}".format(inner_idx, df["bidpx_"][inner_idx]))
-                            break
-                    elif sig_type == "Sell":
-                        if df["bidpx_"][inner_idx] > df["bidpx_"][idx] and inflection_points[inner_idx]:
-                            print("Better {} candidate at {} with price {}, break...".format(sig_type, inner_idx, df["bidpx_"][inner_idx]))
-                            break
-                        if df["askpx_"][inner_idx] < (df["bidpx_"][idx] - comission) and inner_val:
-                            df[major_colname][idx] = 1
-                            df[minor_colname][inner_idx] = 1
-                            print("Sell at {} with price {}".format(idx, df["bidpx_"][idx]))
-                            print("Buy at {} with price {}".format(inner_idx, df["askpx_"][inner_idx]))
-                            break   
+
+    buy, sell_close, sell, buy_close = chained_deals(df["bidpx_"].values, df["askpx_"].values, comission)
+    opens, closes = (buy, sell_close) if sig_type == "Buy" else (sell, buy_close)
+    print("{} deals: {}".format(sig_type, len(opens)))
+
+    major = np.zeros(df.shape[0])
+    major[opens] = 1
+    minor = np.zeros(df.shape[0])
+    minor[closes] = 1
+    df[major_colname] = major
+    df[minor_colname] = minor
     return df
 
 
 def filter_signals(df):
-    buys = df["Buy"] + df["Buy Close"]
-    df["Buy Mod"] = np.zeros(df.shape[0])
-    df["Buy Mod"][buys == 2] = 1
-    sells = df["Sell"] + df["Sell Close"]
-    df["Sell Mod"] = np.zeros(df.shape[0])
-    df["Sell Mod"][sells == 2] = 1
-    
-    iterator = df.iterrows()
-    current_signal = 0
-    
-    for idx, row in iterator:
-        current_signal = row["Buy Mod"] - row["Sell Mod"]
-        
-        if current_signal != 0:
-            print("Signal {} at {}".format(current_signal, idx))
-            inner_iterator = df.loc[idx:].iterrows()
-            #inner_iterator.next()  # works in python 2.x but not in python 3.x
-            inner_iterator.__next__()  # or next(inner_iterator)  in python 3.x+
-            for inner_idx, inner_row in inner_iterator:
-                next_signal = inner_row["Buy Mod"] - inner_row["Sell Mod"]
-                if next_signal == current_signal:
-                    print("Consecutive similar signal {} at {}".format(next_signal, inner_idx))
-                    if current_signal == 1:
-                        df_slice = df.loc[idx:inner_idx]
-                        candidates = df_slice[df_slice["Sell"] == 1]
-                        best_candidate = candidates["bidpx_"].idxmax()
-                        print(df.loc[best_candidate])
-                        df["Sell Mod"].loc[best_candidate] = 1
-                        break
-                    elif current_signal == -1:
-                        df_slice = df.loc[idx:inner_idx]
-                        candidates = df_slice[df_slice["Buy"] == 1]
-                        best_candidate = candidates["askpx_"].idxmin()
-                        print(df.loc[best_candidate])
-                        df["Buy Mod"].loc[best_candidate] = 1
-                        break
-                elif next_signal != 0 and next_signal != current_signal:
-                    break
-                    
+    """
+    Keep the ticks that open one and close the other deal as Buy and Sell, fill in the best candidate between
+    two consecutive signals of the same side (see filter_chained). The candidates are kept as Buy Open and Sell Open.
+    """
+    bid = df["bidpx_"].values
+    ask = df["askpx_"].values
+    buy_mod, sell_mod = filter_chained(bid, ask, df["Buy"].values == 1, df["Buy Close"].values == 1,
+                                       df["Sell"].values == 1, df["Sell Close"].values == 1)
+    df["Buy Mod"] = buy_mod.astype(np.float64)
+    df["Sell Mod"] = sell_mod.astype(np.float64)
+
     df["Buy Open"] = df["Buy"]
     df["Sell Open"] = df["Sell"]
     df = df.drop(["Buy", "Sell"], axis=1)
-    print(df.columns)
     df = df.rename(columns={"Buy Mod": "Buy", "Sell Mod": "Sell"})
     print(df.columns)
     # df = df.drop(["Buy Close", "Sell Close"], axis=1)
     return df
 
 
+def span_mask(price, positions):
+    """
+    Extend every signal at positions back over the ticks right before it with the same price.
+    The prices are grouped into runs of equal consecutive values, a span reaches from the start of the run
+    to the signal, all spans are marked at once with a difference array.
+    price: np-array, positions: np-array of the signal ticks
+    returns np-array of bool
+    """
+    price = np.asarray(price, dtype=np.float64)
+    positions = np.asarray(positions, dtype=np.int64)
+    positions = positions[~np.isnan(price[positions])]  # NaN equals nothing, not even the signal itself
+    ticks = len(price)
+    new_run = np.ones(ticks, dtype=bool)
+    new_run[1:] = price[1:] != price[:-1]
+    run_start = np.maximum.accumulate(np.where(new_run, np.arange(ticks), 0))
+
+    edges = np.zeros(ticks + 1, dtype=np.int64)
+    np.add.at(edges, run_start[positions], 1)
+    np.add.at(edges, positions + 1, -1)
+    return np.cumsum(edges[:-1]) > 0
+
+
 def make_spans(df, sig_type):
+    """
+    Mark the signals of sig_type and the ticks right before them with the same price (ask for Buy, bid for Sell)
+    in the column Buys or Sells
+    """
     span_colname = "Buys" if sig_type == "Buy" else "Sells"
-    reversed_df = df[::-1]
-    df[span_colname] = np.zeros(df.shape[0])
-    
-    for idx in df[sig_type][df[sig_type] == 1].index:
-        signal_val = df.loc[idx]
-        iterator = reversed_df.loc[idx:].iterrows()
-        #_d = print("Outer loop:", idx, signal_val["askpx_"]) if sig_type == "Buy" else print("Outer loop:", idx, signal_val["bidpx_"])
-        for i, val in iterator:
-            # _d = print("Inner loop:", i, val["askpx_"]) if sig_type == "Buy" else print("Inner loop:", i, val["bidpx_"])
-            if sig_type == "Buy":
-                if val["askpx_"] == signal_val["askpx_"]:
-                    # print("Add to buys")
-                    df[span_colname][i] = 1
-                else:
-                    break
-            elif sig_type == "Sell":
-                if val["bidpx_"] == signal_val["bidpx_"]:
-                    # print("Add to sells")
-                    df[span_colname][i] = 1
-                else:
-                    break
+    price = df["askpx_"].values if sig_type == "Buy" else df["bidpx_"].values
+    positions = np.flatnonzero(df[sig_type].values == 1)
+    df[span_colname] = span_mask(price, positions).astype(np.float64)
     return df
 
 
 def pnl(df, chained=False, comission=0.02):
-    deals = []
-    pnl = 0
-    
+    """
+    theoretical PnL and number of deals of the signals
+    chained=False: every Buy Mod / Sell Mod tick is a deal at the ask / bid, minus comission per deal
+    chained=True: the Buy / Sell ticks reverse the position, every signal after the first counts twice, the last once
+    """
+    bid = df["bidpx_"].values
+    ask = df["askpx_"].values
     if not chained:
-        for idx, row in df[(df['Buy Mod'] != 0) | (df['Sell Mod'] != 0)].iterrows():
-            current_trade = row['Sell Mod'] * row["bidpx_"] - row['Buy Mod'] * row["askpx_"]
-            pnl = pnl + current_trade - comission
-            deals.append(current_trade)
-            print("Running PnL: ", pnl)
-
-        print("Check PnL: {} vs {}".format(pnl, np.sum(deals)))
-        return pnl, len(deals)
+        buy_mod = df['Buy Mod'].values
+        sell_mod = df['Sell Mod'].values
+        deals = (buy_mod != 0) | (sell_mod != 0)
+        trades = sell_mod[deals] * bid[deals] - buy_mod[deals] * ask[deals]
+        pnl = np.sum(trades) - comission * len(trades)
+        print("Check PnL: {} vs {}".format(pnl, np.sum(trades)))
+        return pnl, len(trades)
     else:
-        is_opened = False
-
-        for idx, row in df.iterrows():
-            if row["Buy"]:
-                if is_opened:
-                    deals.append(-row["askpx_"])
-                deals.append(-row["askpx_"])
-                is_opened = True
-            elif row["Sell"]:
-                if is_opened:
-                    deals.append(row["bidpx_"])
-                deals.append(row["bidpx_"])
-                is_opened = True
-        print(len(deals))
-        deals.pop()
-        print(len(deals))
+        buy = df["Buy"].values != 0
+        sell = (df["Sell"].values != 0) & ~buy
+        prices = np.where(buy, -ask, bid)[buy | sell]
+        if len(prices) == 0:
+            return 0., 0
+        deals = np.concatenate((prices[:1], np.repeat(prices[1:], 2)))[:-1]
         return np.sum(deals), len(deals)
     
     
-def generate_signals_for_file(day_file, comission=0.0, write_spans=False, chained_deals=False, min_trade_amount=None):
-    (path, filename) = os.path.split(day_file)
-    
-    path = "./training_data_large/"  # to make sure signal files are written in same directory as data files
-    
-    if "_2013" in filename: 
-        month = filename.split("_")[2].split(".")[0]
-        write_signal_file = path + "signal_" + month + ".csv"
-        write_signals_file = path + "signals_" + month + ".pickle"
-    else:
-        write_signal_file = path + "signal.csv"
-        write_signals_file = path + "signals.pickle"
+def signal_file_names(day_file, path="./training_data_large/"):
+    """
+    signal file (csv) and signals events file (see signal_store.py) of a day,
+    e.g. signal_20130103v.csv and signal_20130103v.npz for prod_data_20130103v.txt
+    """
+    signal_file = signal_file_name(day_file, path)
+    return signal_file, events_file_name(signal_file)
+
+
+def generate_signals_for_file(day_file, comission=0.0, write_spans=False, chained_deals=False, min_trade_amount=None,
+                              path="./training_data_large/", return_stats=False, write_csv=True):
+    """
+    path: where the signal files are written, the same directory as the data files
+    write_csv: write the signal csv besides the events file
+    return_stats: return df, theoretical PnL and number of trades instead of df only
+    """
+    write_signal_file, write_signals_file = signal_file_names(day_file, path)
 
     print("Processing file ",day_file)
     print("Writing to files {}, {}".format(write_signal_file, write_signals_file))
@@ -323,19 +418,19 @@ def generate_signals_for_file(day_file, comission=0.0, write_spans=False, chaine
         df = find_signals(df, "Sell")
         df = filter_signals(df)
     
-    df['signal'] = np.zeros(df.shape[0])
-    
     if write_spans:
         df = make_spans(df, "Buy")    
         df = make_spans(df, "Sell")
-        df['signal'][df["Buys"] == 1] = 1.0
-        df['signal'][df["Sells"] == 1] = -1.0
+        df['signal'] = np.where(df["Sells"].values == 1, -1.0, np.where(df["Buys"].values == 1, 1.0, 0.0))
         print("Saving spanned signals instead of point signals!")
     else:
-        df['signal'][df["Buy"] == 1] = 1.0
-        df['signal'][df["Sell"] == 1] = -1.0
+        df['signal'] = np.where(df["Sell"].values == 1, -1.0, np.where(df["Buy"].values == 1, 1.0, 0.0))
 
-    df['signal mod'] = df['Buy Mod'] - df['Sell Mod']
+    if chained_deals:
+        # filter_signals has renamed Buy Mod / Sell Mod to Buy / Sell
+        df['signal mod'] = df['Buy'] - df['Sell']
+    else:
+        df['signal mod'] = df['Buy Mod'] - df['Sell Mod']
     
     _pnl, trade_count = pnl(df, chained_deals)
     print("Max. theoret. PNL    : ", _pnl) #df.sum().absret_)
@@ -349,8 +444,18 @@ def generate_signals_for_file(day_file, comission=0.0, write_spans=False, chaine
         df = df[['signal', 'Buy', 'Sell', 'Buys', 'Sells', 'signal mod']]
     else:
         df = df[['signal', 'Buy', 'Sell', 'signal mod']]
-    signal_df = df['signal']
-    df.to_pickle(write_signals_file)
-    signal_df.to_csv(write_signal_file)
+    if write_csv:
+        df['signal'].to_csv(write_signal_file, header=False)
+    save_events(write_signals_file, df)
     print("Results saved")
+    if return_stats:
+        return df, _pnl, trade_count
     return df
+
+
+def signal_stats_for_file(day_file, **kwargs):
+    """
+    generator for signal_batch.generate_days: writes the signal files of the day, returns PnL, number of trades
+    """
+    _, _pnl, trade_count = generate_signals_for_file(day_file, return_stats=True, **kwargs)
+    return _pnl, trade_count
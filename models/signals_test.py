@@ -0,0 +1,252 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from signals import find_all_signals, best_candidates, make_spans, find_signals, filter_signals, chained_signal_events, next_lower
+
+
+def find_all_signals_loop(bid, ask, comission=0.0):
+    """
+    The former iterrows implementation of find_all_signals, transliterated to plain lists:
+    next_signal walks the inflection points and returns the best candidate of a run when the opposite type
+    shows up, the walk restarts after the last candidate of the run. Then consecutive candidates are paired.
+    returns buy candidates, sell candidates, buy mod, sell mod as lists
+    """
+    n = len(ask)
+    buy_ip = [i < n - 1 and ask[i + 1] - ask[i] > 0 for i in range(n)]
+    sell_ip = [i < n - 1 and bid[i + 1] - bid[i] < 0 for i in range(n)]
+
+    def next_signal(iterator, sig_type=None, outer_idx=None):
+        prev_idx = outer_idx
+        best_idx = outer_idx
+        for idx in iterator:
+            if buy_ip[idx] or sell_ip[idx]:
+                inner_sig_type = 'Buy' if buy_ip[idx] else 'Sell'
+                if sig_type:
+                    if inner_sig_type == sig_type:
+                        if sig_type == 'Buy' and ask[idx] < ask[best_idx]:
+                            best_idx = idx
+                        if sig_type == 'Sell' and bid[idx] > bid[best_idx]:
+                            best_idx = idx
+                        prev_idx = idx
+                    else:
+                        return best_idx, prev_idx, sig_type
+                else:
+                    return next_signal(iterator, inner_sig_type, idx)
+
+    buy = [0.] * n
+    sell = [0.] * n
+    iterator = iter(range(n))
+    while True:
+        found = next_signal(iterator)
+        if found is None:
+            break
+        idx_open, next_idx, sig_type = found
+        iterator = iter(range(next_idx + 1, n))
+        if sig_type == 'Buy':
+            buy[idx_open] = 1.
+        else:
+            sell[idx_open] = 1.
+
+    buy_mod = [0.] * n
+    sell_mod = [0.] * n
+    candidates = [i for i in range(n) if buy[i] != 0 or sell[i] != 0]
+    for idx_open, idx in zip(candidates[:-1], candidates[1:]):
+        if buy[idx_open] == 1 and bid[idx] > ask[idx_open] + comission:
+            buy_mod[idx_open] += 1
+            sell_mod[idx] += 1
+        elif sell[idx_open] == 1 and ask[idx] < bid[idx_open] - comission:
+            sell_mod[idx_open] += 1
+            buy_mod[idx] += 1
+    return buy, sell, buy_mod, sell_mod
+
+
+def make_spans_loop(price, signal):
+    """
+    The former make_spans on plain lists: from every signal walk back while the price stays the same
+    """
+    spans = [0.] * len(price)
+    for idx in [i for i in range(len(price)) if signal[i] == 1]:
+        for i in range(idx, -1, -1):
+            if price[i] == price[idx]:
+                spans[i] = 1.
+            else:
+                break
+    return spans
+
+
+def find_signals_loop(bid, ask, sig_type, comission=0.0):
+    """
+    The former find_signals on plain lists: from every candidate scan forward until a better candidate of the
+    same side or a profitable close, a deal is opened only after the previous close
+    returns the columns Buy, Sell Close (Sell, Buy Close) as lists
+    """
+    n = len(ask)
+    buy_ip = [i < n - 1 and ask[i + 1] - ask[i] > 0 for i in range(n)]
+    sell_ip = [i < n - 1 and bid[i + 1] - bid[i] < 0 for i in range(n)]
+    inflection_points, inner_inflection_points = (buy_ip, sell_ip) if sig_type == "Buy" else (sell_ip, buy_ip)
+    major = [0.] * n
+    minor = [0.] * n
+    last_close = None
+    for idx in range(n):
+        can_open = last_close is None or idx > last_close
+        if inflection_points[idx] and can_open:
+            for inner_idx in range(idx + 1, n):
+                if sig_type == "Buy":
+                    if ask[inner_idx] < ask[idx] and inflection_points[inner_idx]:
+                        break
+                    if bid[inner_idx] > (ask[idx] + comission) and inner_inflection_points[inner_idx]:
+                        major[idx] = 1.
+                        minor[inner_idx] = 1.
+                        last_close = inner_idx
+                        break
+                else:
+                    if bid[inner_idx] > bid[idx] and inflection_points[inner_idx]:
+                        break
+                    if ask[inner_idx] < (bid[idx] - comission) and inner_inflection_points[inner_idx]:
+                        major[idx] = 1.
+                        minor[inner_idx] = 1.
+                        last_close = inner_idx
+                        break
+    return major, minor
+
+
+def filter_signals_loop(bid, ask, buy, buy_close, sell, sell_close):
+    """
+    The former filter_signals on plain lists, the outer loop sees the signals as they were at the start
+    returns Buy Mod, Sell Mod as lists
+    """
+    n = len(ask)
+    buy_mod = [1. if buy[i] + buy_close[i] == 2 else 0. for i in range(n)]
+    sell_mod = [1. if sell[i] + sell_close[i] == 2 else 0. for i in range(n)]
+    signals = [buy_mod[i] - sell_mod[i] for i in range(n)]
+    for idx in range(n):
+        current_signal = signals[idx]
+        if current_signal != 0:
+            for inner_idx in range(idx + 1, n):
+                next_signal = buy_mod[inner_idx] - sell_mod[inner_idx]
+                if next_signal == current_signal:
+                    if current_signal == 1:
+                        candidates = [i for i in range(idx, inner_idx + 1) if sell[i] == 1]
+                        if candidates:
+                            sell_mod[max(candidates, key=lambda i: bid[i])] = 1.
+                    else:
+                        candidates = [i for i in range(idx, inner_idx + 1) if buy[i] == 1]
+                        if candidates:
+                            buy_mod[min(candidates, key=lambda i: ask[i])] = 1.
+                    break
+                elif next_signal != 0:
+                    break
+    return buy_mod, sell_mod
+
+
+def random_quotes(ticks, seed=0):
+    """
+    bid/ask DataFrame like the input files: random walk in steps of 0.25 with many repeated prices, spread 1 or 2 steps
+    """
+    rng = np.random.RandomState(seed)
+    bid = 1000. + 0.25 * np.cumsum(rng.randint(-1, 2, size=ticks) * (rng.rand(ticks) < 0.3))
+    ask = bid + 0.25 * rng.randint(1, 3, size=ticks)
+    return pd.DataFrame({"mp": (bid + ask) / 2., "bidpx_": bid, "askpx_": ask}, index=np.arange(ticks) * 10)
+
+
+class FindAllSignalsTest(unittest.TestCase):
+    def assertParity(self, df, comission=0.0):
+        result = find_all_signals(df, comission)
+        buy, sell, buy_mod, sell_mod = find_all_signals_loop(df["bidpx_"].tolist(), df["askpx_"].tolist(), comission)
+        np.testing.assert_array_equal(result["Buy Candidates"].values, buy)
+        np.testing.assert_array_equal(result["Sell Candidtates"].values, sell)
+        np.testing.assert_array_equal(result["Buy Mod"].values, buy_mod)
+        np.testing.assert_array_equal(result["Sell Mod"].values, sell_mod)
+        np.testing.assert_array_equal(result["Buy"].values, np.asarray(buy_mod) != 0)
+        np.testing.assert_array_equal(result["Sell"].values, np.asarray(sell_mod) != 0)
+
+    def test_parity_random(self):
+        for seed in range(5):
+            self.assertParity(random_quotes(3000, seed=seed))
+
+    def test_parity_comission(self):
+        for comission in [0.25, 0.5, 1.0]:
+            self.assertParity(random_quotes(3000, seed=7), comission)
+
+    def test_small_example(self):
+        df = pd.DataFrame({"bidpx_": [10., 9., 9., 12., 13., 11., 10., 10., 8., 9.],
+                           "askpx_": [11., 10., 10., 13., 14., 12., 11., 11., 9., 10.]})
+        self.assertParity(df)
+        result = find_all_signals(df)
+        # buy at the ask 10 (tick 2), sell at the bid 13 (tick 4), buy back at the ask 9 (tick 8) is the last run
+        self.assertEqual(list(np.flatnonzero(result["Buy Mod"].values)), [2])
+        self.assertEqual(list(np.flatnonzero(result["Sell Mod"].values)), [4])
+
+    def test_no_closed_run(self):
+        df = pd.DataFrame({"bidpx_": [10., 10., 10.], "askpx_": [11., 12., 13.]})
+        result = find_all_signals(df)
+        self.assertEqual(result["Buy"].sum() + result["Sell"].sum(), 0)
+
+    def test_best_candidates_alternate(self):
+        df = random_quotes(10000, seed=3)
+        positions, types = best_candidates(df["bidpx_"].values, df["askpx_"].values)
+        self.assertTrue((np.diff(positions) > 0).all())
+        self.assertTrue((types[1:] != types[:-1]).all())
+
+
+class MakeSpansTest(unittest.TestCase):
+    def test_parity(self):
+        for seed in range(5):
+            df = find_all_signals(random_quotes(3000, seed=seed))
+            df = make_spans(df, "Buy")
+            df = make_spans(df, "Sell")
+            np.testing.assert_array_equal(df["Buys"].values, make_spans_loop(df["askpx_"].tolist(), df["Buy"].tolist()))
+            np.testing.assert_array_equal(df["Sells"].values, make_spans_loop(df["bidpx_"].tolist(), df["Sell"].tolist()))
+
+    def test_span_stops_at_price_change(self):
+        df = pd.DataFrame({"askpx_": [5., 4., 4., 4., 6., 4.], "bidpx_": [4., 3., 3., 3., 5., 3.],
+                           "Buy": [0., 0., 0., 1., 0., 1.]})
+        self.assertEqual(make_spans(df, "Buy")["Buys"].tolist(), [0., 1., 1., 1., 0., 1.])
+
+
+class ChainedSignalsTest(unittest.TestCase):
+    def assertParity(self, df, comission=0.0):
+        bid, ask = df["bidpx_"].tolist(), df["askpx_"].tolist()
+        buy, sell_close = find_signals_loop(bid, ask, "Buy", comission)
+        sell, buy_close = find_signals_loop(bid, ask, "Sell", comission)
+        buy_mod, sell_mod = filter_signals_loop(bid, ask, buy, buy_close, sell, sell_close)
+
+        result = find_signals(df.copy(), "Buy", comission)
+        result = find_signals(result, "Sell", comission)
+        np.testing.assert_array_equal(result["Buy"].values, buy)
+        np.testing.assert_array_equal(result["Sell Close"].values, sell_close)
+        np.testing.assert_array_equal(result["Sell"].values, sell)
+        np.testing.assert_array_equal(result["Buy Close"].values, buy_close)
+
+        result = filter_signals(result)
+        np.testing.assert_array_equal(result["Buy"].values, buy_mod)
+        np.testing.assert_array_equal(result["Sell"].values, sell_mod)
+        np.testing.assert_array_equal(result["Buy Open"].values, buy)
+        np.testing.assert_array_equal(result["Sell Open"].values, sell)
+
+        events = chained_signal_events(df, comission)
+        buys = events[events['side'] == 1]
+        sells = events[events['side'] == -1]
+        np.testing.assert_array_equal(buys['index'], df.index.values[np.flatnonzero(buy_mod)])
+        np.testing.assert_array_equal(buys['price'], df["askpx_"].values[np.flatnonzero(buy_mod)])
+        np.testing.assert_array_equal(sells['index'], df.index.values[np.flatnonzero(sell_mod)])
+        np.testing.assert_array_equal(sells['price'], df["bidpx_"].values[np.flatnonzero(sell_mod)])
+        self.assertTrue((np.diff(events['index']) >= 0).all())
+
+    def test_parity_random(self):
+        for seed in range(5):
+            self.assertParity(random_quotes(2000, seed=seed))
+
+    def test_parity_comission(self):
+        for comission in [0.25, 0.5]:
+            self.assertParity(random_quotes(2000, seed=11), comission)
+
+    def test_next_lower(self):
+        values = np.array([3., 1., 2., 2., np.nan, 0., 5.])
+        np.testing.assert_array_equal(next_lower(values), [1, 5, 5, 5, 7, 7, 7])
+
+
+if __name__ == '__main__':
+    unittest.main()
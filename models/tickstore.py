@@ -0,0 +1,392 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import sys
+import os
+import glob
+import re
+import json
+import shutil
+import multiprocessing
+import time
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from normalization import Moments
+
+
+MANIFEST_NAME = "manifest.json"
+DEFAULT_STORE = "tickstore"
+STAGING_DIR = "staging"
+DEFAULT_CHUNKSIZE = 100000  # ticks parsed at once when converting input files
+
+
+def get_date(filename):
+    """
+    get the trading day (YYYYMMDD string) from a file name like prod_data_20130103v.txt or FDAX_20160301.csv.gz
+    """
+    r = re.compile('^\D*(\d*)\D*', re.UNICODE)
+    return re.search(r, os.path.basename(filename)).group(1)
+
+
+def get_prefix(filename):
+    """
+    get the dataset of an input file, the part of the name before the date: prod_data_20130103v.txt -> prod_data,
+    FDAX_20160301.csv.gz -> FDAX
+    """
+    r = re.compile('^(\D*?)_?\d', re.UNICODE)
+    match = re.search(r, os.path.basename(filename))
+    return match.group(1) if match else os.path.basename(filename)
+
+
+def get_source_signature(filename):
+    """
+    name, modification time and size of an input file, recorded with its day to notice edited or re-downloaded files
+    """
+    st = os.stat(filename)
+    return {'source': os.path.basename(filename), 'mtime': st.st_mtime, 'size': st.st_size}
+
+
+def get_date_index(date):
+    """
+    returns the Timestamp used as the first index level (Date) of the tick DataFrames
+    """
+    date_ux = time.mktime(datetime.datetime.strptime(date, "%Y%m%d").timetuple())
+    return pd.to_datetime(date_ux*1000*1000*1000)
+
+
+def get_store_path(path, prefix):
+    """
+    the tick store lives next to the input files, one store per dataset (prefix, see get_prefix),
+    e.g. tickstore_prod_data and tickstore_FDAX, as the datasets have different columns
+    """
+    return os.path.join(path, DEFAULT_STORE + "_" + prefix)
+
+
+class TickStore(object):
+    """
+    Columnar, memory mapped store of the raw tick files.
+
+    Every column of the input files is kept in its own binary file (col_<n>.bin) with a fixed dtype,
+    the days are appended one after the other. The manifest maps each day to its offset and length,
+    so reading a day only touches the pages of that day. It also keeps the moments of every column
+    of each day, mean and std of any set of days are merged from them without reading the days.
+    The manifest records the dataset (prefix) of the store and the name, modification time and size of the
+    input file of every day; a day whose input file has changed is replaced (see convert_files).
+    """
+
+    def __init__(self, store_path, dtype=np.float64, prefix=None):
+        self.store_path = store_path
+        self._memmaps = {}
+
+        manifest_file = os.path.join(store_path, MANIFEST_NAME)
+        if os.path.isfile(manifest_file):
+            with open(manifest_file) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {'dtype': np.dtype(dtype).name, 'prefix': prefix, 'columns': None, 'length': 0, 'days': []}
+
+        if prefix is not None and self.manifest.get('prefix') not in (None, prefix):
+            print("The store {} holds the dataset {}, not {}. Aborting.".format(store_path, self.manifest['prefix'], prefix))
+            raise ValueError
+        if prefix is not None:
+            self.manifest['prefix'] = prefix
+
+        self.dtype = np.dtype(self.manifest['dtype'])
+        self._day_pos = dict((day['date'], i) for i, day in enumerate(self.manifest['days']))
+
+    def _column_file(self, col):
+        return os.path.join(self.store_path, "col_{}.bin".format(col))
+
+    def _write_manifest(self):
+        manifest_file = os.path.join(self.store_path, MANIFEST_NAME)
+        tmp_file = manifest_file + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp_file, manifest_file)
+
+    def _get_memmap(self, col):
+        """
+        open the column file once, the memmap is shared by all days
+        """
+        mm = self._memmaps.get(col)
+        if mm is None or mm.shape[0] < self.manifest['length']:
+            mm = np.memmap(self._column_file(col), dtype=self.dtype, mode='r', shape=(self.manifest['length'],))
+            self._memmaps[col] = mm
+        return mm
+
+    def get_columns(self):
+        return self.manifest['columns']
+
+    def get_dates(self):
+        return [day['date'] for day in self.manifest['days']]
+
+    def get_number_days(self):
+        return len(self.manifest['days'])
+
+    def has_day(self, date):
+        return date in self._day_pos
+
+    def is_current(self, date, signature):
+        """
+        True if the day is stored from the input file with the given signature (see get_source_signature)
+        """
+        if not self.has_day(date):
+            return False
+        day = self.manifest['days'][self._day_pos[date]]
+        return all(day.get(field) == value for field, value in signature.items())
+
+    def drop_day(self, date):
+        """
+        remove the day from the manifest, its ticks stay in the column files as unused space
+        """
+        self.manifest['days'].pop(self._day_pos[date])
+        self._day_pos = dict((day['date'], i) for i, day in enumerate(self.manifest['days']))
+        self._write_manifest()
+
+    def get_day_length(self, date):
+        return self.manifest['days'][self._day_pos[date]]['length']
+
+    def _check_columns(self, date, num_columns):
+        if self.manifest['columns'] is None:
+            self.manifest['columns'] = list(range(num_columns))
+        elif num_columns != len(self.manifest['columns']):
+            print("Day {} has {} columns, the store {} has {}. Aborting.".format(date, num_columns, self.store_path, len(self.manifest['columns'])))
+            raise ValueError
+
+        if not os.path.isdir(self.store_path):
+            os.makedirs(self.store_path)
+
+    def _add_day(self, date, length, moments, source):
+        """
+        record the day appended to the column files in the manifest
+        source: name of the input file or its signature (dict, see get_source_signature)
+        """
+        offset = self.manifest['length']
+        day = {'date': date, 'offset': offset, 'length': length, 'moments': moments}
+        day.update(source if isinstance(source, dict) else {'source': source})
+        self.manifest['days'].append(day)
+        self.manifest['days'].sort(key=lambda day: day['date'])
+        self.manifest['length'] = offset + length
+        self._day_pos = dict((day['date'], i) for i, day in enumerate(self.manifest['days']))
+        self._write_manifest()
+
+    def append_day(self, date, array, source=None):
+        """
+        append the 2-D array (ticks x columns) of a day to the store
+        """
+        if self.has_day(date):
+            print("Day {} is already in the store {}, skipping".format(date, self.store_path))
+            return
+
+        self._check_columns(date, array.shape[1])
+        for col in self.manifest['columns']:
+            with open(self._column_file(col), 'ab') as f:
+                f.write(np.ascontiguousarray(array[:, col], dtype=self.dtype).tobytes())
+
+        moments = Moments.from_array(np.asarray(array, dtype=self.dtype)).to_dict()
+        self._add_day(date, array.shape[0], moments, source)
+
+    def append_staged_day(self, date, day_path, length, num_columns, moments, source=None):
+        """
+        append a day staged by stage_day_file (one col_<n>.bin file per column in day_path, already in the
+        dtype of the store), the files are copied block by block and removed afterwards
+        source: name of the input file or its signature (dict, see get_source_signature)
+        """
+        if self.has_day(date):
+            print("Day {} is already in the store {}, skipping".format(date, self.store_path))
+            shutil.rmtree(day_path, ignore_errors=True)
+            return
+
+        self._check_columns(date, num_columns)
+        for col in self.manifest['columns']:
+            with open(self._column_file(col), 'ab') as f, open(os.path.join(day_path, "col_{}.bin".format(col)), 'rb') as staged:
+                shutil.copyfileobj(staged, f)
+
+        self._add_day(date, length, moments, source)
+        shutil.rmtree(day_path, ignore_errors=True)
+
+    def get_day_moments(self, date):
+        """
+        Moments of all columns of a day, computed and recorded once for days stored without them
+        """
+        day = self.manifest['days'][self._day_pos[date]]
+        if 'moments' not in day:
+            day['moments'] = Moments.from_array(self.get_day_array(date)).to_dict()
+            self._write_manifest()
+        return Moments.from_dict(day['moments'])
+
+    def get_moments(self, dates, columns=None):
+        """
+        Moments of the columns of the days taken together, merged from the per day catalog
+        """
+        if columns is None:
+            columns = self.manifest['columns']
+        positions = [self.manifest['columns'].index(col) for col in columns]
+        return Moments.combine([self.get_day_moments(date) for date in dates]).select(positions)
+
+    def get_column(self, date, col):
+        """
+        returns a read only view of one column of a day, nothing is copied
+        """
+        day = self.manifest['days'][self._day_pos[date]]
+        return self._get_memmap(col)[day['offset']:day['offset'] + day['length']]
+
+    def get_day_array(self, date, columns=None):
+        """
+        returns the 2-D array (ticks x columns) of a day
+        """
+        if columns is None:
+            columns = self.manifest['columns']
+        return np.column_stack([self.get_column(date, col) for col in columns])
+
+    def get_days_array(self, dates, columns=None):
+        """
+        returns the 2-D array (ticks x columns) of several days, filled column by column into one allocation
+        """
+        if columns is None:
+            columns = self.manifest['columns']
+        lengths = [self.get_day_length(date) for date in dates]
+        array = np.empty((sum(lengths), len(columns)), dtype=self.dtype)
+        for i, col in enumerate(columns):
+            offset = 0
+            for date, length in zip(dates, lengths):
+                array[offset:offset + length, i] = self.get_column(date, col)
+                offset += length
+        return array
+
+    def get_days_frame(self, dates, columns=None):
+        """
+        returns the days as one DataFrame indexed by Date and Milliseconds, the same way the input files have been read with read_csv
+        """
+        if columns is None:
+            columns = self.manifest['columns']
+        lengths = [self.get_day_length(date) for date in dates]
+        date_index = pd.DatetimeIndex([get_date_index(date) for date in dates]).repeat(lengths)
+        milliseconds = np.concatenate([self.get_column(date, 0) for date in dates]).astype(np.int64)
+        index = pd.MultiIndex.from_arrays([date_index, milliseconds], names=['Date', 'Milliseconds'])
+        return pd.DataFrame(self.get_days_array(dates, columns), index=index, columns=columns)
+
+    def get_day_frame(self, date, columns=None):
+        """
+        returns the day as DataFrame indexed by Date and Milliseconds
+        """
+        return self.get_days_frame([date], columns=columns)
+
+
+def read_day_file(filename, sep=" "):
+    """
+    parse one input file into a 2-D array (ticks x columns)
+    """
+    return pd.read_csv(filename, sep=sep, header=None).values
+
+
+def stage_day_file(filename, staging_path, sep=" ", dtype=np.float64, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Parse one input file (plain or compressed, e.g. FDAX_*.csv.gz) in chunks of chunksize ticks.
+    Every chunk is written to the column files in staging_path/<date> right away, so at most one chunk
+    is held in memory no matter how long the day is.
+    returns date, day_path, length, number of columns and the moments of the day (as dict)
+    """
+    date = get_date(filename)
+    day_path = os.path.join(staging_path, date)
+    shutil.rmtree(day_path, ignore_errors=True)
+    os.makedirs(day_path)
+
+    length = 0
+    moments = []
+    files = []
+    try:
+        for chunk in pd.read_csv(filename, sep=sep, header=None, chunksize=chunksize):
+            array = np.asarray(chunk.values, dtype=dtype)
+            if len(files) == 0:
+                files = [open(os.path.join(day_path, "col_{}.bin".format(col)), 'wb') for col in range(array.shape[1])]
+            elif array.shape[1] != len(files):
+                print("Input file {} changes from {} to {} columns. Aborting.".format(filename, len(files), array.shape[1]))
+                raise ValueError
+            for col, f in enumerate(files):
+                f.write(np.ascontiguousarray(array[:, col]).tobytes())
+            moments.append(Moments.from_array(array))
+            length += array.shape[0]
+    finally:
+        for f in files:
+            f.close()
+
+    return date, day_path, length, len(files), Moments.combine(moments).to_dict()
+
+
+def _stage_day(args):
+    """
+    worker of convert_files
+    """
+    filename, staging_path, sep, dtype, chunksize = args
+    return (filename,) + stage_day_file(filename, staging_path, sep=sep, dtype=dtype, chunksize=chunksize)
+
+
+def convert_files(file_list, store_path, sep=" ", dtype=np.float64, processes=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    One time conversion of the input files into the tick store. Days that are already stored from the same
+    input file (name, modification time and size) are skipped, so later runs neither decompress nor parse the
+    text again. Days whose input file has changed since are converted again and replace the stored ones.
+    All files must belong to one dataset (prefix, see get_prefix), the store records it.
+    The files are parsed in parallel by a pool of processes (default: one per core), each streaming its file
+    in chunks of chunksize ticks into a staging directory. The staged days are appended to the store in the
+    order of file_list.
+    returns the TickStore
+    """
+    prefixes = set(get_prefix(filename) for filename in file_list)
+    if len(prefixes) > 1:
+        print("Input files of several datasets {} cannot share a store. Aborting.".format(sorted(prefixes)))
+        raise ValueError
+    store = TickStore(store_path, dtype=dtype, prefix=prefixes.pop() if len(prefixes) > 0 else None)
+
+    signatures = dict((filename, get_source_signature(filename)) for filename in file_list)
+    missing = [filename for filename in file_list if not store.is_current(get_date(filename), signatures[filename])]
+    if len(missing) == 0:
+        return store
+
+    print("Converting {} input files into {}".format(len(missing), store_path))
+    staging_path = os.path.join(store_path, STAGING_DIR)
+    tasks = [(filename, staging_path, sep, store.dtype, chunksize) for filename in missing]
+
+    if len(missing) == 1 or processes == 1:
+        days = map(_stage_day, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes)
+        days = pool.imap(_stage_day, tasks)
+
+    try:
+        for filename, date, day_path, length, num_columns, moments in days:
+            print("Input file {}, date {}, {} ticks".format(os.path.basename(filename), date, length))
+            if store.has_day(date):
+                print("Input file {} has changed, replacing day {}".format(os.path.basename(filename), date))
+                store.drop_day(date)
+            store.append_staged_day(date, day_path, length, num_columns, moments, source=signatures[filename])
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    shutil.rmtree(staging_path, ignore_errors=True)
+    return store
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: tickstore.py path [pattern]   e.g. tickstore.py ./training_data_large/ 'prod_data_*v.txt'")
+        print("                                          tickstore.py ./training_data_large/ 'FDAX_*.csv.gz'")
+        sys.exit()
+
+    path = sys.argv[1]
+    pattern = sys.argv[2] if len(sys.argv) > 2 else 'prod_data_*v.txt'
+
+    file_list = sorted(glob.glob(os.path.join(path, pattern)))
+    if len(file_list) == 0:
+        print("No files {} found in {}. Aborting.".format(pattern, path))
+        sys.exit()
+
+    store = convert_files(file_list, get_store_path(path, get_prefix(file_list[0])))
+    print("{} days stored in {}".format(store.get_number_days(), store.store_path))
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from tickstore import TickStore, convert_files, get_date, get_date_index, get_prefix, get_store_path
+
+
+def random_day(ticks, seed=0):
+    """
+    columns like the input files: milliseconds, a flag, bid price, bid size, ask price, ask size
+    """
+    rng = np.random.RandomState(seed)
+    bid = 1000. + 0.25 * np.cumsum(rng.randint(-1, 2, size=ticks))
+    return pd.DataFrame({0: np.arange(ticks) * 250, 1: rng.randint(0, 3, size=ticks),
+                         2: bid, 3: rng.randint(1, 50, size=ticks),
+                         4: bid + 0.25 * rng.randint(1, 3, size=ticks), 5: rng.randint(1, 50, size=ticks)})
+
+
+class TickStoreTest(unittest.TestCase):
+    dates = ["20130103", "20130104", "20130107"]
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.path, "tickstore")
+        self.file_list = []
+        for seed, (date, ticks) in enumerate(zip(self.dates, [1200, 7, 2500])):
+            filename = os.path.join(self.path, "prod_data_{}v.txt".format(date))
+            random_day(ticks, seed).to_csv(filename, sep=" ", header=False, index=False)
+            self.file_list.append(filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def assertRoundTrip(self, store):
+        self.assertEqual(store.get_dates(), self.dates)
+        frames = []
+        for filename in self.file_list:
+            expected = pd.read_csv(filename, sep=" ", header=None)
+            date = get_date(filename)
+            self.assertEqual(store.get_day_length(date), len(expected))
+            np.testing.assert_array_equal(store.get_day_array(date), expected.values)
+            frames.append(expected)
+
+        frame = store.get_days_frame(self.dates)
+        np.testing.assert_array_equal(frame.values, pd.concat(frames).values)
+        self.assertEqual(frame.index.get_level_values('Date')[0], get_date_index(self.dates[0]))
+        np.testing.assert_array_equal(frame.index.get_level_values('Milliseconds'), pd.concat(frames)[0].values)
+
+    def test_round_trip_chunks(self):
+        # chunks shorter than a day, the last chunk of a day is shorter than the others
+        self.assertRoundTrip(convert_files(self.file_list, self.store_path, processes=1, chunksize=500))
+        # the manifest and the column files are read again by a new store
+        self.assertRoundTrip(TickStore(self.store_path))
+        self.assertFalse(os.path.exists(os.path.join(self.store_path, "staging")))
+
+    def test_processes(self):
+        self.assertRoundTrip(convert_files(self.file_list, self.store_path, processes=2, chunksize=1000))
+
+    def test_skip_stored_days(self):
+        convert_files(self.file_list[:2], self.store_path, processes=1)
+        column_file = os.path.join(self.store_path, "col_0.bin")
+        size = os.path.getsize(column_file)
+        store = convert_files(self.file_list, self.store_path, processes=1)
+        self.assertRoundTrip(store)
+        # only the new day has been appended
+        self.assertEqual(os.path.getsize(column_file) - size, 2500 * 8)
+        # nothing left to convert, the files are not parsed again
+        os.remove(self.file_list[0])
+        self.assertEqual(convert_files(self.file_list[1:], self.store_path).get_dates(), self.dates)
+
+    def test_changed_input(self):
+        convert_files(self.file_list, self.store_path, processes=1)
+        # the second day is downloaded again with other ticks
+        random_day(300, 9).to_csv(self.file_list[1], sep=" ", header=False, index=False)
+        later = os.path.getmtime(self.file_list[1]) + 10
+        os.utime(self.file_list[1], (later, later))
+        store = convert_files(self.file_list, self.store_path, processes=1)
+        self.assertRoundTrip(store)
+        self.assertEqual(store.get_day_length(self.dates[1]), 300)
+        self.assertRoundTrip(TickStore(self.store_path))
+
+    def test_datasets(self):
+        self.assertEqual(get_store_path(self.path, get_prefix(self.file_list[0])), os.path.join(self.path, "tickstore_prod_data"))
+        self.assertEqual(get_prefix("FDAX_20160301.csv.gz"), "FDAX")
+
+        # another dataset on the same dates with other columns
+        fdax_list = []
+        for seed, date in enumerate(self.dates[:2]):
+            filename = os.path.join(self.path, "FDAX_{}.csv".format(date))
+            random_day(100, seed)[[0, 2, 4]].to_csv(filename, sep=" ", header=False, index=False)
+            fdax_list.append(filename)
+        with self.assertRaises(ValueError):
+            convert_files(self.file_list + fdax_list, self.store_path, processes=1)
+
+        self.assertRoundTrip(convert_files(self.file_list, get_store_path(self.path, "prod_data"), processes=1))
+        fdax = convert_files(fdax_list, get_store_path(self.path, "FDAX"), processes=1)
+        self.assertEqual(fdax.get_columns(), [0, 1, 2])
+        self.assertEqual(fdax.get_day_length(self.dates[0]), 100)
+        # a store holds one dataset only
+        with self.assertRaises(ValueError):
+            convert_files(fdax_list, get_store_path(self.path, "prod_data"), processes=1)
+
+    def test_moments(self):
+        store = convert_files(self.file_list, self.store_path, processes=1, chunksize=300)
+        for dates in [self.dates, self.dates[:1], self.dates[1:]]:
+            frame = pd.concat([pd.read_csv(self.file_list[self.dates.index(date)], sep=" ", header=None) for date in dates])
+            moments = store.get_moments(dates, columns=[2, 4, 5])
+            np.testing.assert_allclose(moments.get_mean(), frame[[2, 4, 5]].mean().values, rtol=1e-12)
+            np.testing.assert_allclose(moments.get_std(ddof=1), frame[[2, 4, 5]].std().values, rtol=1e-9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,13 @@
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
 import pandas as pd
 import glob, sys, os
+import json
+import shutil
+import tempfile
+
+from datacache import DataCache, file_signature
+from signal_store import events_file_name, save_events
 
 
 def compute_market_prices(prices):
@@ -26,10 +33,102 @@ def compute_market_prices(prices):
     return prices
 
 
+CHUNK = 65536  # ticks handled at once when converting decisions to back-pointers and in the backtrace
+MAX_BACKPOINTER_MEMORY = 2**28  # bytes of back-pointers the streaming mode keeps in memory
+
+
+def _forward(row, buy_price, sell_price, cost_per_trade, actions):
+    """Advance the account values over a sequence of ticks.
+
+    The position dimension is vectorized: every tick is five array
+    operations across all states on preallocated buffers (at a few
+    microseconds per tick the number of calls is what counts), the
+    decisions are turned into back-pointers once per chunk of ticks. The
+    arithmetic is the same as in the scalar recursion, so values, ties and
+    back-pointers are identical.
+
+    Parameters
+    ----------
+    row : ndarray
+        Account values of the ``2 * max_position + 3`` states before the
+        first tick, updated in place. The first and last state are padding
+        and stay -inf.
+    buy_price, sell_price : ndarray
+        Prices of the ticks.
+    cost_per_trade : float
+        Fee paid for every trade.
+    actions : ndarray
+        int8 array (ticks x states) the back-pointers are written to: -1 for
+        sell, 0 for hold, 1 for buy. The padding columns are left untouched.
+    """
+    states = row.shape[0] - 2
+    hold = row[1:-1]
+    # both rows are hold, the buy and sell decisions of a tick exclude each other
+    hold_twice = as_strided(hold, shape=(2, states), strides=(0, hold.strides[0]))
+    tmp = np.empty(row.shape[0])
+    # buy from the state below, sell from the state above: (tmp[j - 1], tmp[j + 1]) + (-buy_price, sell_price)
+    neighbours = as_strided(tmp, shape=(2, states), strides=(2 * tmp.strides[0], tmp.strides[0]))
+    trade = np.empty((2, states))
+    other = trade[::-1]
+    best_other = np.empty((2, states))
+
+    ticks = len(buy_price)
+    trade_prices = np.empty((min(CHUNK, ticks), 2, 1))
+    better = np.empty((min(CHUNK, ticks), 2, states), dtype=bool)
+
+    for start in range(0, ticks, CHUNK):
+        stop = min(start + CHUNK, ticks)
+        np.negative(buy_price[start:stop], out=trade_prices[:stop - start, 0, 0])
+        trade_prices[:stop - start, 1, 0] = sell_price[start:stop]
+
+        for prices, decision in zip(trade_prices[:stop - start], better):
+            np.subtract(row, cost_per_trade, out=tmp)
+            np.add(neighbours, prices, out=trade)
+            # strictly better than both others, ties are hold
+            np.maximum(other, hold, out=best_other)
+            np.greater(trade, best_other, out=decision)
+            np.copyto(hold_twice, trade, where=decision)
+
+        decisions = better[:stop - start].view(np.int8)
+        np.subtract(decisions[:, 0], decisions[:, 1], out=actions[start:stop, 1:-1])
+
+
+def _backtrace(actions, j, out):
+    """Follow the back-pointers from the last tick to the first.
+
+    Parameters
+    ----------
+    actions : ndarray
+        Back-pointers written by `_forward`.
+    j : int
+        State (column of `actions`) after the last tick.
+    out : ndarray
+        Array of the same length as `actions` the optimal actions are
+        written to.
+
+    Returns
+    -------
+    j : int
+        State before the first tick.
+    """
+    for stop in range(actions.shape[0], 0, -CHUNK):
+        start = max(stop - CHUNK, 0)
+        rows = actions[start:stop].tolist()
+        sequence = out[start:stop]
+        for i in range(stop - start - 1, -1, -1):
+            action = rows[i][j]
+            sequence[i] = action
+            j -= action
+    return j
+
+
 def find_optimal_strategy(prices, max_position=3, cost_per_trade=0.02):
     """Find optimal trading strategy.
+
     A dynamic programming algorithm is used. Time complexity is "number
-    of samples x number of maximum positions".
+    of samples x number of maximum positions", the positions are handled
+    by array operations, back-pointers are kept as int8.
+
     Parameters
     ----------
     prices : DataFrame
@@ -39,6 +138,7 @@ def find_optimal_strategy(prices, max_position=3, cost_per_trade=0.02):
         Maximum allowed number of positions in buying or selling.
     cost_per_trade : float, default 0.02
         Fee paid for every trade.
+
     Returns
     -------
     actions : ndarray
@@ -50,82 +150,312 @@ def find_optimal_strategy(prices, max_position=3, cost_per_trade=0.02):
     buy_price = np.maximum(prices.bid_price, prices.ask_price).values
     sell_price = np.minimum(prices.bid_price, prices.ask_price).values
 
-    account = np.full((prices.shape[0] + 1, 2 * max_position + 3), -np.inf)
-    account[0, max_position + 1] = 0
-
-    actions = np.empty((prices.shape[0], 2 * max_position + 3), dtype=int)
-
-    for i in range(prices.shape[0]):
-        for j in range(1, account.shape[1] - 1):
-            buy = account[i, j - 1] - cost_per_trade - buy_price[i]
-            sell = account[i, j + 1] - cost_per_trade + sell_price[i]
-            hold = account[i, j]
-            if buy > sell and buy > hold:
-                account[i + 1, j] = buy
-                actions[i, j] = 1
-            elif sell > buy and sell > hold:
-                account[i + 1, j] = sell
-                actions[i, j] = -1
-            else:
-                account[i + 1, j] = hold
-                actions[i, j] = 0
-
-    pnl = account[-1, 1:-1] + (np.arange(-max_position, max_position + 1) *
-                               prices.market_price.iloc[-1])
-    j = np.argmax(pnl) + 1
-    optimal_sequence = []
-    for i in reversed(range(actions.shape[0])):
-        optimal_sequence.append(actions[i, j])
-        j -= actions[i, j]
-    optimal_sequence = np.array(list(reversed(optimal_sequence)))
+    row = np.full(2 * max_position + 3, -np.inf)
+    row[max_position + 1] = 0
+
+    actions = np.zeros((prices.shape[0], 2 * max_position + 3), dtype=np.int8)
+    _forward(row, buy_price, sell_price, cost_per_trade, actions)
+
+    pnl = row[1:-1] + (np.arange(-max_position, max_position + 1) *
+                       prices.market_price.iloc[-1])
+    optimal_sequence = np.empty(prices.shape[0], dtype=int)
+    _backtrace(actions, np.argmax(pnl) + 1, optimal_sequence)
 
     return optimal_sequence, np.max(pnl) / optimal_sequence.size
 
 
+class BackPointers(object):
+    """Back-pointers of the streaming dynamic program, kept in int8 chunks.
+
+    Chunks are held in memory until they take more than `max_memory`
+    bytes, then all of them are appended to `spill_file` and dropped, so
+    the spilled rows are always the first ones. The backtrace reads the
+    spilled rows through a memory map, chunk by chunk from the end.
+
+    Parameters
+    ----------
+    states : int
+        Number of columns (``2 * max_position + 3``).
+    max_memory : int
+        Bytes of back-pointers held in memory before spilling.
+    spill_file : str, optional
+        File the back-pointers are spilled to, a temporary file by
+        default (then it is removed by `close`). An existing file is
+        truncated by the first spill.
+    """
+
+    def __init__(self, states, max_memory=MAX_BACKPOINTER_MEMORY, spill_file=None):
+        self.states = states
+        self.max_memory = max_memory
+        self.spill_file = spill_file
+        self._own_file = spill_file is None
+        self.chunks = []
+        self.spilled = 0
+        self.length = 0
+
+    def append(self, actions):
+        self.chunks.append(actions)
+        self.length += actions.shape[0]
+        if sum(chunk.nbytes for chunk in self.chunks) > self.max_memory:
+            self.spill()
+
+    def spill(self):
+        if self.spill_file is None:
+            fd, self.spill_file = tempfile.mkstemp(suffix=".bin", prefix="backpointers_")
+            os.close(fd)
+        # the first spill starts the file, the backtrace maps it from offset 0
+        with open(self.spill_file, 'wb' if self.spilled == 0 else 'ab') as f:
+            for chunk in self.chunks:
+                f.write(chunk.tobytes())
+                self.spilled += chunk.shape[0]
+        self.chunks = []
+
+    def backtrace(self, j, out):
+        """Write the optimal actions to `out` (length of all chunks), see `_backtrace`.
+        """
+        stop = self.length
+        for chunk in reversed(self.chunks):
+            j = _backtrace(chunk, j, out[stop - chunk.shape[0]:stop])
+            stop -= chunk.shape[0]
+        if self.spilled > 0:
+            spilled = np.memmap(self.spill_file, dtype=np.int8, mode='r', shape=(self.spilled, self.states))
+            j = _backtrace(spilled, j, out[:self.spilled])
+            del spilled
+        return j
+
+    def close(self):
+        self.chunks = []
+        if self.spill_file is not None and self._own_file and os.path.isfile(self.spill_file):
+            os.remove(self.spill_file)
+
+
+def find_optimal_strategy_streaming(price_chunks, max_position=3, cost_per_trade=0.02,
+                                    max_memory=MAX_BACKPOINTER_MEMORY, spill_file=None, out=None):
+    """Find optimal trading strategy over a series given in chunks.
+
+    The same dynamic program as `find_optimal_strategy`, but only the
+    current account row is kept. Back-pointers are stored as int8 chunks
+    and spilled to a memory mapped file beyond `max_memory` bytes, so
+    multi-day series or tick-level sessions are labeled with bounded
+    memory. The result is identical to `find_optimal_strategy` on the
+    concatenated prices.
+
+    Parameters
+    ----------
+    price_chunks : iterable of DataFrame
+        Consecutive pieces of the series, each like the `prices` of
+        `find_optimal_strategy`, e.g. from `read_price_chunks`.
+    max_position : int
+        Maximum allowed number of positions in buying or selling.
+    cost_per_trade : float, default 0.02
+        Fee paid for every trade.
+    max_memory : int
+        Bytes of back-pointers held in memory before spilling.
+    spill_file : str, optional
+        File the back-pointers are spilled to, a temporary file by default.
+    out : ndarray, optional
+        Array (e.g. a memmap) of the length of the series the actions are
+        written to, allocated as int8 if not given.
+
+    Returns
+    -------
+    actions : ndarray
+        Sequence of optimal actions: -1 for sell, 0 for hold, 1 for buy.
+    pnl : float
+        Profit per trading action.
+    """
+    row = np.full(2 * max_position + 3, -np.inf)
+    row[max_position + 1] = 0
+
+    back_pointers = BackPointers(row.shape[0], max_memory=max_memory, spill_file=spill_file)
+    try:
+        for prices in price_chunks:
+            if prices.shape[0] == 0:
+                continue
+            buy_price = np.maximum(prices.bid_price, prices.ask_price).values
+            sell_price = np.minimum(prices.bid_price, prices.ask_price).values
+
+            actions = np.zeros((prices.shape[0], row.shape[0]), dtype=np.int8)
+            _forward(row, buy_price, sell_price, cost_per_trade, actions)
+            back_pointers.append(actions)
+            last_market_price = prices.market_price.iloc[-1]
+
+        if back_pointers.length == 0:
+            print("No prices to find the optimal strategy for. Aborting.")
+            raise ValueError
+
+        pnl = row[1:-1] + (np.arange(-max_position, max_position + 1) *
+                           last_market_price)
+        if out is None:
+            out = np.empty(back_pointers.length, dtype=np.int8)
+        elif out.shape != (back_pointers.length,):
+            print("Output shape {} does not fit {} ticks. Aborting.".format(out.shape, back_pointers.length))
+            raise ValueError
+        back_pointers.backtrace(np.argmax(pnl) + 1, out)
+    finally:
+        back_pointers.close()
+
+    return out, np.max(pnl) / out.size
+
+
+def read_price_chunks(file_list, chunksize=CHUNK):
+    """Read the competition files (e.g. a sequence of days) one chunk of
+    `chunksize` ticks at a time.
+
+    Parameters
+    ----------
+    file_list : list of str
+        Files in the competition format, read one after the other.
+    chunksize : int
+        Ticks per chunk.
+
+    Returns
+    -------
+    price_chunks : generator of DataFrame
+        Prices with market price, see `compute_market_prices`.
+    """
+    for f_name in file_list:
+        for df in pd.read_csv(f_name, header=None, sep=r'\s+', chunksize=chunksize):
+            prices = pd.DataFrame(df.iloc[:, 2:6].values,
+                                  columns=['bid_price', 'bid_volume', 'ask_price',
+                                           'ask_volume'])
+            yield compute_market_prices(prices)
+
+
 def simulate_trading(prices, actions, cost_per_trade=0.02):
     """Simulate trading according to given actions.
-    This is a literate translation of a pseudo code provided in [1]_.
+
+    Vectorized form of the pseudo code provided in [1]_: the position is
+    the cumulative sum of the actions, the PnL is the position marked to
+    the market price differences plus, for every trade, the spread between
+    the buy (sell) price and the market price and `cost_per_trade`.
+
+    Many strategies or cost settings are scored in one call: `actions` may
+    be a 2-D batch (strategies x ticks) and `cost_per_trade` an array, the
+    two broadcast against each other like numpy arrays (one action
+    sequence under many costs, many sequences under one cost, or pairs).
+
     Parameters
     ----------
     prices : DataFrame
         Data frame with market prices. Should include columns 'bid_price',
         'aks_price', 'market_price'.
     actions : array_like
-        Sequence of actions: -1 for sell, 0 for hold, 1 for buy. Length is the
-        same as the number of columns in `prices`.
-    cost_per_trade : float, default 0.02
+        Sequence of actions: -1 for sell, 0 for hold, 1 for buy, or a 2-D
+        array of such sequences. Length is the same as the number of
+        columns in `prices`.
+    cost_per_trade : float or array_like, default 0.02
         Fee paid for every trade.
+
     Returns
     -------
-    pnl : float
-        Profit per trading action.
+    pnl : float or ndarray
+        Profit per trading action, an array for a batch.
+
     References
     ----------
     .. [1] Roni Mittelman "Time-series modeling with undecimated fully
        convolutional neural networks", http://arxiv.org/abs/1508.00317
     """
-    pnl = 0
-    position = 0
     market_price = prices.market_price.values
     buy_price = np.maximum(prices.bid_price, prices.ask_price).values
     sell_price = np.minimum(prices.bid_price, prices.ask_price).values
 
-    for i in range(len(actions)):
-        if i > 0:
-            pnl += position * (market_price[i] - market_price[i - 1])
+    actions = np.asarray(actions)
+    batch = np.atleast_2d(actions)
+    trades = np.abs(batch) >= 1
+    batch = np.where(trades, batch, 0)
+
+    # position held from tick i to i + 1 times the market price change
+    position = np.cumsum(batch, axis=1)
+    pnl = np.dot(position[:, :-1], np.diff(market_price))
+    # buys pay buy price - market price, sells sell_price - market price below the market
+    pnl -= np.dot(np.maximum(batch, 0), buy_price - market_price)
+    pnl -= np.dot(np.maximum(-batch, 0), market_price - sell_price)
+
+    pnl = (pnl - np.asarray(cost_per_trade, dtype=np.float64) * trades.sum(axis=1)) / batch.shape[1]
+
+    if actions.ndim == 1 and np.ndim(cost_per_trade) == 0:
+        return pnl[0]
+    return pnl
+
+
+def read_prices(f_name):
+    """Read a file in the competition format.
+
+    Returns
+    -------
+    times : ndarray
+        Milliseconds of the ticks (first column).
+    prices : DataFrame
+        Prices with market price, see `compute_market_prices`.
+    """
+    df = pd.read_csv(f_name, header=None, sep=r'\s+')
+    prices = pd.DataFrame(df.iloc[:, 2:6].values,
+                          columns=['bid_price', 'bid_volume', 'ask_price',
+                                   'ask_volume'])
+    return df.iloc[:, 0].values, compute_market_prices(prices)
+
+
+def label_day_file(day_file, signal_file, max_position=3, cost_per_trade=0.02, cache_dir=None):
+    """Write the optimal actions of a day as training signal.
+
+    The signal file has the format the signal generators write and
+    `prepare_tradcom_classification` reads: one line ``milliseconds,signal``
+    per tick without header, -1.0 sell, 0.0 hold, 1.0 buy, and the same
+    as events file (see signal_store.py). Results are
+    cached by input file (name, modification time, size), `max_position`
+    and `cost_per_trade`, so switching between settings does not run the
+    dynamic program again.
 
-        if actions[i] >= 1:
-            pnl -= cost_per_trade
-            pnl -= buy_price[i] * actions[i]
-            pnl += market_price[i] * actions[i]
-            position += actions[i]
-        elif actions[i] <= -1:
-            pnl -= cost_per_trade
-            pnl += sell_price[i] * (-actions[i])
-            pnl -= market_price[i] * (-actions[i])
-            position -= (-actions[i])
-        print(pnl)
-    return pnl / len(actions)
+    Parameters
+    ----------
+    day_file : str
+        File in the competition format.
+    signal_file : str
+        Signal file to write.
+    max_position : int
+        Maximum allowed number of positions in buying or selling.
+    cost_per_trade : float, default 0.02
+        Fee paid for every trade.
+    cache_dir : str, optional
+        Directory of the `DataCache`, ``cache`` next to the day file by
+        default.
+
+    Returns
+    -------
+    pnl : float
+        PnL of the day (not per action).
+    trades : int
+        Number of trades.
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(day_file), "cache")
+    cache = DataCache(cache_dir)
+    key = cache.get_key(labeler='optimal_strategy', files=file_signature([day_file]),
+                        max_position=max_position, cost_per_trade=cost_per_trade)
+    cached_signal = cache.get_path(key, "signal.csv")
+    cached_events = cache.get_path(key, "signal.npz")
+    cached_stats = cache.get_path(key, "stats.json")
+
+    if cache.lookup(key):
+        print("Optimal strategy of {} found in cache {}".format(day_file, key))
+        with open(cached_stats) as f:
+            stats = json.load(f)
+    else:
+        times, prices = read_prices(day_file)
+        actions, pnl = find_optimal_strategy(prices, max_position=max_position, cost_per_trade=cost_per_trade)
+        stats = {'pnl': float(pnl * actions.size), 'trades': int(np.count_nonzero(actions))}
+        pd.DataFrame({'time': times, 'signal': actions.astype(np.float64)}).to_csv(cached_signal, header=False, index=False)
+        save_events(cached_events, {'signal': actions})
+        with open(cached_stats, 'w') as f:
+            json.dump(stats, f)
+        cache.commit(key)
+
+    shutil.copyfile(cached_signal, signal_file)
+    shutil.copyfile(cached_events, events_file_name(signal_file))
+    print("PNL of {} by the optimization algorithm {:.3f}, {} trades".format(day_file, stats['pnl'], stats['trades']))
+    return stats['pnl'], stats['trades']
 
 
 if __name__ == '__main__':
@@ -144,12 +474,7 @@ if __name__ == '__main__':
     file_list = sorted(glob.glob(os.path.join(path, 'prod_data_*v.txt')))
 
     for f_name in file_list:
-        df = pd.read_csv(f_name, header=None, delim_whitespace=True)
-        prices = pd.DataFrame(df.iloc[:, 2:6].values,
-
-                              columns=['bid_price', 'bid_volume', 'ask_price',
-                                       'ask_volume'])
-        prices = compute_market_prices(prices)
+        _, prices = read_prices(f_name)
 
         actions, pnl_opt = find_optimal_strategy(prices, max_position=3)
         pnl_sim = simulate_trading(prices, actions)
@@ -0,0 +1,171 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from viterbi import compute_market_prices, find_optimal_strategy, find_optimal_strategy_streaming, simulate_trading
+
+
+def find_optimal_strategy_loop(prices, max_position=3, cost_per_trade=0.02):
+    """
+    The former find_optimal_strategy: double loop over ticks x states, full account and int actions matrices
+    """
+    buy_price = np.maximum(prices.bid_price, prices.ask_price).values
+    sell_price = np.minimum(prices.bid_price, prices.ask_price).values
+
+    account = np.full((prices.shape[0] + 1, 2 * max_position + 3), -np.inf)
+    account[0, max_position + 1] = 0
+
+    actions = np.empty((prices.shape[0], 2 * max_position + 3), dtype=int)
+
+    for i in range(prices.shape[0]):
+        for j in range(1, account.shape[1] - 1):
+            buy = account[i, j - 1] - cost_per_trade - buy_price[i]
+            sell = account[i, j + 1] - cost_per_trade + sell_price[i]
+            hold = account[i, j]
+            if buy > sell and buy > hold:
+                account[i + 1, j] = buy
+                actions[i, j] = 1
+            elif sell > buy and sell > hold:
+                account[i + 1, j] = sell
+                actions[i, j] = -1
+            else:
+                account[i + 1, j] = hold
+                actions[i, j] = 0
+
+    pnl = account[-1, 1:-1] + (np.arange(-max_position, max_position + 1) *
+                               prices.market_price.iloc[-1])
+    j = np.argmax(pnl) + 1
+    optimal_sequence = []
+    for i in reversed(range(actions.shape[0])):
+        optimal_sequence.append(actions[i, j])
+        j -= actions[i, j]
+    optimal_sequence = np.array(list(reversed(optimal_sequence)))
+
+    return optimal_sequence, np.max(pnl) / optimal_sequence.size
+
+
+def simulate_trading_loop(prices, actions, cost_per_trade=0.02):
+    """
+    The former simulate_trading: per tick loop over the actions
+    """
+    pnl = 0
+    position = 0
+    market_price = prices.market_price.values
+    buy_price = np.maximum(prices.bid_price, prices.ask_price).values
+    sell_price = np.minimum(prices.bid_price, prices.ask_price).values
+
+    for i in range(len(actions)):
+        if i > 0:
+            pnl += position * (market_price[i] - market_price[i - 1])
+
+        if actions[i] >= 1:
+            pnl -= cost_per_trade
+            pnl -= buy_price[i] * actions[i]
+            pnl += market_price[i] * actions[i]
+            position += actions[i]
+        elif actions[i] <= -1:
+            pnl -= cost_per_trade
+            pnl += sell_price[i] * (-actions[i])
+            pnl -= market_price[i] * (-actions[i])
+            position -= (-actions[i])
+    return pnl / len(actions)
+
+
+def random_prices(ticks, seed=0):
+    """
+    prices DataFrame like compute_market_prices returns: random walk in steps of 0.25 with many repeated prices
+    (and so many ties of the dynamic program), spread 1 or 2 steps, some ticks without volume
+    """
+    rng = np.random.RandomState(seed)
+    bid = 1000. + 0.25 * np.cumsum(rng.randint(-1, 2, size=ticks) * (rng.rand(ticks) < 0.3))
+    ask = bid + 0.25 * rng.randint(1, 3, size=ticks)
+    prices = pd.DataFrame({'bid_price': bid, 'bid_volume': rng.randint(0, 20, size=ticks).astype(float),
+                           'ask_price': ask, 'ask_volume': rng.randint(0, 20, size=ticks).astype(float)})
+    return compute_market_prices(prices)
+
+
+class FindOptimalStrategyTest(unittest.TestCase):
+    def assertParity(self, prices, max_position=3, cost_per_trade=0.02):
+        actions, pnl = find_optimal_strategy(prices, max_position, cost_per_trade)
+        expected_actions, expected_pnl = find_optimal_strategy_loop(prices, max_position, cost_per_trade)
+        np.testing.assert_array_equal(actions, expected_actions)
+        self.assertEqual(pnl, expected_pnl)
+
+    def test_parity_random(self):
+        for seed in range(3):
+            self.assertParity(random_prices(2000, seed=seed))
+
+    def test_parity_positions_and_cost(self):
+        for max_position in [1, 2, 10]:
+            for cost_per_trade in [0., 0.02, 0.25]:
+                self.assertParity(random_prices(1000, seed=max_position), max_position, cost_per_trade)
+
+    def test_positions_bounded(self):
+        actions, _ = find_optimal_strategy(random_prices(3000, seed=5), max_position=2)
+        position = np.cumsum(actions)
+        self.assertTrue((np.abs(position) <= 2).all())
+
+
+class StreamingTest(unittest.TestCase):
+    def assertSame(self, prices, chunksize, max_memory, max_position=3, spill_file=None):
+        chunks = [prices.iloc[start:start + chunksize] for start in range(0, prices.shape[0], chunksize)]
+        actions, pnl = find_optimal_strategy_streaming(chunks, max_position, max_memory=max_memory, spill_file=spill_file)
+        expected_actions, expected_pnl = find_optimal_strategy(prices, max_position)
+        self.assertEqual(actions.dtype, np.int8)
+        np.testing.assert_array_equal(actions, expected_actions)
+        self.assertEqual(pnl, expected_pnl)
+
+    def test_in_memory(self):
+        self.assertSame(random_prices(3000, seed=1), 700, max_memory=10**9)
+
+    def test_spilled(self):
+        # everything spilled, and spilled rows followed by chunks still in memory
+        self.assertSame(random_prices(3000, seed=2), 500, max_memory=0)
+        self.assertSame(random_prices(3000, seed=3), 333, max_memory=4 * 333 * 9)
+
+    def test_existing_spill_file(self):
+        # left over bytes of an earlier run must not end up in front of the back-pointers
+        fd, spill_file = tempfile.mkstemp(suffix=".bin")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(np.ones(5000, dtype=np.int8).tobytes())
+            self.assertSame(random_prices(3000, seed=9), 500, max_memory=0, spill_file=spill_file)
+        finally:
+            os.remove(spill_file)
+
+
+class SimulateTradingTest(unittest.TestCase):
+    def test_parity(self):
+        prices = random_prices(3000, seed=4)
+        rng = np.random.RandomState(4)
+        for actions in [rng.randint(-1, 2, size=3000), rng.randint(-2, 3, size=3000) * (rng.rand(3000) < 0.1)]:
+            for cost_per_trade in [0., 0.02, 0.5]:
+                self.assertAlmostEqual(simulate_trading(prices, actions, cost_per_trade),
+                                       simulate_trading_loop(prices, actions, cost_per_trade), places=9)
+
+    def test_optimal_pnl(self):
+        prices = random_prices(3000, seed=6)
+        actions, pnl = find_optimal_strategy(prices, max_position=3, cost_per_trade=0.1)
+        self.assertAlmostEqual(simulate_trading(prices, actions, 0.1), pnl, places=9)
+
+    def test_batch(self):
+        prices = random_prices(2000, seed=8)
+        rng = np.random.RandomState(8)
+        batch = rng.randint(-1, 2, size=(4, 2000))
+        costs = np.array([0., 0.02, 0.1, 0.25])
+        pairs = simulate_trading(prices, batch, costs)
+        table = simulate_trading(prices, batch, costs[:, np.newaxis])
+        one_cost = simulate_trading(prices, batch[0], costs)
+        self.assertEqual(table.shape, (4, 4))
+        for k in range(4):
+            self.assertAlmostEqual(pairs[k], simulate_trading_loop(prices, batch[k], costs[k]), places=9)
+            self.assertAlmostEqual(one_cost[k], simulate_trading_loop(prices, batch[0], costs[k]), places=9)
+            for c in range(4):
+                self.assertAlmostEqual(table[c, k], simulate_trading_loop(prices, batch[k], costs[c]), places=9)
+
+
+if __name__ == '__main__':
+    unittest.main()
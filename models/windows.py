@@ -0,0 +1,82 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import numpy as np
+
+
+def sliding_windows(array, sequence_length):
+    """
+    Read only view of all windows of sequence_length rows of array, nothing is copied.
+    array: np-array (ticks x features)
+    returns np-array (ticks-sequence_length+1 x sequence_length x features)
+    """
+    array = np.ascontiguousarray(array)
+    count = max(array.shape[0] - sequence_length + 1, 0)
+    shape = (count, sequence_length) + array.shape[1:]
+    strides = (array.strides[0],) + array.strides
+    return np.lib.stride_tricks.as_strided(array, shape=shape, strides=strides, writeable=False)
+
+
+class StackedWindows(object):
+    """
+    Stack of all windows of sequence_length ticks within each day, backed by the base array (ticks x features)
+    of all days. Behaves like the (windows x sequence_length x features) array the 'stack' mode used to fill,
+    indexing with a list or slice of windows copies only these windows.
+    """
+
+    def __init__(self, base, lengths, sequence_length):
+        """
+        base ... np-array (ticks x features), the days concatenated
+        lengths ... number of ticks of every day in base, windows do not cross day boundaries
+        """
+        self.base = np.ascontiguousarray(base)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.sequence_length = int(sequence_length)
+
+        if self.lengths.sum() != self.base.shape[0]:
+            print("Day lengths {} do not match the {} rows of the base array. Aborting.".format(self.lengths.sum(), self.base.shape[0]))
+            raise ValueError
+
+        offsets = np.cumsum(self.lengths) - self.lengths
+        counts = np.maximum(self.lengths - self.sequence_length + 1, 0)
+        # the first tick of every window in base
+        self.starts = np.concatenate([np.arange(offset, offset + count) for offset, count in zip(offsets, counts)] + [np.zeros(0, dtype=np.int64)])
+        self.windows = sliding_windows(self.base, self.sequence_length)
+
+    @property
+    def shape(self):
+        return (len(self.starts), self.sequence_length) + self.base.shape[1:]
+
+    @property
+    def dtype(self):
+        return self.base.dtype
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, idx):
+        return self.windows[self.starts[idx]]
+
+    def save(self, filename):
+        """
+        store the base array and the day lengths, not the expanded windows
+        """
+        np.savez(filename, base=self.base, lengths=self.lengths, sequence_length=self.sequence_length)
+
+
+def save_stacked(filename, obj):
+    """
+    save function for ret_type 'stack': StackedWindows keep their base arrays, everything else (mean, std) is stored as array
+    """
+    if isinstance(obj, StackedWindows):
+        obj.save(filename)
+    else:
+        np.savez(filename, base=np.asarray(obj))
+
+
+def load_stacked(filename):
+    data = np.load(filename)
+    if 'lengths' in data.files:
+        return StackedWindows(data['base'], data['lengths'], data['sequence_length'])
+    return data['base']
+
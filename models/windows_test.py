@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from windows import sliding_windows, StackedWindows, save_stacked, load_stacked
+
+
+def stack_loop(days, sequence_length):
+    """
+    The former fill of the 'stack' mode, day by day: window i holds the ticks i ... i+sequence_length-1 of its day
+    """
+    windows = []
+    for day in days:
+        for i in range(0, day.shape[0]-sequence_length+1):
+            windows.append(day[i:i+sequence_length])
+    return np.array(windows).reshape((len(windows), sequence_length) + days[0].shape[1:])
+
+
+class StackedWindowsTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        # the second day is shorter than sequence_length, the third one has exactly one window
+        self.lengths = [40, 5, 10, 23]
+        self.sequence_length = 10
+        self.days = [rng.rand(length, 3).astype(np.float32) for length in self.lengths]
+        self.stacked = StackedWindows(np.concatenate(self.days), self.lengths, self.sequence_length)
+
+    def test_parity(self):
+        expected = stack_loop(self.days, self.sequence_length)
+        self.assertEqual(self.stacked.shape, expected.shape)
+        self.assertEqual(len(self.stacked), 31 + 0 + 1 + 14)
+        np.testing.assert_array_equal(self.stacked[np.arange(len(self.stacked))], expected)
+        np.testing.assert_array_equal(self.stacked[5:9], expected[5:9])
+
+    def test_day_boundaries(self):
+        # every window lies within one day
+        day = np.repeat(np.arange(len(self.lengths)), self.lengths)
+        for start in self.stacked.starts:
+            self.assertEqual(day[start], day[start + self.sequence_length - 1])
+
+    def test_short_days(self):
+        stacked = StackedWindows(np.concatenate(self.days[1:2]), self.lengths[1:2], self.sequence_length)
+        self.assertEqual(len(stacked), 0)
+        self.assertEqual(stacked.shape, (0, self.sequence_length, 3))
+        self.assertEqual(sliding_windows(self.days[1], self.sequence_length).shape, (0, self.sequence_length, 3))
+
+    def test_read_only(self):
+        window = self.stacked.windows[0]
+        with self.assertRaises(ValueError):
+            window[0, 0] = 1.
+
+    def test_wrong_lengths(self):
+        with self.assertRaises(ValueError):
+            StackedWindows(np.concatenate(self.days), [40, 5], self.sequence_length)
+
+    def test_save_load(self):
+        path = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(path, "X.npz")
+            save_stacked(filename, self.stacked)
+            loaded = load_stacked(filename)
+            self.assertIsInstance(loaded, StackedWindows)
+            self.assertEqual(loaded.shape, self.stacked.shape)
+            self.assertEqual(loaded.dtype, np.float32)
+            np.testing.assert_array_equal(loaded[np.arange(len(loaded))], self.stacked[np.arange(len(self.stacked))])
+
+            # mean and std are stored as plain arrays
+            filename = os.path.join(path, "m.npz")
+            save_stacked(filename, np.arange(3.))
+            np.testing.assert_array_equal(load_stacked(filename), np.arange(3.))
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()